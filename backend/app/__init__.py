@@ -5,6 +5,7 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_socketio import SocketIO
 from celery import Celery
+from kombu import Queue
 import os
 from dotenv import load_dotenv
 
@@ -17,6 +18,25 @@ migrate = Migrate()
 jwt = JWTManager()
 socketio = SocketIO(cors_allowed_origins="*")
 
+# Celery队列：交互式执行、主机健康检查、facts收集、维护任务、定时派发互不阻塞
+CELERY_QUEUES = ('executions', 'health', 'facts', 'maintenance', 'scheduling')
+
+# 任务路由，priority越小优先级越高（Redis broker）
+CELERY_TASK_ROUTES = {
+    'app.tasks.ansible_tasks.execute_playbook_task': {'queue': 'executions', 'priority': 3},
+    'app.tasks.ansible_tasks.execute_adhoc_task': {'queue': 'executions', 'priority': 3},
+    'app.tasks.ansible_tasks.execute_playbook_shard': {'queue': 'executions', 'priority': 3},
+    'app.tasks.ansible_tasks.merge_playbook_shards': {'queue': 'executions', 'priority': 0},
+    'app.tasks.ansible_tasks.validate_playbook_syntax': {'queue': 'executions', 'priority': 0},
+    'app.tasks.ansible_tasks.check_host_connectivity': {'queue': 'health', 'priority': 5},
+    'app.tasks.ansible_tasks.check_all_hosts_connectivity': {'queue': 'health', 'priority': 8},
+    'app.tasks.ansible_tasks.periodic_health_check': {'queue': 'maintenance', 'priority': 5},
+    'app.tasks.ansible_tasks.gather_host_facts': {'queue': 'facts', 'priority': 5},
+    'app.tasks.ansible_tasks.cleanup_old_tasks': {'queue': 'maintenance', 'priority': 9},
+    'app.tasks.ansible_tasks.dispatch_due_schedules': {'queue': 'scheduling', 'priority': 0},
+    'app.tasks.ansible_tasks.pump_admission_queue': {'queue': 'scheduling', 'priority': 0},
+}
+
 
 def make_celery(app):
     """创建Celery实例"""
@@ -26,6 +46,39 @@ def make_celery(app):
         broker=app.config['CELERY_BROKER_URL']
     )
     celery.conf.update(app.config)
+    celery.conf.update(
+        task_queues=[Queue(name) for name in CELERY_QUEUES],
+        task_default_queue='executions',
+        task_routes=CELERY_TASK_ROUTES,
+        task_default_priority=5,
+        broker_transport_options={
+            'priority_steps': list(range(10)),
+            'queue_order_strategy': 'priority',
+            # acks_late下未确认的任务超过该时间会被重新投递，必须大于最长执行时间和主机锁等待时间
+            'visibility_timeout': max(app.config['CELERY_VISIBILITY_TIMEOUT'],
+                                      app.config['HOST_LOCK_WAIT_TIMEOUT'] + app.config['ADMISSION_STALE_TIMEOUT']),
+        },
+        # 长任务只预取一个，保证优先级和队列隔离生效
+        worker_prefetch_multiplier=1,
+        task_acks_late=True,
+        # 定时执行计划保存在数据库中，beat只负责定期触发派发
+        beat_schedule={
+            'dispatch-due-schedules': {
+                'task': 'app.tasks.ansible_tasks.dispatch_due_schedules',
+                'schedule': app.config['SCHEDULER_TICK_INTERVAL'],
+                'options': {'expires': app.config['SCHEDULER_TICK_INTERVAL']},
+            },
+            'pump-admission-queue': {
+                'task': 'app.tasks.ansible_tasks.pump_admission_queue',
+                'schedule': app.config['ADMISSION_PUMP_INTERVAL'],
+                'options': {'expires': app.config['ADMISSION_PUMP_INTERVAL']},
+            },
+            'periodic-health-check': {
+                'task': 'app.tasks.ansible_tasks.periodic_health_check',
+                'schedule': app.config['HEALTH_CHECK_INTERVAL'],
+            },
+        },
+    )
     
     class ContextTask(celery.Task):
         """Make celery tasks work with Flask app context."""
@@ -34,6 +87,8 @@ def make_celery(app):
                 return self.run(*args, **kwargs)
     
     celery.Task = ContextTask
+    # worker远程控制命令需要应用上下文
+    celery.flask_app = app
     return celery
 
 
@@ -53,6 +108,67 @@ def create_app(config_name='development'):
     app.config['CELERY_BROKER_URL'] = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
     app.config['CELERY_RESULT_BACKEND'] = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
     
+    # Redis配置
+    app.config['REDIS_URL'] = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    
+    # Ansible执行配置
+    app.config['ANSIBLE_DEFAULT_FORKS'] = int(os.getenv('ANSIBLE_DEFAULT_FORKS', 20))
+    app.config['ANSIBLE_MAX_FORKS'] = int(os.getenv('ANSIBLE_MAX_FORKS', 200))
+    app.config['EXECUTION_DEDUP_TTL'] = int(os.getenv('EXECUTION_DEDUP_TTL', 6 * 3600))
+    app.config['IDEMPOTENCY_KEY_TTL'] = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+    app.config['ANSIBLE_MAX_SHARDS'] = int(os.getenv('ANSIBLE_MAX_SHARDS', 32))
+    app.config['ANSIBLE_SWEEP_BATCH_SIZE'] = int(os.getenv('ANSIBLE_SWEEP_BATCH_SIZE', 500))
+    app.config['ANSIBLE_SWEEP_FORKS'] = int(os.getenv('ANSIBLE_SWEEP_FORKS', 50))
+    app.config['HOST_PROBE_ENABLED'] = os.getenv('HOST_PROBE_ENABLED', 'true').lower() == 'true'
+    app.config['HOST_PROBE_CONCURRENCY'] = int(os.getenv('HOST_PROBE_CONCURRENCY', 500))
+    app.config['HOST_PROBE_TIMEOUT'] = float(os.getenv('HOST_PROBE_TIMEOUT', 3.0))
+    app.config['ANSIBLE_WORKER_DIR'] = os.getenv('ANSIBLE_WORKER_DIR', '/tmp/ansible-web')
+    app.config['PROJECT_CACHE_BUDGET'] = int(os.getenv('PROJECT_CACHE_BUDGET', 1024 * 1024 * 1024))
+    app.config['ARTIFACT_ARCHIVE_DIR'] = os.getenv('ARTIFACT_ARCHIVE_DIR', '/app/ansible_data/archives')
+    app.config['ARTIFACT_RETENTION_DAYS'] = int(os.getenv('ARTIFACT_RETENTION_DAYS', 7))
+    app.config['LOG_STORE_DIR'] = os.getenv('LOG_STORE_DIR', '/app/ansible_data/task_logs')
+    app.config['LOG_CHUNK_SIZE'] = int(os.getenv('LOG_CHUNK_SIZE', 1024 * 1024))
+    app.config['LIVE_LOG_FLUSH_INTERVAL'] = float(os.getenv('LIVE_LOG_FLUSH_INTERVAL', 0.25))
+    app.config['LIVE_LOG_FLUSH_BYTES'] = int(os.getenv('LIVE_LOG_FLUSH_BYTES', 64 * 1024))
+    app.config['ADHOC_RESULT_FLUSH_INTERVAL'] = float(os.getenv('ADHOC_RESULT_FLUSH_INTERVAL', 0.5))
+    app.config['ADHOC_OUTPUT_MAX_BYTES'] = int(os.getenv('ADHOC_OUTPUT_MAX_BYTES', 4096))
+    app.config['ADHOC_OUTPUT_GROUP_LIMIT'] = int(os.getenv('ADHOC_OUTPUT_GROUP_LIMIT', 50))
+    app.config['PROGRESS_UPDATE_INTERVAL'] = float(os.getenv('PROGRESS_UPDATE_INTERVAL', 2.0))
+    app.config['PLAYBOOK_VALIDATION_CACHE_SIZE'] = int(os.getenv('PLAYBOOK_VALIDATION_CACHE_SIZE', 1024))
+    app.config['PLAYBOOK_SYNTAX_CHECK_WORKERS'] = int(os.getenv('PLAYBOOK_SYNTAX_CHECK_WORKERS', 2))
+    app.config['PLAYBOOK_SYNTAX_CHECK_TIMEOUT'] = int(os.getenv('PLAYBOOK_SYNTAX_CHECK_TIMEOUT', 30))
+    app.config['ANSIBLE_WARM_POOL_ENABLED'] = os.getenv('ANSIBLE_WARM_POOL_ENABLED', 'false').lower() == 'true'
+    app.config['ANSIBLE_WARM_POOL_SIZE'] = int(os.getenv('ANSIBLE_WARM_POOL_SIZE', 1))
+    app.config['ANSIBLE_WARM_POOL_MAX_JOBS'] = int(os.getenv('ANSIBLE_WARM_POOL_MAX_JOBS', 50))
+    app.config['SCHEDULER_TICK_INTERVAL'] = int(os.getenv('SCHEDULER_TICK_INTERVAL', 30))
+    app.config['SCHEDULER_DEFAULT_JITTER'] = int(os.getenv('SCHEDULER_DEFAULT_JITTER', 300))
+    app.config['SCHEDULER_MAX_JITTER'] = int(os.getenv('SCHEDULER_MAX_JITTER', 3600))
+    app.config['SCHEDULER_QUEUED_TIMEOUT'] = int(os.getenv('SCHEDULER_QUEUED_TIMEOUT', 3600))
+    app.config['SCHEDULER_BATCH_SIZE'] = int(os.getenv('SCHEDULER_BATCH_SIZE', 100))
+    app.config['HEALTH_CHECK_INTERVAL'] = int(os.getenv('HEALTH_CHECK_INTERVAL', 3600))
+    app.config['HOST_LOCK_ENABLED'] = os.getenv('HOST_LOCK_ENABLED', 'true').lower() == 'true'
+    app.config['HOST_LOCK_POLICY'] = os.getenv('HOST_LOCK_POLICY', 'wait')  # wait, queue, fail
+    app.config['HOST_LOCK_TTL'] = int(os.getenv('HOST_LOCK_TTL', 120))
+    app.config['HOST_LOCK_WAIT_TIMEOUT'] = int(os.getenv('HOST_LOCK_WAIT_TIMEOUT', 3600))
+    app.config['HOST_LOCK_POLL_INTERVAL'] = float(os.getenv('HOST_LOCK_POLL_INTERVAL', 2.0))
+    app.config['HOST_LOCK_REQUEUE_DELAY'] = int(os.getenv('HOST_LOCK_REQUEUE_DELAY', 15))
+    app.config['ADMISSION_ENABLED'] = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    app.config['ADMISSION_CAPACITY'] = int(os.getenv('ADMISSION_CAPACITY', 8))
+    app.config['ADMISSION_RESERVED_SLOTS'] = int(os.getenv('ADMISSION_RESERVED_SLOTS', 1))
+    app.config['ADMISSION_SMALL_JOB_HOSTS'] = int(os.getenv('ADMISSION_SMALL_JOB_HOSTS', 10))
+    app.config['ADMISSION_HOST_COST_UNIT'] = int(os.getenv('ADMISSION_HOST_COST_UNIT', 50))
+    app.config['ADMISSION_DEFAULT_MAX_RUNNING'] = int(os.getenv('ADMISSION_DEFAULT_MAX_RUNNING', 4))
+    app.config['ADMISSION_DEFAULT_MAX_HOSTS'] = int(os.getenv('ADMISSION_DEFAULT_MAX_HOSTS', 0))
+    app.config['ADMISSION_DEFAULT_DURATION'] = int(os.getenv('ADMISSION_DEFAULT_DURATION', 60))
+    app.config['ADMISSION_STALE_TIMEOUT'] = int(os.getenv('ADMISSION_STALE_TIMEOUT', 21600))
+    app.config['ADMISSION_PUMP_INTERVAL'] = int(os.getenv('ADMISSION_PUMP_INTERVAL', 60))
+    app.config['CELERY_VISIBILITY_TIMEOUT'] = int(os.getenv('CELERY_VISIBILITY_TIMEOUT', 43200))
+    app.config['SSH_CONTROL_PERSIST'] = int(os.getenv('SSH_CONTROL_PERSIST', 600))
+    app.config['SSH_CONNECT_TIMEOUT'] = int(os.getenv('SSH_CONNECT_TIMEOUT', 10))
+    app.config['FACT_CACHE_BACKEND'] = os.getenv('FACT_CACHE_BACKEND', 'redis')  # redis, jsonfile
+    app.config['FACT_CACHE_DIR'] = os.getenv('FACT_CACHE_DIR', '/app/ansible_data/facts')
+    app.config['FACT_CACHE_TTL'] = int(os.getenv('FACT_CACHE_TTL', 86400))
+    
     # JWT配置
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False
@@ -6,18 +6,29 @@ api_bp = Blueprint('api', __name__)
 api = Api(api_bp)
 
 # 导入资源类
-from app.api.hosts import HostListResource, HostResource, HostGroupListResource, HostGroupResource
-from app.api.playbooks import PlaybookListResource, PlaybookResource, PlaybookExecuteResource
-from app.api.tasks import TaskListResource, TaskResource, TaskLogsResource
+from app.api.hosts import (HostListResource, HostResource, HostFactsResource, HostHistoryResource,
+                           FailingHostListResource, HostGroupListResource, HostGroupResource)
+from app.api.playbooks import PlaybookListResource, PlaybookResource, PlaybookExecuteResource, PlaybookValidateResource
+from app.api.tasks import (
+    TaskListResource, TaskResource, TaskCancelResource, TaskLogsResource, TaskEventsResource,
+    TaskOutputGroupsResource
+)
+from app.api.schedules import ScheduleListResource, ScheduleResource, ScheduleRunResource
 from app.api.dashboard import DashboardStatsResource
 from app.api.templates import TemplateListResource, TemplateResource
 from app.api.inventory import InventoryResource, InventoryExportResource
+from app.api.workers import WorkerSSHSocketsResource
+from app.api.locks import HostLockListResource, HostLockResource, HostLockMetricsResource
+from app.api.admission import AdmissionQueueResource, AdmissionQueueItemResource, AdmissionQuotaListResource
 
 # 注册API路由
 
 # 主机管理
 api.add_resource(HostListResource, '/hosts')
 api.add_resource(HostResource, '/hosts/<int:host_id>')
+api.add_resource(HostFactsResource, '/hosts/<int:host_id>/facts')
+api.add_resource(HostHistoryResource, '/hosts/<int:host_id>/history')
+api.add_resource(FailingHostListResource, '/hosts/failing')
 api.add_resource(HostGroupListResource, '/host-groups')
 api.add_resource(HostGroupResource, '/host-groups/<int:group_id>')
 
@@ -25,11 +36,20 @@ api.add_resource(HostGroupResource, '/host-groups/<int:group_id>')
 api.add_resource(PlaybookListResource, '/playbooks')
 api.add_resource(PlaybookResource, '/playbooks/<int:playbook_id>')
 api.add_resource(PlaybookExecuteResource, '/playbooks/<int:playbook_id>/execute')
+api.add_resource(PlaybookValidateResource, '/playbooks/validate', '/playbooks/<int:playbook_id>/validate')
 
 # 任务管理
 api.add_resource(TaskListResource, '/tasks')
 api.add_resource(TaskResource, '/tasks/<int:task_id>')
+api.add_resource(TaskCancelResource, '/tasks/<string:task_id>/cancel')
 api.add_resource(TaskLogsResource, '/tasks/<int:task_id>/logs')
+api.add_resource(TaskEventsResource, '/tasks/<int:task_id>/events')
+api.add_resource(TaskOutputGroupsResource, '/tasks/<int:task_id>/output-groups')
+
+# 定时执行
+api.add_resource(ScheduleListResource, '/schedules')
+api.add_resource(ScheduleResource, '/schedules/<int:schedule_id>')
+api.add_resource(ScheduleRunResource, '/schedules/<int:schedule_id>/run')
 
 # 仪表板
 api.add_resource(DashboardStatsResource, '/dashboard/stats')
@@ -40,4 +60,17 @@ api.add_resource(TemplateResource, '/templates/<int:template_id>')
 
 # 清单管理
 api.add_resource(InventoryResource, '/inventory')
-api.add_resource(InventoryExportResource, '/inventory/export')
\ No newline at end of file
+api.add_resource(InventoryExportResource, '/inventory/export')
+
+# Worker管理
+api.add_resource(WorkerSSHSocketsResource, '/workers/ssh-sockets')
+
+# 主机锁
+api.add_resource(HostLockListResource, '/locks/hosts')
+api.add_resource(HostLockMetricsResource, '/locks/metrics')
+api.add_resource(HostLockResource, '/locks/<string:holder>')
+
+# 准入控制
+api.add_resource(AdmissionQueueResource, '/admission/queue')
+api.add_resource(AdmissionQueueItemResource, '/admission/queue/<string:task_id>')
+api.add_resource(AdmissionQuotaListResource, '/admission/quotas')
@@ -0,0 +1,121 @@
+from flask import request
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app import db
+from app.models import ExecutionQuota
+from app.api.permissions import is_admin
+from app.services.admission import admission
+from app.services.execution_dedup import execution_coalescer
+
+
+QUOTA_SCOPES = ('user', 'team', 'default')
+
+
+def can_cancel_queued(owner, user_id):
+    """排队中的执行只能由提交者或管理员取消"""
+    return owner == str(user_id) or is_admin(user_id)
+
+
+class AdmissionQueueResource(Resource):
+    """准入队列资源"""
+    
+    @jwt_required()
+    def get(self):
+        """列出排队中的执行和全局名额使用情况，mine=true时只看自己所在团队的执行"""
+        try:
+            subject = None
+            if request.args.get('mine', 'false').lower() == 'true':
+                subject = admission.subject(get_jwt_identity())['key']
+            
+            return {
+                'queue': admission.queue(subject, limit=request.args.get('limit', 100, type=int)),
+                'stats': admission.stats()
+            }
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+
+class AdmissionQueueItemResource(Resource):
+    """排队中的单个执行资源"""
+    
+    @jwt_required()
+    def get(self, task_id):
+        """获取执行的排队位置和预计等待时间"""
+        try:
+            position = admission.position(task_id)
+            if position is None:
+                return {'task_id': task_id, 'queued': False}
+            return position
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    @jwt_required()
+    def delete(self, task_id):
+        """取消排队中的执行，仅提交者和管理员可用，已开始的执行请使用任务取消接口"""
+        try:
+            owner = admission.owner(task_id)
+            if owner is None:
+                return {'error': 'Execution is not queued'}, 409
+            if not can_cancel_queued(owner, get_jwt_identity()):
+                return {'error': 'Only the submitter or an admin can cancel this execution'}, 403
+            
+            if not admission.cancel(task_id):
+                return {'error': 'Execution is not queued'}, 409
+            
+            execution_coalescer.release(task_id)
+            return {'task_id': task_id, 'message': 'Queued execution cancelled'}
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+
+class AdmissionQuotaListResource(Resource):
+    """执行配额资源"""
+    
+    @jwt_required()
+    def get(self):
+        """列出所有配额"""
+        try:
+            quotas = ExecutionQuota.query.order_by(ExecutionQuota.scope, ExecutionQuota.subject).all()
+            return {'quotas': [quota.to_dict() for quota in quotas]}
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    @jwt_required()
+    def put(self):
+        """创建或更新用户、团队或默认配额，仅管理员可用"""
+        try:
+            if not is_admin(get_jwt_identity()):
+                return {'error': 'Admin privileges required'}, 403
+            
+            data = request.get_json() or {}
+            scope = data.get('scope')
+            if scope not in QUOTA_SCOPES:
+                return {'error': f'scope must be one of: {", ".join(QUOTA_SCOPES)}'}, 400
+            subject = None if scope == 'default' else data.get('subject')
+            if scope != 'default' and not subject:
+                return {'error': 'subject is required'}, 400
+            
+            for field in ('max_running', 'max_hosts'):
+                value = data.get(field)
+                if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+                    return {'error': f'{field} must be a non-negative integer'}, 400
+            weight = data.get('weight', 1.0)
+            if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+                return {'error': 'weight must be a positive number'}, 400
+            
+            quota = ExecutionQuota.query.filter_by(scope=scope, subject=subject).first()
+            if quota is None:
+                quota = ExecutionQuota(scope=scope, subject=subject)
+                db.session.add(quota)
+            quota.max_running = data.get('max_running')
+            quota.max_hosts = data.get('max_hosts')
+            quota.weight = weight
+            db.session.commit()
+            
+            # 配额放宽后立即派发可以运行的排队执行
+            admission.pump()
+            return quota.to_dict()
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
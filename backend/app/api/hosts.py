@@ -7,7 +7,10 @@ from app import db
 from app.models import Host, HostGroup, User
 from app.utils.validators import validate_host_data, validate_host_group_data
 from app.services.ansible_service import AnsibleService
-from app.tasks.host_tasks import check_host_connectivity
+from app.services.inventory_cache import inventory_cache
+from app.tasks.ansible_tasks import check_host_connectivity, gather_host_facts
+from app.services.fact_cache import fact_cache
+from app.services.host_results import host_history, failing_hosts
 
 
 class HostListResource(Resource):
@@ -95,6 +98,7 @@ class HostListResource(Resource):
             
             db.session.add(host)
             db.session.commit()
+            inventory_cache.invalidate()
             
             # 异步检查连接性
             check_host_connectivity.delay(host.id)
@@ -140,6 +144,7 @@ class HostResource(Resource):
                     setattr(host, field, data[field])
             
             db.session.commit()
+            inventory_cache.invalidate()
             
             # 如果连接信息发生变化，重新检查连接性
             if any(field in data for field in ['ip_address', 'port', 'username', 'password', 'private_key_path']):
@@ -165,6 +170,7 @@ class HostResource(Resource):
             
             db.session.delete(host)
             db.session.commit()
+            inventory_cache.invalidate()
             
             return {'message': 'Host deleted successfully'}, 200
             
@@ -173,6 +179,98 @@ class HostResource(Resource):
             return {'error': str(e)}, 500
 
 
+class HostFactsResource(Resource):
+    """主机facts资源"""
+    
+    @jwt_required()
+    def get(self, host_id):
+        """获取主机的缓存facts"""
+        try:
+            host = Host.query.get_or_404(host_id)
+            facts = fact_cache.get(host.hostname)
+            
+            return {
+                'host_id': host.id,
+                'hostname': host.hostname,
+                'cached': facts is not None,
+                'age': fact_cache.age(host.hostname) if facts is not None else None,
+                'ttl': fact_cache.ttl,
+                'facts': facts or {}
+            }, 200
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    @jwt_required()
+    def post(self, host_id):
+        """重新收集主机facts"""
+        try:
+            host = Host.query.get_or_404(host_id)
+            task = gather_host_facts.delay(host.id, refresh=True)
+            
+            return {
+                'task_id': task.id,
+                'message': 'Fact gathering started'
+            }, 202
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    @jwt_required()
+    def delete(self, host_id):
+        """清除主机的缓存facts"""
+        try:
+            host = Host.query.get_or_404(host_id)
+            fact_cache.invalidate(host.hostname)
+            
+            return {'message': 'Cached facts cleared'}, 200
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+
+class HostHistoryResource(Resource):
+    """主机执行历史资源"""
+    
+    @jwt_required()
+    def get(self, host_id):
+        """获取主机最近的执行结果，可按Playbook、天数和是否失败筛选"""
+        try:
+            host = Host.query.get_or_404(host_id)
+            results = host_history(
+                host.id,
+                playbook_id=request.args.get('playbook_id', type=int),
+                days=request.args.get('days', type=int),
+                failed_only=bool(request.args.get('failed', 0, type=int)),
+                limit=min(request.args.get('limit', 50, type=int), 500)
+            )
+            
+            return {
+                'host_id': host.id,
+                'hostname': host.hostname,
+                'results': [result.to_dict() for result in results]
+            }, 200
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+
+class FailingHostListResource(Resource):
+    """失败主机资源"""
+    
+    @jwt_required()
+    def get(self):
+        """获取最近执行失败或不可达的主机，可按Playbook筛选"""
+        try:
+            days = request.args.get('days', 7, type=int)
+            return {
+                'days': days,
+                'hosts': failing_hosts(
+                    playbook_id=request.args.get('playbook_id', type=int),
+                    days=days,
+                    limit=min(request.args.get('limit', 100, type=int), 1000)
+                )
+            }, 200
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+
 class HostGroupListResource(Resource):
     """主机组列表资源"""
     
@@ -205,6 +303,7 @@ class HostGroupListResource(Resource):
             
             db.session.add(group)
             db.session.commit()
+            inventory_cache.invalidate()
             
             return group.to_dict(), 201
             
@@ -248,6 +347,7 @@ class HostGroupResource(Resource):
                     setattr(group, field, data[field])
             
             db.session.commit()
+            inventory_cache.invalidate()
             return group.to_dict(), 200
             
         except IntegrityError:
@@ -269,6 +369,7 @@ class HostGroupResource(Resource):
             
             db.session.delete(group)
             db.session.commit()
+            inventory_cache.invalidate()
             
             return {'message': 'Host group deleted successfully'}, 200
             
@@ -0,0 +1,56 @@
+from flask import request
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app.api.permissions import is_admin
+from app.services.host_locks import host_locks
+
+
+class HostLockListResource(Resource):
+    """主机锁资源"""
+    
+    @jwt_required()
+    def get(self):
+        """列出持有主机锁和正在等待的执行，可查询单台主机"""
+        try:
+            host_id = request.args.get('host_id', type=int)
+            if host_id:
+                return {'host_id': host_id, 'lock': host_locks.host_holder(host_id)}
+            
+            holders = host_locks.holders()
+            return {
+                'holders': holders,
+                'waiting': host_locks.waiting(),
+                'locked_hosts': sum(holder['host_count'] for holder in holders)
+            }
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+
+class HostLockResource(Resource):
+    """单个执行的主机锁资源"""
+    
+    @jwt_required()
+    def delete(self, holder):
+        """强制释放执行持有的主机锁，用于清理异常残留的锁，仅管理员可用"""
+        try:
+            # 释放仍在运行的执行的锁会让其它执行同时操作这些主机
+            if not is_admin(get_jwt_identity()):
+                return {'error': 'Admin privileges required'}, 403
+            
+            released = host_locks.release(holder)
+            return {'holder': holder, 'released': released}
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+
+class HostLockMetricsResource(Resource):
+    """主机锁统计资源"""
+    
+    @jwt_required()
+    def get(self):
+        """获取主机锁获得次数、冲突、超时和等待时间分布"""
+        try:
+            return host_locks.metrics()
+        except Exception as e:
+            return {'error': str(e)}, 500
@@ -0,0 +1,7 @@
+from app.models import User
+
+
+def is_admin(user_id):
+    """用户是否为管理员"""
+    user = User.query.get(user_id)
+    return user is not None and user.role == 'admin'
@@ -1,11 +1,34 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import Playbook, db
-from app.tasks.ansible_tasks import execute_playbook_task, validate_playbook_syntax
+from app.services.ansible_service import ansible_service
+from app.services.execution_dedup import execution_fingerprint, execution_coalescer
+from app.services.playbook_validator import playbook_validator
+from app.services.host_locks import HOST_LOCK_POLICIES
+from app.services.admission import admission, AdmissionRejected
+from app.services.project_cache import RESERVED_FILES
+import os
 import yaml
 
 
+def validate_playbook_files(files):
+    """校验Playbook依赖文件：相对路径到文本内容的映射"""
+    if files is None:
+        return None
+    if not isinstance(files, dict):
+        return 'Files must be an object mapping relative paths to content'
+    for path, content in files.items():
+        normalized = os.path.normpath(path)
+        if os.path.isabs(normalized) or normalized.startswith('..'):
+            return f'Invalid file path: {path}'
+        if normalized in RESERVED_FILES:
+            return f'Reserved file name: {path}'
+        if not isinstance(content, str):
+            return f'File content must be a string: {path}'
+    return None
+
+
 class PlaybookListResource(Resource):
     """Playbook列表资源"""
     
@@ -71,10 +94,15 @@ class PlaybookListResource(Resource):
             except yaml.YAMLError as e:
                 return {'error': f'Invalid YAML syntax: {str(e)}'}, 400
             
+            files_error = validate_playbook_files(data.get('files'))
+            if files_error:
+                return {'error': files_error}, 400
+            
             playbook = Playbook(
                 name=data['name'],
                 description=data.get('description', ''),
                 content=data['content'],
+                files=data.get('files', {}),
                 category=data.get('category', 'general'),
                 tags=data.get('tags', []),
                 variables=data.get('variables', {}),
@@ -112,6 +140,7 @@ class PlaybookResource(Resource):
                 'name': playbook.name,
                 'description': playbook.description,
                 'content': playbook.content,
+                'files': playbook.files or {},
                 'category': playbook.category,
                 'tags': playbook.tags,
                 'variables': playbook.variables,
@@ -136,6 +165,11 @@ class PlaybookResource(Resource):
                 except yaml.YAMLError as e:
                     return {'error': f'Invalid YAML syntax: {str(e)}'}, 400
             
+            if 'files' in data:
+                files_error = validate_playbook_files(data['files'])
+                if files_error:
+                    return {'error': files_error}, 400
+            
             # 更新字段
             if 'name' in data:
                 playbook.name = data['name']
@@ -143,6 +177,8 @@ class PlaybookResource(Resource):
                 playbook.description = data['description']
             if 'content' in data:
                 playbook.content = data['content']
+            if 'files' in data:
+                playbook.files = data['files']
             if 'category' in data:
                 playbook.category = data['category']
             if 'tags' in data:
@@ -196,18 +232,71 @@ class PlaybookExecuteResource(Resource):
             host_ids = data.get('host_ids', [])
             extra_vars = data.get('extra_vars', {})
             
-            # 启动异步任务
-            task = execute_playbook_task.delay(
-                playbook_id=playbook_id,
-                host_ids=host_ids,
-                extra_vars=extra_vars,
-                user_id=user_id
-            )
+            # 性能参数（forks、strategy、serial、pipelining、gathering）
+            options = data.get('options', {})
+            errors = ansible_service.validate_execution_options(options, playbook.content)
+            if errors:
+                return {'errors': errors}, 400
+            
+            # 分片数，大于1时主机被拆分到多个worker并行执行
+            shards = data.get('shards')
+            max_shards = current_app.config.get('ANSIBLE_MAX_SHARDS', 32)
+            if shards is not None and (isinstance(shards, bool) or not isinstance(shards, int)
+                                       or not 1 <= shards <= max_shards):
+                return {'errors': [f'shards must be an integer between 1 and {max_shards}']}, 400
+            
+            # 目标主机被其它执行占用时的处理方式
+            lock_policy = data.get('lock_policy')
+            if lock_policy is not None and lock_policy not in HOST_LOCK_POLICIES:
+                return {'errors': [f'lock_policy must be one of: {", ".join(HOST_LOCK_POLICIES)}']}, 400
+            
+            # 相同执行（内容、主机、参数一致）在排队或运行期间只保留一个
+            fingerprint = execution_fingerprint(playbook.content, host_ids, extra_vars, options, shards,
+                                                files=playbook.files)
+            idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+            task_id, coalesced = execution_coalescer.claim(fingerprint, user_id, idempotency_key)
+            
+            if coalesced:
+                return {
+                    'task_id': task_id,
+                    'message': 'Identical execution already in progress',
+                    'playbook_name': playbook.name,
+                    'coalesced': True
+                }, 202
+            
+            # 提交到准入队列，名额允许时立即开始执行，否则排队
+            try:
+                admitted = admission.submit(
+                    'app.tasks.ansible_tasks.execute_playbook_task',
+                    {
+                        'playbook_id': playbook_id,
+                        'host_ids': host_ids,
+                        'extra_vars': extra_vars,
+                        'user_id': user_id,
+                        'options': options,
+                        'shards': shards,
+                        'lock_policy': lock_policy
+                    },
+                    task_id,
+                    user_id=user_id,
+                    host_ids=host_ids,
+                    slots=shards or 1
+                )
+            except AdmissionRejected as e:
+                execution_coalescer.release(task_id)
+                return {'error': str(e)}, 429
+            except Exception:
+                execution_coalescer.release(task_id)
+                raise
             
             return {
-                'task_id': task.id,
-                'message': 'Playbook execution started',
-                'playbook_name': playbook.name
+                'task_id': task_id,
+                'message': 'Playbook execution queued' if admitted['queued'] else 'Playbook execution started',
+                'playbook_name': playbook.name,
+                'coalesced': False,
+                'queued': admitted['queued'],
+                'position': admitted.get('position'),
+                'expected_wait': admitted.get('expected_wait')
             }, 202
         except Exception as e:
             return {'error': str(e)}, 500
@@ -217,15 +306,32 @@ class PlaybookValidateResource(Resource):
     """Playbook语法验证资源"""
     
     @jwt_required()
-    def post(self, playbook_id):
-        """验证Playbook语法"""
+    def post(self, playbook_id=None):
+        """同步验证Playbook语法
+
+        请求体可以带content/files验证尚未保存的内容，否则验证已保存的Playbook。
+        syntax_check为false时只做结构校验。
+        """
         try:
-            # 启动异步验证任务
-            task = validate_playbook_syntax.delay(playbook_id)
+            data = request.get_json(silent=True) or {}
             
-            return {
-                'task_id': task.id,
-                'message': 'Playbook validation started'
-            }, 202
+            if 'content' in data:
+                content = data['content']
+                files = data.get('files')
+                files_error = validate_playbook_files(files)
+                if files_error:
+                    return {'error': files_error}, 400
+            elif playbook_id is not None:
+                playbook = Playbook.query.get_or_404(playbook_id)
+                content = playbook.content
+                files = playbook.files
+            else:
+                return {'error': 'Playbook content is required'}, 400
+            
+            if not isinstance(content, str) or not content.strip():
+                return {'error': 'Playbook content is required'}, 400
+            
+            result = playbook_validator.validate(content, files, syntax_check=bool(data.get('syntax_check', True)))
+            return result, 200
         except Exception as e:
-            return {'error': str(e)}, 500
\ No newline at end of file
+            return {'error': str(e)}, 500
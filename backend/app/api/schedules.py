@@ -0,0 +1,159 @@
+from flask import request
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime
+
+from app import db
+from app.models import ExecutionSchedule
+from app.services.scheduler import execution_scheduler
+
+
+# 可以通过接口修改的计划字段
+SCHEDULE_FIELDS = ('name', 'description', 'target_type', 'playbook_id', 'host_ids', 'module', 'module_args',
+                   'extra_vars', 'options', 'cron_expression', 'timezone', 'jitter', 'allow_overlap', 'enabled')
+
+# 修改后需要重新计算下一次执行时间的字段
+TIMING_FIELDS = ('cron_expression', 'timezone', 'jitter', 'enabled')
+
+
+def schedule_dict(schedule, upcoming=0):
+    """计划详情，upcoming为附带的后续执行时间个数"""
+    data = schedule.to_dict()
+    if upcoming and schedule.enabled:
+        data['upcoming_runs'] = [run.isoformat() for run in execution_scheduler.upcoming(schedule, upcoming)]
+    return data
+
+
+class ScheduleListResource(Resource):
+    """定时执行计划列表资源"""
+    
+    @jwt_required()
+    def get(self):
+        """获取定时执行计划列表"""
+        try:
+            query = ExecutionSchedule.query
+            
+            playbook_id = request.args.get('playbook_id', type=int)
+            if playbook_id:
+                query = query.filter(ExecutionSchedule.playbook_id == playbook_id)
+            
+            enabled = request.args.get('enabled')
+            if enabled is not None:
+                query = query.filter(ExecutionSchedule.enabled.is_(enabled.lower() == 'true'))
+            
+            schedules = query.order_by(ExecutionSchedule.next_run_at).all()
+            return {'schedules': [schedule.to_dict() for schedule in schedules]}
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    @jwt_required()
+    def post(self):
+        """创建定时执行计划"""
+        try:
+            data = request.get_json() or {}
+            
+            errors = execution_scheduler.validate(data)
+            if errors:
+                return {'errors': errors}, 400
+            
+            schedule = ExecutionSchedule(created_by=get_jwt_identity())
+            for field in SCHEDULE_FIELDS:
+                if field in data:
+                    setattr(schedule, field, data[field])
+            
+            # 错开时间由计划ID决定，先分配ID再计算下一次执行时间
+            db.session.add(schedule)
+            db.session.flush()
+            schedule.next_run_at = execution_scheduler.next_run(schedule)
+            db.session.commit()
+            
+            return schedule_dict(schedule, upcoming=5), 201
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+
+class ScheduleResource(Resource):
+    """定时执行计划资源"""
+    
+    @jwt_required()
+    def get(self, schedule_id):
+        """获取计划详情和接下来几次执行时间"""
+        try:
+            schedule = ExecutionSchedule.query.get_or_404(schedule_id)
+            return schedule_dict(schedule, upcoming=request.args.get('upcoming', 5, type=int))
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    @jwt_required()
+    def put(self, schedule_id):
+        """更新计划"""
+        try:
+            schedule = ExecutionSchedule.query.get_or_404(schedule_id)
+            data = request.get_json() or {}
+            
+            # 按合并后的完整计划校验
+            merged = {field: getattr(schedule, field) for field in SCHEDULE_FIELDS}
+            merged.update({field: data[field] for field in SCHEDULE_FIELDS if field in data})
+            errors = execution_scheduler.validate(merged)
+            if errors:
+                return {'errors': errors}, 400
+            
+            for field in SCHEDULE_FIELDS:
+                if field in data:
+                    setattr(schedule, field, data[field])
+            
+            if any(field in data for field in TIMING_FIELDS):
+                schedule.next_run_at = execution_scheduler.next_run(schedule)
+            db.session.commit()
+            
+            return schedule_dict(schedule, upcoming=5)
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+    
+    @jwt_required()
+    def delete(self, schedule_id):
+        """删除计划，已派发的执行不受影响"""
+        try:
+            schedule = ExecutionSchedule.query.get_or_404(schedule_id)
+            
+            db.session.delete(schedule)
+            db.session.commit()
+            
+            return {'message': 'Schedule deleted successfully'}
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+
+class ScheduleRunResource(Resource):
+    """立即执行计划资源"""
+    
+    @jwt_required()
+    def post(self, schedule_id):
+        """立即执行一次计划，不影响下一次定时执行时间"""
+        try:
+            schedule = ExecutionSchedule.query.get_or_404(schedule_id)
+            
+            if not schedule.allow_overlap and execution_scheduler.is_running(schedule):
+                return {
+                    'error': 'Previous run of this schedule is still in progress',
+                    'task_id': schedule.last_task_id
+                }, 409
+            
+            task_id, coalesced = execution_scheduler.dispatch(schedule)
+            schedule.last_task_id = task_id
+            schedule.last_run_at = datetime.utcnow()
+            schedule.last_status = 'coalesced' if coalesced else 'dispatched'
+            schedule.last_error = None
+            db.session.commit()
+            
+            return {
+                'task_id': task_id,
+                'message': 'Schedule execution started',
+                'coalesced': coalesced
+            }, 202
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
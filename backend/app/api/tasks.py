@@ -1,9 +1,16 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import defer
 from app.models import TaskExecution, db
+from app.services.cancellation import request_cancel
+from app.services.admission import admission
+from app.api.admission import can_cancel_queued
+from app.services.execution_dedup import execution_coalescer
+from app.services.ansible_service import ansible_service
+from app.services.event_store import event_store
+from app.services.log_store import log_store
 from datetime import datetime, timedelta
-import os
 
 
 class TaskListResource(Resource):
@@ -20,7 +27,8 @@ class TaskListResource(Resource):
             start_date = request.args.get('start_date', '')
             end_date = request.args.get('end_date', '')
             
-            query = TaskExecution.query
+            # 列表不需要日志内容
+            query = TaskExecution.query.options(defer(TaskExecution.logs))
             
             # 状态筛选
             if status:
@@ -137,28 +145,175 @@ class TaskResource(Resource):
             return {'error': str(e)}, 500
 
 
+class TaskCancelResource(Resource):
+    """任务取消资源"""
+    
+    @jwt_required()
+    def post(self, task_id):
+        """取消排队中或运行中的任务
+
+        task_id可以是执行记录ID，也可以是Celery任务ID。执行记录在worker开始执行时才创建，
+        尚在准入队列或Celery队列中的执行只能通过Celery任务ID取消。
+        """
+        try:
+            if task_id.isdigit():
+                task = TaskExecution.query.get_or_404(int(task_id))
+                celery_task_id = task.task_id
+            else:
+                task = TaskExecution.query.filter_by(task_id=task_id).first()
+                celery_task_id = task_id
+            
+            if task is not None and task.status != 'running':
+                return {'error': f'Task is already {task.status}'}, 409
+            
+            # 还在准入队列中的执行与准入队列接口的权限一致
+            owner = admission.owner(celery_task_id) if task is None else None
+            if owner is not None and not can_cancel_queued(owner, get_jwt_identity()):
+                return {'error': 'Only the submitter or an admin can cancel this execution'}, 403
+            
+            # 既没有执行记录、也不在准入队列或已派发队列中的task_id视为不存在，不写入取消标记
+            if task is None and owner is None and not admission.dispatched(celery_task_id):
+                return {'error': 'Task not found'}, 404
+            
+            # 所有执行任务开始时和运行中都会检查取消标记，包括因主机被占用重新排队的任务，
+            # 因此不撤销Celery任务，由任务自身标记取消并释放主机锁、合并锁和准入名额
+            request_cancel(celery_task_id)
+            
+            # 还在准入队列中的执行直接移出队列
+            if admission.cancel(celery_task_id):
+                execution_coalescer.release(celery_task_id)
+                return {
+                    'task_id': celery_task_id,
+                    'status': 'cancelled',
+                    'message': 'Queued execution cancelled'
+                }
+            
+            return {
+                'task_id': celery_task_id,
+                'status': task.status if task is not None else 'queued',
+                'message': 'Task cancellation requested'
+            }, 202
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+
 class TaskLogsResource(Resource):
     """任务日志资源"""
     
     @jwt_required()
     def get(self, task_id):
-        """获取任务执行日志"""
+        """分段获取任务执行日志
+
+        支持的查询参数：
+        - since_offset / cursor：从字节偏移开始读取，返回的cursor用于继续读取
+        - tail：读取末尾N行
+        - start_line / end_line：按行号范围读取（从0开始，不含end_line）
+        - limit：单次返回的最大行数
+        - shard：分片执行的分片序号
+        """
+        try:
+            task = TaskExecution.query.get_or_404(task_id)
+            
+            ident = task.task_id
+            shard = request.args.get('shard', type=int)
+            if shard is not None:
+                ident = f'{task.task_id}-shard{shard}'
+            
+            # 旧执行没有分块日志，结束后从归档或执行记录转换一次
+            if task.status not in ('pending', 'running'):
+                log_store.ensure(ident, lambda: ansible_service.read_artifact(ident, 'stdout') or task.logs)
+            
+            if not log_store.exists(ident):
+                return {
+                    'task_id': task.task_id,
+                    'logs': [],
+                    'log_file_exists': False
+                }
+            
+            since_offset = request.args.get('since_offset', type=int)
+            if since_offset is None:
+                since_offset = request.args.get('cursor', type=int)
+            
+            chunk = log_store.read(
+                ident,
+                since_offset=since_offset,
+                tail=request.args.get('tail', type=int),
+                start_line=request.args.get('start_line', type=int),
+                end_line=request.args.get('end_line', type=int),
+                max_lines=request.args.get('limit', 1000, type=int)
+            )
+            
+            return {
+                'task_id': task.task_id,
+                'logs': chunk['lines'],
+                'first_line': chunk['first_line'],
+                'next_line': chunk['next_line'],
+                'cursor': chunk['next_offset'],
+                'total_lines': chunk['total_lines'],
+                'total_size': chunk['total_size'],
+                'complete': chunk['complete'],
+                'has_more': chunk['next_offset'] < chunk['total_size'] or not chunk['complete'],
+                'log_file_exists': True
+            }
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+
+class TaskEventsResource(Resource):
+    """任务事件资源"""
+    
+    @jwt_required()
+    def get(self, task_id):
+        """按主机、任务或事件类型查询执行事件"""
         try:
             task = TaskExecution.query.get_or_404(task_id)
+            limit = min(request.args.get('limit', 500, type=int), 5000)
+            
+            events = event_store.query(
+                task.id,
+                host=request.args.get('host'),
+                task=request.args.get('task'),
+                event=request.args.get('event'),
+                since_seq=request.args.get('since_seq', type=int)
+            ).limit(limit).all()
             
-            # 构建日志文件路径
-            log_dir = '/app/ansible_data/logs'
-            log_file = os.path.join(log_dir, f'{task.task_id}', 'stdout')
+            response = {
+                'task_id': task.task_id,
+                'events': [event.to_dict() for event in events],
+                'count': len(events)
+            }
+            
+            # 只查询失败主机
+            if request.args.get('failed_hosts', type=int):
+                response['failed_hosts'] = event_store.failed_hosts(task.id, task=request.args.get('task'))
+            
+            return response
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+
+class TaskOutputGroupsResource(Resource):
+    """任务输出分组资源"""
+    
+    @jwt_required()
+    def get(self, task_id):
+        """按输出合并主机结果，输出相同的主机归为一组"""
+        try:
+            task = TaskExecution.query.get_or_404(task_id)
+            limit = min(request.args.get('limit', 100, type=int), 1000)
+            offset = max(request.args.get('offset', 0, type=int), 0)
             
-            logs = []
-            if os.path.exists(log_file):
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    logs = f.readlines()
+            grouper = event_store.output_groups(task.id, task=request.args.get('task'))
+            groups = grouper.groups()
             
             return {
                 'task_id': task.task_id,
-                'logs': logs,
-                'log_file_exists': os.path.exists(log_file)
+                'host_count': grouper.host_count,
+                'group_count': len(groups),
+                'groups': groups[offset:offset + limit],
+                'offset': offset,
+                'limit': limit
             }
         except Exception as e:
             return {'error': str(e)}, 500
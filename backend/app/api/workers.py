@@ -0,0 +1,52 @@
+from flask import request
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+
+from app import celery
+
+
+class WorkerSSHSocketsResource(Resource):
+    """Worker SSH持久连接资源"""
+    
+    @jwt_required()
+    def get(self):
+        """列出所有worker上的持久化SSH套接字"""
+        try:
+            replies = celery.control.broadcast(
+                'list_ssh_control_sockets', reply=True, timeout=2.0
+            )
+            
+            workers = {}
+            for reply in replies or []:
+                for worker_name, data in reply.items():
+                    workers[worker_name] = data.get('sockets', [])
+            
+            return {
+                'workers': workers,
+                'total': sum(len(sockets) for sockets in workers.values())
+            }, 200
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    @jwt_required()
+    def delete(self):
+        """关闭所有worker上的持久化SSH主连接，可按主机过滤"""
+        try:
+            host = request.args.get('host')
+            arguments = {'host': host} if host else {}
+            
+            replies = celery.control.broadcast(
+                'expire_ssh_control_sockets', arguments=arguments, reply=True, timeout=10.0
+            )
+            
+            workers = {}
+            for reply in replies or []:
+                for worker_name, data in reply.items():
+                    workers[worker_name] = data.get('expired', 0)
+            
+            return {
+                'workers': workers,
+                'expired': sum(workers.values())
+            }, 200
+        except Exception as e:
+            return {'error': str(e)}, 500
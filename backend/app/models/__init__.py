@@ -15,6 +15,7 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default='user')  # admin, user, viewer
+    team = db.Column(db.String(50))  # 所属团队，执行配额和公平调度按团队计算
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
@@ -31,6 +32,7 @@ class User(db.Model):
             'username': self.username,
             'email': self.email,
             'role': self.role,
+            'team': self.team,
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'last_login': self.last_login.isoformat() if self.last_login else None
@@ -110,6 +112,7 @@ class Playbook(db.Model):
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     content = db.Column(db.Text, nullable=False)  # YAML内容
+    files = db.Column(db.JSON)  # 依赖文件（roles、vars、templates），相对路径 -> 内容
     variables = db.Column(db.JSON)  # 变量定义
     tags = db.Column(db.JSON)  # 标签
     is_template = db.Column(db.Boolean, default=False)
@@ -128,6 +131,7 @@ class Playbook(db.Model):
             'name': self.name,
             'description': self.description,
             'content': self.content,
+            'files': self.files or {},
             'variables': self.variables or {},
             'tags': self.tags or [],
             'is_template': self.is_template,
@@ -183,6 +187,11 @@ class TaskExecution(db.Model):
             'duration': self._calculate_duration()
         }
     
+    @property
+    def result_summary(self):
+        """执行摘要统计，事件明细见ExecutionEvent"""
+        return self.result
+    
     def _calculate_duration(self):
         if self.started_at and self.finished_at:
             delta = self.finished_at - self.started_at
@@ -190,6 +199,208 @@ class TaskExecution(db.Model):
         return None
 
 
+class ExecutionEvent(db.Model):
+    """执行事件模型（只追加）
+
+    每个runner事件一行，只保留主机、任务、事件类型、耗时和精简后的结果，
+    用于按执行、主机或任务查询，例如"哪些主机在任务X上失败"。
+    """
+    __tablename__ = 'execution_events'
+    __table_args__ = (
+        db.Index('idx_execution_events_execution_seq', 'execution_id', 'shard', 'seq', unique=True),
+        db.Index('idx_execution_events_execution_task', 'execution_id', 'task', 'event'),
+        db.Index('idx_execution_events_host', 'host', 'created_at'),
+    )
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    execution_id = db.Column(db.Integer, db.ForeignKey('task_executions.id', ondelete='CASCADE'), nullable=False)
+    shard = db.Column(db.SmallInteger, nullable=False, default=0)  # 分片序号，非分片执行为0
+    seq = db.Column(db.Integer, nullable=False)  # runner事件计数
+    event = db.Column(db.String(50), nullable=False)
+    host = db.Column(db.String(255))
+    play = db.Column(db.String(255))
+    task = db.Column(db.String(255))
+    changed = db.Column(db.Boolean, default=False)
+    duration = db.Column(db.Float)  # 秒
+    payload = db.Column(db.JSON)  # 精简后的模块结果
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # 关联
+    execution = db.relationship('TaskExecution', backref=db.backref(
+        'events', lazy='dynamic', passive_deletes=True
+    ))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'execution_id': self.execution_id,
+            'shard': self.shard,
+            'seq': self.seq,
+            'event': self.event,
+            'host': self.host,
+            'play': self.play,
+            'task': self.task,
+            'changed': self.changed,
+            'duration': self.duration,
+            'payload': self.payload,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class HostExecutionResult(db.Model):
+    """主机执行结果模型
+
+    每次执行每台主机一行，执行结束时批量写入，用于跨执行查询主机历史，
+    例如"最近7天哪些主机执行某个Playbook失败"。
+    """
+    __tablename__ = 'host_execution_results'
+    __table_args__ = (
+        db.Index('idx_host_execution_results_host', 'host_id', 'created_at'),
+        db.Index('idx_host_execution_results_playbook', 'playbook_id', 'created_at'),
+        db.Index('idx_host_execution_results_execution', 'execution_id'),
+    )
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    execution_id = db.Column(db.Integer, db.ForeignKey('task_executions.id', ondelete='CASCADE'), nullable=False)
+    host_id = db.Column(db.Integer, db.ForeignKey('hosts.id', ondelete='CASCADE'))
+    playbook_id = db.Column(db.Integer, db.ForeignKey('playbooks.id', ondelete='SET NULL'))
+    hostname = db.Column(db.String(255), nullable=False)
+    ok = db.Column(db.Integer, default=0)
+    changed = db.Column(db.Integer, default=0)
+    failed = db.Column(db.Integer, default=0)
+    unreachable = db.Column(db.Integer, default=0)
+    skipped = db.Column(db.Integer, default=0)
+    duration = db.Column(db.Float)  # 该主机所有任务耗时之和（秒）
+    last_failed_task = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # 关联
+    execution = db.relationship('TaskExecution', backref=db.backref(
+        'host_results', lazy='dynamic', passive_deletes=True
+    ))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'execution_id': self.execution_id,
+            'task_id': self.execution.task_id if self.execution else None,
+            'host_id': self.host_id,
+            'playbook_id': self.playbook_id,
+            'hostname': self.hostname,
+            'ok': self.ok,
+            'changed': self.changed,
+            'failed': self.failed,
+            'unreachable': self.unreachable,
+            'skipped': self.skipped,
+            'duration': self.duration,
+            'last_failed_task': self.last_failed_task,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class ExecutionSchedule(db.Model):
+    """定时执行模型
+
+    按cron表达式定时执行Playbook或Ad-hoc命令。实际执行时间在触发时间之后
+    按调度ID均匀错开（不超过jitter秒），避免大量计划在整点同时触发；
+    allow_overlap为False时上一次执行结束前跳过本次触发。
+    """
+    __tablename__ = 'execution_schedules'
+    __table_args__ = (
+        db.Index('idx_execution_schedules_due', 'enabled', 'next_run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    target_type = db.Column(db.String(20), nullable=False, default='playbook')  # playbook, adhoc
+    playbook_id = db.Column(db.Integer, db.ForeignKey('playbooks.id', ondelete='CASCADE'))
+    host_ids = db.Column(db.JSON)  # 目标主机，为空时为全部主机
+    module = db.Column(db.String(100))  # Ad-hoc模块
+    module_args = db.Column(db.Text)  # Ad-hoc模块参数
+    extra_vars = db.Column(db.JSON)
+    options = db.Column(db.JSON)  # Playbook执行参数（forks、strategy等）
+    cron_expression = db.Column(db.String(100), nullable=False)
+    timezone = db.Column(db.String(50), default='UTC')
+    jitter = db.Column(db.Integer, default=0)  # 错开窗口（秒）
+    allow_overlap = db.Column(db.Boolean, default=False)
+    enabled = db.Column(db.Boolean, default=True)
+    next_run_at = db.Column(db.DateTime)  # UTC，已包含错开时间
+    last_run_at = db.Column(db.DateTime)
+    last_task_id = db.Column(db.String(100))
+    last_status = db.Column(db.String(20))  # dispatched, coalesced, skipped, error
+    last_error = db.Column(db.Text)
+    skipped_runs = db.Column(db.Integer, default=0)  # 因上次执行未结束而跳过的次数
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 关联
+    playbook = db.relationship('Playbook', backref=db.backref('schedules', passive_deletes=True))
+    creator = db.relationship('User', backref='schedules')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'target_type': self.target_type,
+            'playbook_id': self.playbook_id,
+            'playbook_name': self.playbook.name if self.playbook else None,
+            'host_ids': self.host_ids or [],
+            'module': self.module,
+            'module_args': self.module_args,
+            'extra_vars': self.extra_vars or {},
+            'options': self.options or {},
+            'cron_expression': self.cron_expression,
+            'timezone': self.timezone,
+            'jitter': self.jitter,
+            'allow_overlap': self.allow_overlap,
+            'enabled': self.enabled,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+            'last_task_id': self.last_task_id,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'skipped_runs': self.skipped_runs,
+            'created_by': self.created_by,
+            'creator_name': self.creator.username if self.creator else None,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+class ExecutionQuota(db.Model):
+    """执行配额模型
+
+    按用户或团队限制同时运行的执行数和主机数，weight为公平调度权重。
+    scope为default的一行（subject为空）作为未单独配置时的默认配额。
+    """
+    __tablename__ = 'execution_quotas'
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'subject', name='uq_execution_quotas_scope_subject'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(20), nullable=False)  # user, team, default
+    subject = db.Column(db.String(80))  # 用户名或团队名
+    max_running = db.Column(db.Integer)  # 同时运行的执行数，为空表示不限制
+    max_hosts = db.Column(db.Integer)  # 同时运行的执行涉及的主机总数，为空表示不限制
+    weight = db.Column(db.Float, default=1.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'scope': self.scope,
+            'subject': self.subject,
+            'max_running': self.max_running,
+            'max_hosts': self.max_hosts,
+            'weight': self.weight,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
 class AuditLog(db.Model):
     """审计日志模型"""
     __tablename__ = 'audit_logs'
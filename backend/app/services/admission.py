@@ -0,0 +1,331 @@
+import json
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+
+from app import db
+from app.models import ExecutionQuota, Host, TaskExecution, User
+from app.services.execution_dedup import execution_coalescer, FINISHED_STATUSES
+from app.services.redis_client import get_redis
+
+
+PENDING_KEY = 'admission:pending'  # 排队中的执行，按虚拟完成时间排序
+ACTIVE_KEY = 'admission:active'  # 已派发未结束的执行
+FLOWS_KEY = 'admission:flows'  # 每个调度主体最后一个执行的虚拟完成时间
+STATS_KEY = 'admission:stats'
+LOCK_KEY = 'admission:lock'
+
+
+def _job_key(task_id: str) -> str:
+    return f'admission:job:{task_id}'
+
+
+class AdmissionRejected(Exception):
+    """执行超过配额，无法排队"""
+
+
+class AdmissionController:
+    """执行准入控制
+
+    执行任务不再直接提交到Celery，而是先进入准入队列：
+    - 按用户所在团队（没有团队时按用户）限制同时运行的执行数和主机数；
+    - 全局同时运行数不超过ADMISSION_CAPACITY，其中保留部分名额给小任务；
+    - 排队的执行按加权公平队列（自计时WFQ）排序，代价为1加上主机数折算，
+      小任务的虚拟完成时间更早，不会被其它团队的批量提交饿死。
+    执行结束时释放名额并派发后续排队的执行。
+    """
+
+    @property
+    def enabled(self) -> bool:
+        return current_app.config.get('ADMISSION_ENABLED', True)
+
+    @property
+    def capacity(self) -> int:
+        return current_app.config.get('ADMISSION_CAPACITY', 8)
+
+    @property
+    def reserved_slots(self) -> int:
+        return current_app.config.get('ADMISSION_RESERVED_SLOTS', 1)
+
+    @property
+    def small_job_hosts(self) -> int:
+        return current_app.config.get('ADMISSION_SMALL_JOB_HOSTS', 10)
+
+    @property
+    def host_cost_unit(self) -> int:
+        return current_app.config.get('ADMISSION_HOST_COST_UNIT', 50)
+
+    @property
+    def stale_timeout(self) -> int:
+        return current_app.config.get('ADMISSION_STALE_TIMEOUT', 6 * 3600)
+
+    def subject(self, user_id) -> Dict[str, Any]:
+        """用户对应的调度主体：有团队时为团队，否则为用户本身"""
+        user = User.query.get(user_id) if user_id else None
+        if user is not None and user.team:
+            return {'scope': 'team', 'name': user.team, 'key': f'team:{user.team}'}
+        name = user.username if user is not None else 'system'
+        return {'scope': 'user', 'name': name, 'key': f'user:{name}'}
+
+    def quota(self, scope: str, name: str) -> Dict[str, Any]:
+        """调度主体的配额，依次使用主体配额、默认配额行和配置中的默认值"""
+        row = ExecutionQuota.query.filter_by(scope=scope, subject=name).first()
+        if row is None:
+            row = ExecutionQuota.query.filter_by(scope='default').first()
+        if row is not None:
+            return {'max_running': row.max_running, 'max_hosts': row.max_hosts, 'weight': row.weight or 1.0}
+        return {
+            'max_running': current_app.config.get('ADMISSION_DEFAULT_MAX_RUNNING', 4) or None,
+            'max_hosts': current_app.config.get('ADMISSION_DEFAULT_MAX_HOSTS', 0) or None,
+            'weight': 1.0
+        }
+
+    def submit(self, task_name: str, kwargs: Dict[str, Any], task_id: str, user_id=None,
+               host_ids: Optional[List[int]] = None, slots: int = 1) -> Dict[str, Any]:
+        """提交一次执行，名额允许时立即派发，否则排队
+
+        返回排队状态（见position），立即派发时queued为False。
+        超过单个执行的主机数配额时抛出AdmissionRejected。
+        """
+        if not self.enabled:
+            self._send(task_name, kwargs, task_id)
+            return {'task_id': task_id, 'queued': False}
+
+        subject = self.subject(user_id)
+        quota = self.quota(subject['scope'], subject['name'])
+        host_count = len(set(host_ids)) if host_ids else db.session.query(Host.id).count()
+        if quota['max_hosts'] and host_count > quota['max_hosts']:
+            raise AdmissionRejected(
+                f'Execution targets {host_count} hosts, {subject["key"]} is limited to {quota["max_hosts"]}'
+            )
+
+        redis_client = get_redis()
+        with redis_client.lock(LOCK_KEY, timeout=30, blocking_timeout=10):
+            # 虚拟完成时间 = max(系统虚拟时间, 本主体上一个执行的完成时间) + 代价/权重
+            cost = 1 + host_count / self.host_cost_unit
+            virtual_time = float(redis_client.hget(STATS_KEY, 'virtual_time') or 0)
+            flow_finish = float(redis_client.hget(FLOWS_KEY, subject['key']) or 0)
+            finish = max(virtual_time, flow_finish) + cost / max(quota['weight'], 0.01)
+
+            redis_client.hset(_job_key(task_id), mapping={
+                'task_name': task_name,
+                'kwargs': json.dumps(kwargs),
+                'user_id': user_id or '',
+                'subject': subject['key'],
+                'scope': subject['scope'],
+                'name': subject['name'],
+                'hosts': host_count,
+                'slots': slots,
+                'finish': finish,
+                'submitted_at': time.time()
+            })
+            redis_client.hset(FLOWS_KEY, subject['key'], finish)
+            redis_client.zadd(PENDING_KEY, {task_id: finish})
+            self._pump(redis_client)
+
+        return self.position(task_id) or {'task_id': task_id, 'queued': False}
+
+    def release(self, task_id: str):
+        """执行结束，释放名额并派发排队的执行"""
+        if not self.enabled:
+            return
+        redis_client = get_redis()
+        with redis_client.lock(LOCK_KEY, timeout=30, blocking_timeout=10):
+            active = redis_client.hget(ACTIVE_KEY, task_id)
+            if active is not None:
+                redis_client.hdel(ACTIVE_KEY, task_id)
+                self._record_duration(redis_client, time.time() - json.loads(active)['started_at'])
+            self._pump(redis_client)
+
+    def pump(self) -> int:
+        """派发名额允许的排队执行，返回派发的数量"""
+        if not self.enabled:
+            return 0
+        redis_client = get_redis()
+        with redis_client.lock(LOCK_KEY, timeout=30, blocking_timeout=10):
+            return self._pump(redis_client)
+
+    def cancel(self, task_id: str) -> bool:
+        """取消排队中的执行，已派发的执行返回False"""
+        redis_client = get_redis()
+        with redis_client.lock(LOCK_KEY, timeout=30, blocking_timeout=10):
+            if not redis_client.zrem(PENDING_KEY, task_id):
+                return False
+            redis_client.delete(_job_key(task_id))
+            return True
+
+    def owner(self, task_id: str) -> Optional[str]:
+        """排队中的执行的提交用户ID，未在排队时返回None"""
+        redis_client = get_redis()
+        if redis_client.zscore(PENDING_KEY, task_id) is None:
+            return None
+        return redis_client.hget(_job_key(task_id), 'user_id') or ''
+
+    def dispatched(self, task_id: str) -> bool:
+        """执行是否已派发到Celery但尚未结束"""
+        return bool(get_redis().hexists(ACTIVE_KEY, task_id))
+
+    def position(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """排队中的执行的位置和预计等待时间，未在排队时返回None"""
+        redis_client = get_redis()
+        rank = redis_client.zrank(PENDING_KEY, task_id)
+        if rank is None:
+            return None
+        job = redis_client.hgetall(_job_key(task_id))
+        return self._describe(task_id, job, rank, self._usage(redis_client), self._avg_duration(redis_client), {})
+
+    def queue(self, subject: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """排队中的执行，按派发顺序排列，可按调度主体过滤"""
+        redis_client = get_redis()
+        usage = self._usage(redis_client)
+        avg_duration = self._avg_duration(redis_client)
+        quotas = {}
+        result = []
+        for rank, task_id in enumerate(redis_client.zrange(PENDING_KEY, 0, -1)):
+            job = redis_client.hgetall(_job_key(task_id))
+            if subject and job.get('subject') != subject:
+                continue
+            result.append(self._describe(task_id, job, rank, usage, avg_duration, quotas))
+            if len(result) >= limit:
+                break
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        redis_client = get_redis()
+        usage = self._usage(redis_client)
+        return {
+            'enabled': self.enabled,
+            'capacity': self.capacity,
+            'reserved_slots': self.reserved_slots,
+            'running': usage['slots'],
+            'pending': redis_client.zcard(PENDING_KEY),
+            'subjects': usage['subjects'],
+            'avg_duration': round(self._avg_duration(redis_client), 1)
+        }
+
+    def _pump(self, redis_client) -> int:
+        """在准入锁内按虚拟完成时间顺序派发，超过主体配额的执行跳过但不阻塞其它主体"""
+        self._reap(redis_client)
+        usage = self._usage(redis_client)
+        quotas = {}
+        dispatched = 0
+
+        for task_id in redis_client.zrange(PENDING_KEY, 0, -1):
+            if usage['slots'] >= self.capacity:
+                break
+            job = redis_client.hgetall(_job_key(task_id))
+            if not job:
+                redis_client.zrem(PENDING_KEY, task_id)
+                continue
+
+            if self._blocked_by(job, usage, quotas) is not None:
+                continue
+
+            redis_client.zrem(PENDING_KEY, task_id)
+            redis_client.delete(_job_key(task_id))
+            try:
+                self._send(job['task_name'], json.loads(job['kwargs']), task_id)
+            except Exception as e:
+                current_app.logger.error(f'Failed to dispatch execution {task_id}: {e}')
+                execution_coalescer.release(task_id)
+                continue
+
+            slots, hosts = int(job['slots']), int(job['hosts'])
+            redis_client.hset(ACTIVE_KEY, task_id, json.dumps({
+                'subject': job['subject'],
+                'slots': slots,
+                'hosts': hosts,
+                'started_at': time.time()
+            }))
+            # 自计时：系统虚拟时间推进到正在服务的执行的完成时间
+            redis_client.hset(STATS_KEY, 'virtual_time', job['finish'])
+            usage['slots'] += slots
+            subject_usage = usage['subjects'].setdefault(job['subject'], {'running': 0, 'hosts': 0})
+            subject_usage['running'] += 1
+            subject_usage['hosts'] += hosts
+            dispatched += 1
+
+        if not redis_client.zcard(PENDING_KEY):
+            # 队列清空后重置虚拟时间，避免数值无限增长
+            redis_client.delete(FLOWS_KEY)
+            redis_client.hset(STATS_KEY, 'virtual_time', 0)
+        return dispatched
+
+    def _blocked_by(self, job: Dict[str, str], usage: Dict[str, Any],
+                    quotas: Dict[str, Dict[str, Any]]) -> Optional[str]:
+        """执行暂时不能派发的原因，可以派发时返回None"""
+        slots, hosts = int(job['slots']), int(job['hosts'])
+        # 大任务不能占用为小任务保留的名额
+        limit = self.capacity if hosts <= self.small_job_hosts else self.capacity - self.reserved_slots
+        if usage['slots'] + slots > max(limit, 1) and usage['slots'] > 0:
+            return 'capacity'
+
+        if job['subject'] not in quotas:
+            quotas[job['subject']] = self.quota(job['scope'], job['name'])
+        quota = quotas[job['subject']]
+        subject_usage = usage['subjects'].get(job['subject'], {'running': 0, 'hosts': 0})
+        if quota['max_running'] and subject_usage['running'] >= quota['max_running']:
+            return 'running_quota'
+        if quota['max_hosts'] and subject_usage['hosts'] + hosts > quota['max_hosts']:
+            return 'host_quota'
+        return None
+
+    def _describe(self, task_id: str, job: Dict[str, str], rank: int, usage: Dict[str, Any],
+                  avg_duration: float, quotas: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        # 按全局名额的平均释放速度估算等待时间
+        return {
+            'task_id': task_id,
+            'queued': True,
+            'position': rank + 1,
+            'expected_wait': int(math.ceil((rank + 1) * avg_duration / max(self.capacity, 1))),
+            'blocked_by': self._blocked_by(job, usage, quotas) if job else None,
+            'subject': job.get('subject'),
+            'hosts': int(job.get('hosts', 0)),
+            'submitted_at': float(job.get('submitted_at', 0))
+        }
+
+    @staticmethod
+    def _usage(redis_client) -> Dict[str, Any]:
+        usage = {'slots': 0, 'subjects': {}}
+        for value in redis_client.hvals(ACTIVE_KEY):
+            active = json.loads(value)
+            usage['slots'] += active['slots']
+            subject_usage = usage['subjects'].setdefault(active['subject'], {'running': 0, 'hosts': 0})
+            subject_usage['running'] += 1
+            subject_usage['hosts'] += active['hosts']
+        return usage
+
+    def _reap(self, redis_client):
+        """清理已结束（例如worker崩溃未释放）或超时的名额"""
+        active = redis_client.hgetall(ACTIVE_KEY)
+        if not active:
+            return
+        finished = {row.task_id for row in db.session.query(TaskExecution.task_id).filter(
+            TaskExecution.task_id.in_(list(active)),
+            TaskExecution.status.in_(FINISHED_STATUSES)
+        )}
+        deadline = time.time() - self.stale_timeout
+        for task_id, value in active.items():
+            if task_id in finished or json.loads(value)['started_at'] < deadline:
+                redis_client.hdel(ACTIVE_KEY, task_id)
+
+    def _avg_duration(self, redis_client) -> float:
+        value = redis_client.hget(STATS_KEY, 'avg_duration')
+        return float(value) if value else current_app.config.get('ADMISSION_DEFAULT_DURATION', 60)
+
+    def _record_duration(self, redis_client, duration: float):
+        """执行耗时的指数移动平均，用于估算排队等待时间"""
+        average = self._avg_duration(redis_client)
+        redis_client.hset(STATS_KEY, 'avg_duration', average * 0.8 + duration * 0.2)
+
+    @staticmethod
+    def _send(task_name: str, kwargs: Dict[str, Any], task_id: str):
+        # 避免在创建应用时循环导入
+        from app import celery
+        celery.send_task(task_name, kwargs=kwargs, task_id=task_id)
+
+
+# 创建全局实例
+admission = AdmissionController()
@@ -3,6 +3,8 @@ import yaml
 import json
 import tempfile
 import shutil
+import uuid
+from contextlib import contextmanager
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
@@ -13,10 +15,39 @@ from ansible.parsing.dataloader import DataLoader
 from ansible.executor.playbook_executor import PlaybookExecutor
 from ansible.utils.display import Display
 
+from flask import current_app
+from sqlalchemy import case
+
 from app.models import Host, HostGroup, Playbook, TaskExecution
+from app.services.event_pipeline import EventPipeline
+from app.services.inventory_cache import inventory_cache
+from app.services.host_probe import HostProber
+from app.services.fact_cache import fact_cache
+from app.services.ssh_control import ssh_control
+from app.services.cancellation import CancellationToken
+from app.services.project_cache import project_cache, PLAYBOOK_FILE
+from app.services.artifact_archive import artifact_archive
+from app.services.log_store import log_store
+from app.services.warm_pool import warm_pool, WarmWorkerError, WarmWorkerStartError
 from app import db
 
 
+# 优先使用libyaml实现的C加载器
+YAML_SAFE_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# ping模块事件对应的主机状态
+PING_EVENT_STATUS = {
+    'runner_on_ok': 'online',
+    'runner_on_failed': 'offline',
+    'runner_on_unreachable': 'offline',
+}
+
+# 单次执行可调整的性能参数
+EXECUTION_STRATEGIES = ('linear', 'free', 'host_pinned')
+GATHERING_POLICIES = ('smart', 'implicit', 'explicit')
+EXECUTION_OPTION_KEYS = ('forks', 'strategy', 'serial', 'pipelining', 'gathering')
+
+
 class AnsibleService:
     """Ansible服务类，封装Ansible相关操作"""
     
@@ -25,68 +56,53 @@ class AnsibleService:
         self.inventory_dir = os.path.join(self.base_dir, 'inventory')
         self.playbook_dir = os.path.join(self.base_dir, 'playbooks')
         self.log_dir = os.path.join(self.base_dir, 'logs')
+        self.run_dir = os.path.join(self.base_dir, 'runs')
         
         # 确保目录存在
-        for directory in [self.base_dir, self.inventory_dir, self.playbook_dir, self.log_dir]:
+        for directory in [self.base_dir, self.inventory_dir, self.playbook_dir, self.log_dir, self.run_dir]:
             os.makedirs(directory, exist_ok=True)
     
-    def generate_inventory(self, host_ids: Optional[List[int]] = None) -> str:
-        """生成Ansible清单文件"""
-        inventory_data = {
-            '_meta': {
-                'hostvars': {}
-            }
-        }
-        
-        # 查询主机
-        query = Host.query
-        if host_ids:
-            query = query.filter(Host.id.in_(host_ids))
-        
-        hosts = query.all()
-        
-        # 按组分类主机
-        groups = {}
-        for host in hosts:
-            group_name = host.group.name if host.group else 'ungrouped'
-            
-            if group_name not in groups:
-                groups[group_name] = {
-                    'hosts': [],
-                    'vars': host.group.variables if host.group else {}
-                }
-            
-            # 添加主机到组
-            host_entry = {
-                'ansible_host': host.ip_address,
-                'ansible_port': host.port,
-                'ansible_user': host.username,
-            }
-            
-            # 添加认证信息
-            if host.password:
-                host_entry['ansible_password'] = host.password
-            elif host.private_key_path:
-                host_entry['ansible_private_key_file'] = host.private_key_path
-            
-            # 添加主机变量
-            if host.variables:
-                host_entry.update(host.variables)
-            
-            groups[group_name]['hosts'].append(host.hostname)
-            inventory_data['_meta']['hostvars'][host.hostname] = host_entry
-        
-        # 添加组到清单
-        for group_name, group_data in groups.items():
-            inventory_data[group_name] = {
-                'hosts': group_data['hosts'],
-                'vars': group_data['vars']
-            }
+    @contextmanager
+    def workspace(self, ident: Optional[str] = None):
+        """为单次执行创建独立的runner工作目录
+
+        每次执行拥有自己的private_data_dir（inventory、env、project、tmp），
+        并发执行之间不会互相覆盖清单文件。执行结束后工作目录被删除，
+        artifacts按ident写入共享的日志目录以便后续查询。
+        """
+        ident = ident or uuid.uuid4().hex
+        private_data_dir = os.path.join(self.run_dir, ident)
+        for sub_dir in ['inventory', 'env', 'project', 'tmp']:
+            os.makedirs(os.path.join(private_data_dir, sub_dir), exist_ok=True)
         
-        # 写入清单文件
-        inventory_file = os.path.join(self.inventory_dir, 'hosts.json')
+        try:
+            yield ident, private_data_dir
+        finally:
+            shutil.rmtree(private_data_dir, ignore_errors=True)
+    
+    def _workspace_runner_args(self, ident: str, private_data_dir: str) -> Dict[str, Any]:
+        """工作目录相关的runner参数"""
+        return {
+            'private_data_dir': private_data_dir,
+            'project_dir': os.path.join(private_data_dir, 'project'),
+            'artifact_dir': self.log_dir,
+            'ident': ident,
+            'envvars': dict(
+                ssh_control.runner_envvars(),
+                **fact_cache.runner_envvars(),
+                ANSIBLE_LOCAL_TEMP=os.path.join(private_data_dir, 'tmp'),
+            ),
+        }
+    
+    def generate_inventory(self, host_ids: Optional[List[int]] = None,
+                           inventory_dir: Optional[str] = None) -> str:
+        """生成Ansible清单文件
+
+        清单内容来自按主机集合和版本戳缓存的快照，只需写入文件。
+        """
+        inventory_file = os.path.join(inventory_dir or self.inventory_dir, 'hosts.json')
         with open(inventory_file, 'w') as f:
-            json.dump(inventory_data, f, indent=2)
+            f.write(inventory_cache.get(host_ids))
         
         return inventory_file
     
@@ -94,7 +110,7 @@ class AnsibleService:
         """验证Playbook语法"""
         try:
             # 解析YAML
-            playbook_data = yaml.safe_load(content)
+            playbook_data = yaml.load(content, Loader=YAML_SAFE_LOADER)
             
             if not isinstance(playbook_data, list):
                 return {
@@ -144,95 +160,281 @@ class AnsibleService:
                 'errors': [f'Validation error: {str(e)}']
             }
     
+    def validate_execution_options(self, options: Optional[Dict[str, Any]],
+                                   content: Optional[str] = None) -> List[str]:
+        """校验单次执行的性能参数，传入content时同时检查serial能否应用到该Playbook"""
+        options = options or {}
+        if not isinstance(options, dict):
+            return ['options must be an object']
+        
+        errors = []
+        unknown = set(options) - set(EXECUTION_OPTION_KEYS)
+        if unknown:
+            errors.append(f'Unknown execution options: {", ".join(sorted(unknown))}')
+        
+        max_forks = current_app.config.get('ANSIBLE_MAX_FORKS', 200)
+        forks = options.get('forks')
+        if forks is not None and (isinstance(forks, bool) or not isinstance(forks, int) or not 1 <= forks <= max_forks):
+            errors.append(f'forks must be an integer between 1 and {max_forks}')
+        
+        strategy = options.get('strategy')
+        if strategy is not None and strategy not in EXECUTION_STRATEGIES:
+            errors.append(f'strategy must be one of: {", ".join(EXECUTION_STRATEGIES)}')
+        
+        serial = options.get('serial')
+        if serial is not None:
+            valid_serial = (isinstance(serial, int) and not isinstance(serial, bool) and serial >= 1) or (
+                isinstance(serial, str) and serial.endswith('%') and serial[:-1].isdigit()
+                and 1 <= int(serial[:-1]) <= 100)
+            if not valid_serial:
+                errors.append('serial must be a positive integer or a percentage like "25%"')
+            elif content is not None:
+                try:
+                    self._serial_positions(content)
+                except ValueError as e:
+                    errors.append(str(e))
+        
+        pipelining = options.get('pipelining')
+        if pipelining is not None and not isinstance(pipelining, bool):
+            errors.append('pipelining must be a boolean')
+        
+        gathering = options.get('gathering')
+        if gathering is not None and gathering not in GATHERING_POLICIES:
+            errors.append(f'gathering must be one of: {", ".join(GATHERING_POLICIES)}')
+        
+        return errors
+    
+    def _apply_execution_options(self, runner_args: Dict[str, Any], options: Dict[str, Any]):
+        """把性能参数转换为runner参数和只对本次执行生效的环境变量"""
+        runner_args['forks'] = options.get('forks') or current_app.config.get('ANSIBLE_DEFAULT_FORKS', 20)
+        
+        envvars = runner_args['envvars']
+        if options.get('strategy'):
+            envvars['ANSIBLE_STRATEGY'] = options['strategy']
+        if options.get('pipelining') is not None:
+            envvars['ANSIBLE_PIPELINING'] = str(options['pipelining'])
+        if options.get('gathering'):
+            envvars['ANSIBLE_GATHERING'] = options['gathering']
+    
+    def _serial_positions(self, content: str) -> List[Any]:
+        """需要插入serial的play的第一个键的位置(行, 列)，无法安全改写时抛出ValueError
+
+        只解析节点结构不构造对象，因此!vault、!unsafe等自定义标签不影响解析。
+        """
+        try:
+            root = yaml.compose(content, Loader=yaml.SafeLoader)
+        except yaml.YAMLError as e:
+            raise ValueError(f'serial cannot be applied: {e}')
+        
+        if not isinstance(root, yaml.SequenceNode):
+            raise ValueError('serial cannot be applied: playbook must be a list of plays')
+        
+        positions = []
+        for play in root.value:
+            if not isinstance(play, yaml.MappingNode) or not play.value:
+                continue
+            keys = [key.value for key, _ in play.value]
+            if 'hosts' not in keys or 'serial' in keys:
+                continue
+            if play.flow_style:
+                raise ValueError('serial cannot be applied to plays written in flow style')
+            mark = play.value[0][0].start_mark
+            positions.append((mark.line, mark.column))
+        return positions
+    
+    def _apply_serial(self, content: str, serial: Any) -> str:
+        """为没有声明serial的play设置批次大小
+
+        在每个play的第一个键之前插入一行serial，不重新序列化Playbook，
+        注释、字段顺序和自定义标签都保持原样。
+        """
+        value = json.dumps(serial)
+        lines = content.splitlines(keepends=True)
+        for line, column in reversed(self._serial_positions(content)):
+            text = lines[line]
+            lines[line] = f'{text[:column]}serial: {value}\n{" " * column}{text[column:]}'
+        return ''.join(lines)
+    
     def execute_playbook(self, playbook_id: int, host_ids: Optional[List[int]] = None, 
-                        extra_vars: Optional[Dict] = None) -> str:
-        """执行Playbook"""
+                        extra_vars: Optional[Dict] = None, ident: Optional[str] = None,
+                        event_pipeline: Optional[EventPipeline] = None,
+                        options: Optional[Dict[str, Any]] = None,
+                        cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """执行Playbook
+
+        传入event_pipeline时使用流式模式：事件在执行过程中逐条交给流水线处理，
+        返回结果中不再包含完整的events和stdout，只保留统计信息和输出尾部。
+        options为单次执行的性能参数（forks、strategy、serial、pipelining、gathering），
+        只作用于本次执行，不修改全局ansible.cfg。
+        """
         playbook = Playbook.query.get(playbook_id)
         if not playbook:
             raise ValueError(f'Playbook {playbook_id} not found')
         
-        # 生成清单文件
-        inventory_file = self.generate_inventory(host_ids)
-        
-        # 创建临时Playbook文件
-        playbook_file = os.path.join(self.playbook_dir, f'playbook_{playbook_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.yml')
-        with open(playbook_file, 'w') as f:
-            f.write(playbook.content)
-        
-        # 准备执行参数
-        runner_args = {
-            'playbook': playbook_file,
-            'inventory': inventory_file,
-            'project_dir': self.base_dir,
-            'artifact_dir': self.log_dir,
-            'quiet': False,
-            'verbosity': 2,
-        }
+        options = options or {}
+        errors = self.validate_execution_options(options, playbook.content)
+        if errors:
+            raise ValueError('; '.join(errors))
         
-        if extra_vars:
-            runner_args['extravars'] = extra_vars
+        content = playbook.content
+        if options.get('serial') is not None:
+            content = self._apply_serial(content, options['serial'])
         
-        # 执行Playbook
-        try:
-            runner = ansible_runner.run(**runner_args)
+        # 项目目录按内容寻址缓存，相同版本的Playbook不会重复写入
+        with self.workspace(ident) as (ident, private_data_dir), \
+                project_cache.checkout(content, playbook.files) as project_dir:
+            # 生成清单文件
+            inventory_file = self.generate_inventory(
+                host_ids, inventory_dir=os.path.join(private_data_dir, 'inventory'))
             
-            # 返回执行结果
-            return {
-                'status': runner.status,
-                'rc': runner.rc,
-                'stdout': runner.stdout.read() if runner.stdout else '',
-                'stderr': runner.stderr.read() if runner.stderr else '',
-                'artifacts_dir': runner.artifact_dir,
-                'stats': runner.stats,
-                'events': list(runner.events)
-            }
+            # 准备执行参数
+            runner_args = self._workspace_runner_args(ident, private_data_dir)
+            runner_args.update({
+                'project_dir': project_dir,
+                'playbook': os.path.join(project_dir, PLAYBOOK_FILE),
+                'inventory': inventory_file,
+                'quiet': False,
+                'verbosity': 2,
+            })
+            self._apply_execution_options(runner_args, options)
             
-        except Exception as e:
-            return {
-                'status': 'failed',
-                'rc': 1,
-                'error': str(e),
-                'stdout': '',
-                'stderr': str(e)
-            }
-        finally:
-            # 清理临时文件
-            if os.path.exists(playbook_file):
-                os.remove(playbook_file)
+            if extra_vars:
+                runner_args['extravars'] = extra_vars
+            
+            # 执行Playbook
+            return self._run(runner_args, event_pipeline, cancel_token)
     
     def execute_ad_hoc(self, host_ids: List[int], module: str, args: str = '', 
-                      extra_vars: Optional[Dict] = None) -> Dict[str, Any]:
+                      extra_vars: Optional[Dict] = None, ident: Optional[str] = None,
+                      event_pipeline: Optional[EventPipeline] = None,
+                      forks: Optional[int] = None,
+                      cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """执行Ad-hoc命令"""
-        # 生成清单文件
-        inventory_file = self.generate_inventory(host_ids)
-        
-        # 准备执行参数
-        runner_args = {
-            'module': module,
-            'module_args': args,
-            'inventory': inventory_file,
-            'project_dir': self.base_dir,
-            'artifact_dir': self.log_dir,
-            'quiet': False,
-            'verbosity': 1,
-        }
+        with self.workspace(ident) as (ident, private_data_dir):
+            # 生成清单文件
+            inventory_file = self.generate_inventory(
+                host_ids, inventory_dir=os.path.join(private_data_dir, 'inventory'))
+            
+            # 准备执行参数
+            runner_args = self._workspace_runner_args(ident, private_data_dir)
+            runner_args.update({
+                'module': module,
+                'module_args': args,
+                'host_pattern': 'all',
+                'inventory': inventory_file,
+                'quiet': False,
+                'verbosity': 1,
+            })
+            
+            if forks:
+                runner_args['forks'] = forks
+            
+            if extra_vars:
+                runner_args['extravars'] = extra_vars
+            
+            # 启用预热进程池时在预热进程中执行，启动失败时退回到ansible-runner，
+            # 执行中途进程异常时与_run一样返回失败结果
+            if warm_pool.enabled:
+                try:
+                    return self._run_warm(inventory_file, module, args, extra_vars, forks,
+                                          event_pipeline, cancel_token)
+                except WarmWorkerStartError as e:
+                    current_app.logger.warning(f'Warm execution pool unavailable, falling back: {e}')
+                except WarmWorkerError as e:
+                    current_app.logger.error(f'Warm worker failed during execution: {e}')
+                    return {
+                        'status': 'failed',
+                        'rc': 1,
+                        'error': str(e),
+                        'stdout': event_pipeline.stdout_text() if event_pipeline is not None else '',
+                        'stderr': str(e),
+                        'engine': 'warm'
+                    }
+            
+            return self._run(runner_args, event_pipeline, cancel_token)
+    
+    def _run_warm(self, inventory_file: str, module: str, args: str = '',
+                  extra_vars: Optional[Dict] = None, forks: Optional[int] = None,
+                  event_pipeline: Optional[EventPipeline] = None,
+                  cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """在预热进程中执行ad-hoc命令，结果格式与_run一致"""
+        events = []
+        if event_pipeline is not None:
+            event_pipeline.start()
+            on_event = event_pipeline.event_handler
+        else:
+            on_event = events.append
+        
+        try:
+            result = warm_pool.run_ad_hoc(inventory_file, module, args, extra_vars, forks,
+                                          on_event=on_event, cancel_token=cancel_token)
+        finally:
+            if event_pipeline is not None:
+                event_pipeline.status_handler({'status': 'finished'})
+                event_pipeline.close()
+        
+        result['engine'] = 'warm'
+        if event_pipeline is not None:
+            result.update({
+                'stdout': event_pipeline.stdout_text(),
+                'stderr': '',
+                'event_count': event_pipeline.event_count,
+                'streamed': True
+            })
+        else:
+            result.update({
+                'stdout': '\n'.join(event['stdout'] for event in events if event.get('stdout')),
+                'stderr': result.get('error', ''),
+                'events': events
+            })
+        return result
+    
+    def _run(self, runner_args: Dict[str, Any],
+             event_pipeline: Optional[EventPipeline] = None,
+             cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """调用ansible-runner并整理执行结果"""
+        if cancel_token is not None:
+            cancel_token.attach(runner_args['private_data_dir'])
+            runner_args['cancel_callback'] = cancel_token
         
-        if extra_vars:
-            runner_args['extravars'] = extra_vars
+        if event_pipeline is not None:
+            runner_args['event_handler'] = event_pipeline.event_handler
+            runner_args['status_handler'] = event_pipeline.status_handler
+            # 流式模式下不在内存中保留runner输出
+            runner_args['quiet'] = True
+            event_pipeline.start()
         
         try:
             runner = ansible_runner.run(**runner_args)
             
-            return {
-                'status': runner.status,
-                'rc': runner.rc,
-                'stdout': runner.stdout.read() if runner.stdout else '',
-                'stderr': runner.stderr.read() if runner.stderr else '',
-                'stats': runner.stats,
-                'events': list(runner.events)
-            }
+            if event_pipeline is not None:
+                event_pipeline.close()
+                result = {
+                    'status': runner.status,
+                    'rc': runner.rc,
+                    'stdout': event_pipeline.stdout_text(),
+                    'stderr': '',
+                    'stats': runner.stats,
+                    'event_count': event_pipeline.event_count,
+                    'streamed': True
+                }
+            else:
+                # 返回执行结果
+                result = {
+                    'status': runner.status,
+                    'rc': runner.rc,
+                    'stdout': runner.stdout.read() if runner.stdout else '',
+                    'stderr': runner.stderr.read() if runner.stderr else '',
+                    'stats': runner.stats,
+                    'events': list(runner.events)
+                }
+            
+            result.update(self._archive_artifacts(runner.config.artifact_dir, runner_args.get('ident')))
+            return result
             
         except Exception as e:
+            if event_pipeline is not None:
+                event_pipeline.close()
             return {
                 'status': 'failed',
                 'rc': 1,
@@ -261,8 +463,113 @@ class AnsibleService:
         
         return result
     
-    def get_ansible_facts(self, host_id: int) -> Dict[str, Any]:
-        """获取主机facts信息"""
+    def check_hosts_connectivity(self, host_ids: List[int], forks: Optional[int] = None,
+                                 prober: Optional[HostProber] = None) -> Dict[str, Any]:
+        """批量检查主机连接性
+
+        一批主机只调用一次runner，按runner_on_ok/runner_on_unreachable等事件
+        判断每台主机的状态，并用一条UPDATE语句批量写回状态。
+        传入prober时先做TCP/SSH banner预探测，探测失败的主机直接标记为离线，
+        只有通过探测的主机才执行Ansible ping。
+        """
+        hosts = db.session.query(Host.id, Host.hostname, Host.ip_address, Host.port, Host.status).filter(
+            Host.id.in_(host_ids)
+        ).all()
+        if not hosts:
+            return {'checked': 0, 'counts': {}, 'changes': []}
+        
+        new_status = {}
+        candidates = hosts
+        
+        if prober is not None:
+            probe_results = prober.probe({host.id: (host.ip_address, host.port) for host in hosts})
+            for host in hosts:
+                if not probe_results[host.id]['reachable']:
+                    new_status[host.id] = 'offline'
+            candidates = [host for host in hosts if host.id not in new_status]
+        
+        runner_status = None
+        if candidates:
+            outcomes = {}
+            
+            def collect(events):
+                for event in events:
+                    status = PING_EVENT_STATUS.get(event.get('event'))
+                    if status:
+                        outcomes[event.get('event_data', {}).get('host')] = status
+            
+            result = self.execute_ad_hoc(
+                [host.id for host in candidates], 'ping',
+                event_pipeline=EventPipeline(sinks=[collect]),
+                forks=forks
+            )
+            runner_status = result['status']
+            
+            # 没有任何结果事件的主机状态未知
+            for host in candidates:
+                new_status[host.id] = outcomes.get(host.hostname, 'unknown')
+        
+        self._bulk_update_status(new_status)
+        
+        counts = {}
+        changes = []
+        for host in hosts:
+            status = new_status[host.id]
+            counts[status] = counts.get(status, 0) + 1
+            if status != host.status:
+                changes.append({
+                    'host_id': host.id,
+                    'hostname': host.hostname,
+                    'previous': host.status,
+                    'status': status
+                })
+        
+        return {
+            'checked': len(hosts),
+            'counts': counts,
+            'changes': changes,
+            'probed_offline': len(hosts) - len(candidates),
+            'runner_status': runner_status
+        }
+    
+    def probe_hosts(self, host_ids: List[int], prober: Optional[HostProber] = None) -> Dict[int, Dict[str, Any]]:
+        """只做TCP/SSH banner探测并写回主机状态"""
+        prober = prober or HostProber()
+        hosts = db.session.query(Host.id, Host.ip_address, Host.port).filter(
+            Host.id.in_(host_ids)
+        ).all()
+        
+        results = prober.probe({host.id: (host.ip_address, host.port) for host in hosts})
+        self._bulk_update_status({
+            host_id: 'online' if result['reachable'] else 'offline'
+            for host_id, result in results.items()
+        })
+        
+        return results
+    
+    def _bulk_update_status(self, new_status: Dict[int, str]):
+        """用一条UPDATE语句批量写回主机状态"""
+        if not new_status:
+            return
+        
+        Host.query.filter(Host.id.in_(list(new_status))).update({
+            Host.status: case(new_status, value=Host.id),
+            Host.last_check: datetime.utcnow(),
+            # 状态检查不改变主机配置，保留updated_at
+            Host.updated_at: Host.updated_at,
+        }, synchronize_session=False)
+        db.session.commit()
+    
+    def get_ansible_facts(self, host_id: int, refresh: bool = False) -> Dict[str, Any]:
+        """获取主机facts信息，优先使用fact cache中未过期的facts"""
+        if not refresh:
+            host = Host.query.get(host_id)
+            if host:
+                cached = fact_cache.get(host.hostname)
+                if cached:
+                    return cached
+        
+        # setup模块的结果会同时写入fact cache
         result = self.execute_ad_hoc([host_id], 'setup')
         
         if result['status'] == 'successful':
@@ -300,30 +607,45 @@ class AnsibleService:
         
         return common_modules
     
-    def cleanup_old_artifacts(self, days: int = 7):
-        """清理旧的执行日志和临时文件"""
-        import time
-        
-        cutoff_time = time.time() - (days * 24 * 60 * 60)
-        
-        for root, dirs, files in os.walk(self.log_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if os.path.getmtime(file_path) < cutoff_time:
-                    try:
-                        os.remove(file_path)
-                    except OSError:
-                        pass
-        
-        # 清理空目录
-        for root, dirs, files in os.walk(self.log_dir, topdown=False):
-            for dir_name in dirs:
-                dir_path = os.path.join(root, dir_name)
-                try:
-                    if not os.listdir(dir_path):
-                        os.rmdir(dir_path)
-                except OSError:
-                    pass
+    def _archive_artifacts(self, artifacts_dir: str, ident: Optional[str]) -> Dict[str, Any]:
+        """把本次执行的artifact目录打包为压缩归档，失败时保留原目录"""
+        if not ident:
+            return {'artifacts_dir': artifacts_dir}
+        
+        try:
+            manifest = artifact_archive.pack(artifacts_dir, ident)
+        except OSError as e:
+            current_app.logger.warning(f'Failed to archive artifacts of {ident}: {e}')
+            manifest = None
+        
+        if not manifest:
+            return {'artifacts_dir': artifacts_dir}
+        return {'artifacts_archive': ident, 'event_files': len(manifest['events'])}
+    
+    def read_artifact(self, ident: str, name: str = 'stdout') -> Optional[str]:
+        """读取执行的artifact文件，优先从归档读取"""
+        data = artifact_archive.read(ident, name)
+        if data is not None:
+            return data.decode('utf-8', errors='replace')
+        
+        # 尚未归档（例如仍在执行）时读取原始目录
+        path = os.path.join(self.log_dir, ident, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+    
+    def cleanup_old_artifacts(self, days: Optional[int] = None):
+        """清理旧的执行归档和未归档的artifact目录
+
+        归档按天分目录存放，只需删除过期的日期目录，不遍历文件树。
+        """
+        days = artifact_archive.retention_days if days is None else days
+        return {
+            'archive_days_removed': artifact_archive.purge(days),
+            'raw_dirs_removed': artifact_archive.purge_raw(self.log_dir, days),
+            'task_logs_removed': log_store.purge(days)
+        }
 
 
 # 创建全局实例
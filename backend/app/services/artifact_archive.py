@@ -0,0 +1,198 @@
+import json
+import os
+import shutil
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional
+
+from flask import current_app
+
+
+MANIFEST_SUFFIX = '.idx.json'
+PACK_SUFFIX = '.pack'
+DAY_FORMAT = '%Y%m%d'
+
+# 压缩时每次读取的块大小，大文件不整体读入内存
+CHUNK_SIZE = 1024 * 1024
+
+
+def _event_sort_key(name: str):
+    """job_events文件名以事件计数开头，按计数排序"""
+    base = os.path.basename(name)
+    prefix = base.split('-', 1)[0]
+    return (0, int(prefix)) if prefix.isdigit() else (1, base)
+
+
+class ArtifactArchive:
+    """执行artifacts归档
+
+    执行结束后把runner的artifact目录打包为每次执行一个文件：每个成员单独
+    zlib压缩后顺序拼接，清单索引记录各成员（stdout、每个事件、status等）
+    的偏移量，读取时可以直接定位单个成员。归档按天分目录存放，
+    保留期清理只需删除过期的日期目录，无需遍历文件树。
+    """
+
+    def __init__(self, default_dir: str = '/app/ansible_data/archives'):
+        self.default_dir = default_dir
+
+    @property
+    def root(self) -> str:
+        return current_app.config.get('ARTIFACT_ARCHIVE_DIR') or self.default_dir
+
+    @property
+    def retention_days(self) -> int:
+        return current_app.config.get('ARTIFACT_RETENTION_DAYS', 7)
+
+    def pack(self, artifact_dir: str, ident: str, remove_source: bool = True) -> Optional[Dict[str, Any]]:
+        """打包一次执行的artifact目录并返回清单"""
+        if not os.path.isdir(artifact_dir):
+            return None
+
+        day_dir = os.path.join(self.root, datetime.utcnow().strftime(DAY_FORMAT))
+        os.makedirs(day_dir, exist_ok=True)
+        pack_path = os.path.join(day_dir, f'{ident}{PACK_SUFFIX}')
+        manifest_path = os.path.join(day_dir, f'{ident}{MANIFEST_SUFFIX}')
+
+        names = []
+        for root, dirs, files in os.walk(artifact_dir):
+            for file_name in files:
+                names.append(os.path.relpath(os.path.join(root, file_name), artifact_dir))
+
+        event_names = {name for name in names if name.startswith('job_events' + os.sep)}
+        events = sorted(event_names, key=_event_sort_key)
+        others = sorted(name for name in names if name not in event_names)
+
+        manifest = {
+            'ident': ident,
+            'created_at': datetime.utcnow().isoformat(),
+            'pack': os.path.basename(pack_path),
+            'files': {},
+            'events': []
+        }
+
+        tmp_path = f'{pack_path}.tmp'
+        offset = 0
+        with open(tmp_path, 'wb') as pack:
+            for name in others + events:
+                length, size = self._write_member(pack, os.path.join(artifact_dir, name))
+                entry = {'offset': offset, 'length': length, 'size': size}
+                offset += length
+
+                if name in event_names:
+                    manifest['events'].append(dict(entry, name=os.path.basename(name)))
+                else:
+                    manifest['files'][name] = entry
+                    # 状态和返回码很小，直接写入清单
+                    if name in ('status', 'rc'):
+                        with open(os.path.join(artifact_dir, name), 'rb') as f:
+                            manifest[name] = f.read().decode('utf-8', errors='replace').strip()
+
+        os.replace(tmp_path, pack_path)
+
+        # 清单最后写入，存在即表示归档完整
+        with open(f'{manifest_path}.tmp', 'w') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+        os.replace(f'{manifest_path}.tmp', manifest_path)
+
+        if remove_source:
+            shutil.rmtree(artifact_dir, ignore_errors=True)
+
+        return manifest
+
+    @staticmethod
+    def _write_member(pack, path: str):
+        """分块压缩一个文件并追加到归档，返回(压缩后长度, 原始大小)"""
+        compressor = zlib.compressobj(6)
+        length = size = 0
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                size += len(chunk)
+                compressed = compressor.compress(chunk)
+                pack.write(compressed)
+                length += len(compressed)
+        compressed = compressor.flush()
+        pack.write(compressed)
+        return length + len(compressed), size
+
+    def locate(self, ident: str) -> Optional[str]:
+        """按ident查找清单文件，从最近的日期目录开始查找"""
+        for day in self._days(reverse=True):
+            manifest_path = os.path.join(self.root, day, f'{ident}{MANIFEST_SUFFIX}')
+            if os.path.exists(manifest_path):
+                return manifest_path
+        return None
+
+    def manifest(self, ident: str) -> Optional[Dict[str, Any]]:
+        """读取清单"""
+        manifest_path = self.locate(ident)
+        if not manifest_path:
+            return None
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        manifest['_dir'] = os.path.dirname(manifest_path)
+        return manifest
+
+    def read(self, ident: str, name: str) -> Optional[bytes]:
+        """读取归档中的单个文件，例如stdout"""
+        manifest = self.manifest(ident)
+        if not manifest or name not in manifest['files']:
+            return None
+        return self._read_entry(manifest, manifest['files'][name])
+
+    def iter_events(self, ident: str, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """按顺序读取归档中的事件"""
+        manifest = self.manifest(ident)
+        if not manifest:
+            return
+        pack_path = os.path.join(manifest['_dir'], manifest['pack'])
+        with open(pack_path, 'rb') as pack:
+            for entry in manifest['events'][start:]:
+                pack.seek(entry['offset'])
+                yield json.loads(zlib.decompress(pack.read(entry['length'])))
+
+    def purge(self, days: Optional[int] = None) -> int:
+        """删除超过保留期的日期目录，返回删除的目录数"""
+        days = self.retention_days if days is None else days
+        cutoff = (datetime.utcnow() - timedelta(days=days)).strftime(DAY_FORMAT)
+        removed = 0
+        for day in self._days():
+            if day < cutoff:
+                shutil.rmtree(os.path.join(self.root, day), ignore_errors=True)
+                removed += 1
+        return removed
+
+    def purge_raw(self, log_dir: str, days: Optional[int] = None) -> int:
+        """删除未归档的旧artifact目录，只检查顶层目录的修改时间"""
+        days = self.retention_days if days is None else days
+        cutoff = time.time() - days * 24 * 3600
+        removed = 0
+        try:
+            entries = list(os.scandir(log_dir))
+        except OSError:
+            return removed
+
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def _read_entry(self, manifest: Dict[str, Any], entry: Dict[str, Any]) -> bytes:
+        with open(os.path.join(manifest['_dir'], manifest['pack']), 'rb') as pack:
+            pack.seek(entry['offset'])
+            return zlib.decompress(pack.read(entry['length']))
+
+    def _days(self, reverse: bool = False):
+        try:
+            days = [name for name in os.listdir(self.root) if name.isdigit() and len(name) == 8]
+        except OSError:
+            return []
+        return sorted(days, reverse=reverse)
+
+
+# 创建全局实例
+artifact_archive = ArtifactArchive()
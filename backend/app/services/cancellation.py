@@ -0,0 +1,89 @@
+import os
+import signal
+import time
+
+import psutil
+
+from app.services.redis_client import get_redis
+
+
+# 取消标记保留时间（秒）
+CANCEL_FLAG_TTL = 24 * 3600
+
+
+def _cancel_key(task_id: str) -> str:
+    return f'execution:{task_id}:cancel'
+
+
+def request_cancel(task_id: str):
+    """标记执行需要取消，运行中的runner通过cancel_callback感知"""
+    get_redis().set(_cancel_key(task_id), '1', ex=CANCEL_FLAG_TTL)
+
+
+def is_cancel_requested(task_id: str) -> bool:
+    """执行是否已被请求取消"""
+    return bool(get_redis().exists(_cancel_key(task_id)))
+
+
+class CancellationToken:
+    """ansible-runner的cancel_callback
+
+    按固定间隔检查Redis中的取消标记。一旦取消，直接终止本次执行的
+    ansible进程组（包括所有fork出的worker进程），让worker立即空闲。
+    """
+
+    def __init__(self, task_id: str, check_interval: float = 1.0, kill_timeout: float = 5.0):
+        self.task_id = task_id
+        self.check_interval = check_interval
+        self.kill_timeout = kill_timeout
+        self.private_data_dir = None
+        self.cancelled = False
+        self._last_check = 0.0
+
+    def attach(self, private_data_dir: str):
+        """关联执行工作目录，用于定位本次执行的ansible进程"""
+        self.private_data_dir = private_data_dir
+
+    def __call__(self) -> bool:
+        if self.cancelled:
+            return True
+
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+
+        if is_cancel_requested(self.task_id):
+            self.cancelled = True
+            self.kill_process_group()
+        return self.cancelled
+
+    def kill_process_group(self):
+        """终止本次执行的ansible进程组"""
+        leaders = self._find_leaders()
+        for process in leaders:
+            try:
+                os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+        gone, alive = psutil.wait_procs(leaders, timeout=self.kill_timeout)
+        for process in alive:
+            try:
+                os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    def _find_leaders(self):
+        """查找命令行引用本次工作目录的子进程"""
+        if not self.private_data_dir:
+            return []
+
+        leaders = []
+        for process in psutil.Process().children(recursive=False):
+            try:
+                if any(self.private_data_dir in arg for arg in process.cmdline()):
+                    leaders.append(process)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return leaders
@@ -0,0 +1,156 @@
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import current_app
+
+
+# 队列结束标记
+_SENTINEL = object()
+
+
+class EventPipeline:
+    """ansible-runner事件流水线
+
+    runner的event_handler/status_handler在执行线程中把事件放入有界队列，
+    后台消费线程按批次把事件交给各个sink（持久化、进度、WebSocket推送）。
+    队列满时生产者阻塞等待，因此无论执行规模多大，内存占用都是有界的。
+    """
+
+    def __init__(self, sinks: Optional[List[Callable[[List[Dict[str, Any]]], None]]] = None,
+                 maxsize: int = 1000, batch_size: int = 100, flush_interval: float = 0.25,
+                 stdout_tail_lines: int = 200):
+        self.sinks = list(sinks or [])
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.event_count = 0
+        self.last_status = None
+        self.errors = deque(maxlen=20)
+        self.stdout_tail = deque(maxlen=stdout_tail_lines)
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._app = None
+
+    def add_sink(self, sink: Callable[[List[Dict[str, Any]]], None]):
+        """添加事件消费者"""
+        self.sinks.append(sink)
+
+    def start(self):
+        """启动后台消费线程"""
+        if self._thread is not None:
+            return self
+        # 消费线程需要独立的应用上下文（和数据库会话）
+        try:
+            self._app = current_app._get_current_object()
+        except RuntimeError:
+            self._app = None
+        self._thread = threading.Thread(target=self._consume, name='ansible-event-pipeline', daemon=True)
+        self._thread.start()
+        return self
+
+    def event_handler(self, event: Dict[str, Any]) -> bool:
+        """ansible-runner event_handler回调"""
+        self.event_count += 1
+        stdout = event.get('stdout')
+        if stdout:
+            self.stdout_tail.extend(stdout.splitlines())
+        self._queue.put(event)
+        # 返回True让runner继续把事件写入artifact目录
+        return True
+
+    def status_handler(self, status_data: Dict[str, Any], runner_config=None):
+        """ansible-runner status_handler回调"""
+        self.last_status = status_data.get('status')
+        self._queue.put({'event': 'runner_status', 'status': self.last_status,
+                         'runner_ident': status_data.get('runner_ident')})
+
+    def close(self, timeout: Optional[float] = None):
+        """等待队列中的事件全部处理完毕并停止消费线程"""
+        if self._thread is None:
+            return
+        self._queue.put(_SENTINEL)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stdout_text(self) -> str:
+        """返回最近的stdout输出"""
+        return '\n'.join(self.stdout_tail)
+
+    def _consume(self):
+        if self._app is not None:
+            with self._app.app_context():
+                self._consume_loop()
+        else:
+            self._consume_loop()
+
+    def _consume_loop(self):
+        batch = []
+        done = False
+        while not done:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                if item is _SENTINEL:
+                    done = True
+                else:
+                    batch.append(item)
+                    # 尽量取满一个批次
+                    while len(batch) < self.batch_size:
+                        item = self._queue.get_nowait()
+                        if item is _SENTINEL:
+                            done = True
+                            break
+                        batch.append(item)
+            except queue.Empty:
+                pass
+
+            if batch:
+                self._dispatch(batch)
+                batch = []
+
+            # 空闲时也让定时刷新的sink有机会输出缓冲内容
+            self._tick()
+
+        # 通知需要收尾的sink（例如封存日志分块）
+        for sink in self.sinks:
+            close = getattr(sink, 'close', None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                self.errors.append(str(e))
+                if self._app is not None:
+                    self._app.logger.exception('Event pipeline sink close failed')
+
+    def _tick(self):
+        for sink in self.sinks:
+            tick = getattr(sink, 'tick', None)
+            if tick is None:
+                continue
+            try:
+                tick()
+            except Exception as e:
+                self.errors.append(str(e))
+
+    @staticmethod
+    def _rollback():
+        # 避免在创建应用时循环导入
+        from app import db
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+
+    def _dispatch(self, batch: List[Dict[str, Any]]):
+        for sink in self.sinks:
+            try:
+                sink(batch)
+            except Exception as e:
+                # sink失败不能阻塞执行本身
+                self.errors.append(str(e))
+                if self._app is not None:
+                    self._app.logger.exception('Event pipeline sink failed')
+                    # 失败的sink可能留下未回滚的事务，回滚后其它sink和后续批次才能继续写库
+                    self._rollback()
@@ -0,0 +1,125 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.models import ExecutionEvent, TaskExecution
+from app.services.output_groups import HOST_RESULT_STATUS, OutputGrouper, host_result
+
+
+# 不写入事件表的事件：verbose只有stdout文本，runner_status由流水线产生
+SKIPPED_EVENTS = ('verbose', 'runner_status')
+
+# 模块结果中保留的字段
+PAYLOAD_KEYS = ('msg', 'rc', 'failed', 'skipped', 'unreachable', 'skip_reason', 'cmd', 'stdout', 'stderr')
+
+# 单个字段的最大长度，完整输出保存在artifact归档中
+PAYLOAD_VALUE_LIMIT = 2048
+
+
+def _truncate(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > PAYLOAD_VALUE_LIMIT:
+        return value[:PAYLOAD_VALUE_LIMIT] + '...'
+    return value
+
+
+def compact_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """把runner事件转换为事件表的一行，不需要保存的事件返回None"""
+    event_type = event.get('event')
+    if not event_type or event_type in SKIPPED_EVENTS:
+        return None
+
+    event_data = event.get('event_data') or {}
+    res = event_data.get('res') or {}
+    payload = {key: _truncate(res[key]) for key in PAYLOAD_KEYS if key in res and res[key] not in (None, '')}
+
+    return {
+        'seq': event.get('counter') or 0,
+        'event': event_type,
+        'host': event_data.get('host'),
+        'play': (event_data.get('play') or '')[:255] or None,
+        'task': (event_data.get('task') or '')[:255] or None,
+        'changed': bool(res.get('changed')),
+        'duration': event_data.get('duration'),
+        'payload': payload or None,
+    }
+
+
+class ExecutionEventStore:
+    """执行事件存储
+
+    事件按批追加写入execution_events表，每批一条多行INSERT。
+    TaskExecution只保留摘要统计，事件明细通过本类按执行、主机或任务查询。
+    """
+
+    def append(self, execution_id: int, events: List[Dict[str, Any]], shard: int = 0) -> int:
+        """追加一批事件，返回写入的行数"""
+        now = datetime.utcnow()
+        rows = []
+        for event in events:
+            row = compact_event(event)
+            if row is None:
+                continue
+            row.update(execution_id=execution_id, shard=shard, created_at=now)
+            rows.append(row)
+
+        if rows:
+            # 任务被重新投递时会重放相同序号的事件，已写入的行直接跳过
+            statement = insert(ExecutionEvent.__table__).on_conflict_do_nothing(
+                index_elements=['execution_id', 'shard', 'seq']
+            )
+            try:
+                db.session.execute(statement, rows)
+                db.session.commit()
+            except Exception:
+                # 回滚失败的事务，否则同一会话后续的写库都会失败
+                db.session.rollback()
+                raise
+        return len(rows)
+
+    def query(self, execution_id: int, host: Optional[str] = None, task: Optional[str] = None,
+              event: Optional[str] = None, since_seq: Optional[int] = None):
+        """按条件查询一次执行的事件"""
+        query = ExecutionEvent.query.filter(ExecutionEvent.execution_id == execution_id)
+        if host:
+            query = query.filter(ExecutionEvent.host == host)
+        if task:
+            query = query.filter(ExecutionEvent.task == task)
+        if event:
+            query = query.filter(ExecutionEvent.event == event)
+        if since_seq is not None:
+            query = query.filter(ExecutionEvent.seq > since_seq)
+        return query.order_by(ExecutionEvent.shard, ExecutionEvent.seq)
+
+    def failed_hosts(self, execution_id: int, task: Optional[str] = None) -> List[str]:
+        """一次执行中失败或不可达的主机，可限定任务"""
+        query = db.session.query(ExecutionEvent.host).filter(
+            ExecutionEvent.execution_id == execution_id,
+            ExecutionEvent.event.in_(('runner_on_failed', 'runner_on_unreachable'))
+        )
+        if task:
+            query = query.filter(ExecutionEvent.task == task)
+        return [row.host for row in query.distinct()]
+
+    def output_groups(self, execution_id: int, task: Optional[str] = None,
+                      max_bytes: int = PAYLOAD_VALUE_LIMIT) -> OutputGrouper:
+        """按输出合并一次执行中各主机的结果，输出为事件表中保存的截断内容"""
+        query = self.query(execution_id, task=task).filter(ExecutionEvent.event.in_(list(HOST_RESULT_STATUS)))
+        grouper = OutputGrouper(max_bytes)
+        for row in query.yield_per(1000):
+            host, result, output = host_result({
+                'event': row.event,
+                'event_data': {'host': row.host, 'res': dict(row.payload or {}, changed=row.changed)}
+            })
+            grouper.add(host, result['status'], output, result['rc'])
+        return grouper
+
+    def execution_id(self, task_id: str) -> Optional[int]:
+        """按Celery任务ID查找执行记录ID"""
+        row = db.session.query(TaskExecution.id).filter(TaskExecution.task_id == task_id).first()
+        return row.id if row else None
+
+
+# 创建全局实例
+event_store = ExecutionEventStore()
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import uuid
+from typing import Optional, Tuple
+
+from flask import current_app
+
+from app.models import TaskExecution
+from app.services.redis_client import get_redis
+from app.services.project_cache import project_key
+
+
+# 仅当key仍指向本任务时才删除
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+FINISHED_STATUSES = ('success', 'failed', 'cancelled')
+
+
+def execution_fingerprint(content: str, host_ids=None, extra_vars=None, options=None, shards=None,
+                          files=None) -> str:
+    """按Playbook内容（含依赖文件）、目标主机和参数计算执行指纹"""
+    payload = json.dumps({
+        'content': project_key(content, files),
+        'host_ids': sorted(set(host_ids or [])),
+        'extra_vars': extra_vars or {},
+        'options': options or {},
+        'shards': shards or 1
+    }, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ExecutionCoalescer:
+    """相同执行合并
+
+    同一指纹的执行在排队或运行期间只会存在一个，重复请求直接返回已有的task_id。
+    调用方还可以提供幂等键，同一用户同一幂等键在有效期内总是返回同一个task_id。
+    """
+
+    @property
+    def lock_ttl(self) -> int:
+        return current_app.config.get('EXECUTION_DEDUP_TTL', 6 * 3600)
+
+    @property
+    def idempotency_ttl(self) -> int:
+        return current_app.config.get('IDEMPOTENCY_KEY_TTL', 24 * 3600)
+
+    def claim(self, fingerprint: str, user_id=None, idempotency_key: Optional[str] = None) -> Tuple[str, bool]:
+        """为一次执行申请task_id
+
+        返回(task_id, coalesced)。coalesced为True时表示请求被合并到已有执行，
+        调用方不应再次提交任务。
+        """
+        redis_client = get_redis()
+        task_id = str(uuid.uuid4())
+
+        idempotency_redis_key = None
+        if idempotency_key:
+            idempotency_redis_key = f'execution:idempotency:{user_id}:{idempotency_key}'
+            if not redis_client.set(idempotency_redis_key, task_id, nx=True, ex=self.idempotency_ttl):
+                return redis_client.get(idempotency_redis_key), True
+
+        lock_key = self._lock_key(fingerprint)
+        while True:
+            if redis_client.set(lock_key, task_id, nx=True, ex=self.lock_ttl):
+                redis_client.set(self._owner_key(task_id), fingerprint, ex=self.lock_ttl)
+                if idempotency_redis_key:
+                    redis_client.set(self._idempotency_owner_key(task_id), idempotency_redis_key,
+                                     ex=self.idempotency_ttl)
+                return task_id, False
+
+            existing = redis_client.get(lock_key)
+            if existing is None:
+                continue
+
+            # 已结束但未释放的锁（例如worker崩溃）直接清理
+            execution = TaskExecution.query.filter_by(task_id=existing).first()
+            if execution and execution.status in FINISHED_STATUSES:
+                redis_client.eval(RELEASE_SCRIPT, 1, lock_key, existing)
+                continue
+
+            if idempotency_redis_key:
+                redis_client.set(idempotency_redis_key, existing, ex=self.idempotency_ttl)
+            return existing, True
+
+    def release(self, task_id: str):
+        """执行结束后释放指纹锁
+
+        执行从未开始（提交失败、被准入拒绝或排队时取消）时同时释放幂等键，
+        否则使用同一幂等键重试会一直拿到这个不存在的task_id。
+        """
+        redis_client = get_redis()
+        fingerprint = redis_client.get(self._owner_key(task_id))
+        if fingerprint:
+            redis_client.eval(RELEASE_SCRIPT, 1, self._lock_key(fingerprint), task_id)
+            redis_client.delete(self._owner_key(task_id))
+
+        idempotency_redis_key = redis_client.get(self._idempotency_owner_key(task_id))
+        if idempotency_redis_key:
+            if not TaskExecution.query.filter_by(task_id=task_id).first():
+                redis_client.eval(RELEASE_SCRIPT, 1, idempotency_redis_key, task_id)
+            redis_client.delete(self._idempotency_owner_key(task_id))
+
+    @staticmethod
+    def _lock_key(fingerprint: str) -> str:
+        return f'execution:dedup:{fingerprint}'
+
+    @staticmethod
+    def _owner_key(task_id: str) -> str:
+        return f'execution:{task_id}:dedup'
+
+    @staticmethod
+    def _idempotency_owner_key(task_id: str) -> str:
+        return f'execution:{task_id}:idempotency'
+
+
+# 创建全局实例
+execution_coalescer = ExecutionCoalescer()
@@ -0,0 +1,102 @@
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from flask import current_app
+
+from app.services.redis_client import get_redis
+
+
+class FactCache:
+    """主机facts缓存
+
+    通过Ansible的fact cache插件（redis或jsonfile）在所有runner调用之间共享facts，
+    配合gathering=smart，同一主机在TTL内只需收集一次facts。
+    本类负责生成runner环境变量，并按插件的存储格式读取缓存内容。
+    """
+
+    def __init__(self, default_dir: str = '/app/ansible_data/facts'):
+        self.default_dir = default_dir
+
+    @property
+    def backend(self) -> str:
+        return current_app.config.get('FACT_CACHE_BACKEND', 'redis')
+
+    @property
+    def ttl(self) -> int:
+        return current_app.config.get('FACT_CACHE_TTL', 86400)
+
+    @property
+    def prefix(self) -> str:
+        return current_app.config.get('FACT_CACHE_PREFIX', 'ansible_facts_')
+
+    @property
+    def connection(self) -> str:
+        if self.backend == 'redis':
+            url = urlparse(current_app.config.get('REDIS_URL', 'redis://localhost:6379/0'))
+            db_index = (url.path or '/0').lstrip('/') or '0'
+            return f'{url.hostname or "localhost"}:{url.port or 6379}:{db_index}'
+        return current_app.config.get('FACT_CACHE_DIR') or self.default_dir
+
+    def runner_envvars(self) -> Dict[str, str]:
+        """runner调用使用的fact cache环境变量"""
+        if self.backend == 'jsonfile':
+            os.makedirs(self.connection, exist_ok=True)
+
+        return {
+            'ANSIBLE_GATHERING': 'smart',
+            'ANSIBLE_CACHE_PLUGIN': 'community.general.redis' if self.backend == 'redis' else 'jsonfile',
+            'ANSIBLE_CACHE_PLUGIN_CONNECTION': self.connection,
+            'ANSIBLE_CACHE_PLUGIN_PREFIX': self.prefix,
+            'ANSIBLE_CACHE_PLUGIN_TIMEOUT': str(self.ttl),
+        }
+
+    def get(self, hostname: str) -> Optional[Dict[str, Any]]:
+        """读取主机的缓存facts，不存在或已过期时返回None"""
+        if self.backend == 'redis':
+            value = get_redis().get(f'{self.prefix}{hostname}')
+            return json.loads(value) if value else None
+
+        path = self._jsonfile_path(hostname)
+        try:
+            if self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def age(self, hostname: str) -> Optional[float]:
+        """缓存facts的存在时间（秒）"""
+        if self.backend == 'redis':
+            remaining = get_redis().ttl(f'{self.prefix}{hostname}')
+            if remaining is None or remaining < 0:
+                return None
+            return self.ttl - remaining
+
+        try:
+            return time.time() - os.path.getmtime(self._jsonfile_path(hostname))
+        except OSError:
+            return None
+
+    def invalidate(self, hostname: str):
+        """删除主机的缓存facts"""
+        if self.backend == 'redis':
+            client = get_redis()
+            client.delete(f'{self.prefix}{hostname}')
+            client.zrem('ansible_cache_keys', hostname)
+            return
+
+        try:
+            os.remove(self._jsonfile_path(hostname))
+        except OSError:
+            pass
+
+    def _jsonfile_path(self, hostname: str) -> str:
+        return os.path.join(self.connection, f'{self.prefix}{hostname}')
+
+
+# 创建全局实例
+fact_cache = FactCache()
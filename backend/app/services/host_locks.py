@@ -0,0 +1,351 @@
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from flask import current_app
+
+from app import db
+from app.models import Host
+from app.services.redis_client import get_redis
+
+
+HOST_LOCK_POLICIES = ('wait', 'queue', 'fail')
+
+# 所有主机要么全部获得要么全部不获得，避免多个执行各持有一部分主机互相等待
+ACQUIRE_SCRIPT = """
+local conflicts = {}
+for i, key in ipairs(KEYS) do
+    local owner = redis.call('GET', key)
+    if owner and owner ~= ARGV[1] then
+        table.insert(conflicts, i - 1)
+        table.insert(conflicts, owner)
+    end
+end
+if #conflicts > 0 then
+    return conflicts
+end
+for i, key in ipairs(KEYS) do
+    redis.call('SET', key, ARGV[1], 'PX', ARGV[2])
+end
+return conflicts
+"""
+
+# 续期仍由自己持有的锁，返回已经丢失的锁的序号
+EXTEND_SCRIPT = """
+local lost = {}
+for i, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('PEXPIRE', key, ARGV[2])
+    else
+        table.insert(lost, i - 1)
+    end
+end
+return lost
+"""
+
+RELEASE_SCRIPT = """
+local released = 0
+for i, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('DEL', key)
+        released = released + 1
+    end
+end
+return released
+"""
+
+# 保留的等待时间样本数，用于计算分位数
+WAIT_SAMPLES = 1000
+
+HOLDERS_KEY = 'hostlock:holders'
+WAITING_KEY = 'hostlock:waiting'
+METRICS_KEY = 'hostlock:metrics'
+WAIT_SAMPLES_KEY = 'hostlock:wait_samples'
+
+
+def _lock_key(host_id: int) -> str:
+    return f'hostlock:host:{host_id}'
+
+
+def _holder_key(holder: str) -> str:
+    return f'hostlock:holder:{holder}'
+
+
+class HostLockConflict(Exception):
+    """目标主机被其它执行占用，conflicts为主机ID到持有者的映射"""
+
+    def __init__(self, conflicts: Dict[int, str], message: Optional[str] = None):
+        self.conflicts = conflicts
+        holders = sorted(set(conflicts.values()))
+        super().__init__(message or f'{len(conflicts)} target hosts are locked by {", ".join(holders)}')
+
+
+class HostLockBusy(HostLockConflict):
+    """queue策略下主机被占用，调用方应重新排队稍后再试"""
+
+
+class HostLockTimeout(HostLockConflict):
+    """等待主机锁超时"""
+
+
+class HostLease:
+    """一次执行持有的主机锁
+
+    后台线程每隔TTL的三分之一续期一次，进程崩溃后锁在TTL到期后自动释放。
+    """
+
+    def __init__(self, redis_client, holder: str, host_ids: List[int], ttl: int, logger):
+        self.redis = redis_client
+        self.holder = holder
+        self.host_ids = host_ids
+        self.ttl = ttl
+        self.logger = logger
+        self.lost = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name=f'host-lease-{holder}', daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        keys = [_lock_key(host_id) for host_id in self.host_ids]
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                lost = self.redis.eval(EXTEND_SCRIPT, len(keys), *keys, self.holder, self.ttl * 1000)
+                self.redis.expire(_holder_key(self.holder), self.ttl)
+            except Exception as e:
+                self.logger.warning(f'Failed to extend host locks of {self.holder}: {e}')
+                continue
+            newly_lost = {self.host_ids[index] for index in lost} - self.lost
+            if newly_lost:
+                self.lost |= newly_lost
+                self.logger.warning(f'Execution {self.holder} lost locks on hosts {sorted(newly_lost)}')
+
+    def release(self) -> int:
+        """停止续期并释放仍持有的锁"""
+        self._stop.set()
+        keys = [_lock_key(host_id) for host_id in self.host_ids]
+        released = self.redis.eval(RELEASE_SCRIPT, len(keys), *keys, self.holder) if keys else 0
+        self.redis.delete(_holder_key(self.holder))
+        self.redis.srem(HOLDERS_KEY, self.holder)
+        return released
+
+
+class HostLockManager:
+    """主机级执行锁
+
+    每台主机一个Redis键，值为持有者（执行的task_id），带租约TTL。
+    目标主机没有重叠的执行可以完全并行，有重叠时按策略处理：
+    wait在worker内等待，queue释放worker并重新排队，fail立即失败。
+    """
+
+    def __init__(self):
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return current_app.config.get('HOST_LOCK_ENABLED', True)
+
+    @property
+    def ttl(self) -> int:
+        return current_app.config.get('HOST_LOCK_TTL', 120)
+
+    @property
+    def default_policy(self) -> str:
+        return current_app.config.get('HOST_LOCK_POLICY', 'wait')
+
+    @property
+    def wait_timeout(self) -> int:
+        return current_app.config.get('HOST_LOCK_WAIT_TIMEOUT', 3600)
+
+    @property
+    def poll_interval(self) -> float:
+        return current_app.config.get('HOST_LOCK_POLL_INTERVAL', 2.0)
+
+    @property
+    def requeue_delay(self) -> int:
+        return current_app.config.get('HOST_LOCK_REQUEUE_DELAY', 15)
+
+    def target_host_ids(self, host_ids: Optional[Iterable[int]]) -> List[int]:
+        """执行的目标主机，未指定时为全部主机"""
+        if host_ids:
+            return sorted(set(host_ids))
+        return [row.id for row in db.session.query(Host.id).order_by(Host.id)]
+
+    def try_acquire(self, holder: str, host_ids: List[int]) -> Dict[int, str]:
+        """尝试一次性获得全部主机锁，成功返回空字典，否则返回冲突的主机及其持有者"""
+        if not host_ids:
+            return {}
+        keys = [_lock_key(host_id) for host_id in host_ids]
+        result = get_redis().eval(ACQUIRE_SCRIPT, len(keys), *keys, holder, self.ttl * 1000)
+        return {host_ids[int(result[i])]: result[i + 1] for i in range(0, len(result), 2)}
+
+    def acquire(self, holder: str, host_ids: Optional[Iterable[int]], policy: Optional[str] = None,
+                cancel_check: Optional[Callable[[], bool]] = None,
+                on_wait: Optional[Callable[[Dict[int, str]], None]] = None,
+                waiting_since: Optional[datetime] = None) -> Optional[HostLease]:
+        """按策略获得目标主机锁
+
+        返回租约；wait策略等待期间cancel_check返回True时返回None。
+        fail策略冲突时抛出HostLockConflict，queue策略冲突时抛出HostLockBusy，
+        等待超过HOST_LOCK_WAIT_TIMEOUT时抛出HostLockTimeout。
+        waiting_since为重新排队的执行第一次开始等待的时间，用于累计等待时间。
+        """
+        policy = policy or self.default_policy
+        host_ids = self.target_host_ids(host_ids)
+        started = waiting_since or datetime.utcnow()
+        contended = waiting_since is not None
+        notified = False
+
+        while True:
+            conflicts = self.try_acquire(holder, host_ids)
+            if not conflicts:
+                waited = (datetime.utcnow() - started).total_seconds()
+                self._record_acquired(holder, host_ids, policy, waited, contended)
+                return self._lease(holder, host_ids)
+            contended = True
+
+            if policy == 'fail':
+                self._record('conflicts')
+                raise HostLockConflict(conflicts)
+            if (datetime.utcnow() - started).total_seconds() >= self.wait_timeout:
+                self._record('timeouts')
+                get_redis().hdel(WAITING_KEY, holder)
+                raise HostLockTimeout(conflicts, f'Timed out waiting for {len(conflicts)} locked hosts')
+
+            self._mark_waiting(holder, host_ids, policy, started, conflicts)
+            if policy == 'queue':
+                raise HostLockBusy(conflicts)
+
+            if on_wait is not None and not notified:
+                on_wait(conflicts)
+                notified = True
+            time.sleep(self.poll_interval)
+            if cancel_check is not None and cancel_check():
+                get_redis().hdel(WAITING_KEY, holder)
+                return None
+
+    def release(self, holder: str) -> int:
+        """释放持有者的全部主机锁，返回释放的数量"""
+        with self._lock:
+            lease = self._leases.pop(holder, None)
+        if lease is not None:
+            return lease.release()
+
+        # 其它进程持有的租约（例如强制释放），按登记的主机列表释放
+        redis_client = get_redis()
+        info = redis_client.hgetall(_holder_key(holder))
+        host_ids = json.loads(info.get('hosts', '[]')) if info else []
+        keys = [_lock_key(host_id) for host_id in host_ids]
+        released = redis_client.eval(RELEASE_SCRIPT, len(keys), *keys, holder) if keys else 0
+        redis_client.delete(_holder_key(holder))
+        redis_client.srem(HOLDERS_KEY, holder)
+        redis_client.hdel(WAITING_KEY, holder)
+        return released
+
+    def holders(self) -> List[Dict[str, Any]]:
+        """当前持有主机锁的执行"""
+        redis_client = get_redis()
+        result = []
+        for holder in sorted(redis_client.smembers(HOLDERS_KEY)):
+            info = redis_client.hgetall(_holder_key(holder))
+            if not info:
+                # 租约已过期
+                redis_client.srem(HOLDERS_KEY, holder)
+                continue
+            host_ids = json.loads(info.get('hosts', '[]'))
+            result.append({
+                'holder': holder,
+                'host_ids': host_ids,
+                'host_count': len(host_ids),
+                'policy': info.get('policy'),
+                'acquired_at': info.get('acquired_at'),
+                'waited': float(info.get('waited', 0)),
+                'ttl': redis_client.ttl(_holder_key(holder))
+            })
+        return result
+
+    def waiting(self) -> List[Dict[str, Any]]:
+        """正在等待主机锁的执行"""
+        waiters = [dict(json.loads(value), holder=holder)
+                   for holder, value in get_redis().hgetall(WAITING_KEY).items()]
+        return sorted(waiters, key=lambda waiter: waiter['since'])
+
+    def host_holder(self, host_id: int) -> Optional[Dict[str, Any]]:
+        """单台主机的锁状态"""
+        redis_client = get_redis()
+        holder = redis_client.get(_lock_key(host_id))
+        if holder is None:
+            return None
+        return {'host_id': host_id, 'holder': holder, 'ttl': redis_client.ttl(_lock_key(host_id))}
+
+    def metrics(self) -> Dict[str, Any]:
+        """锁等待统计"""
+        redis_client = get_redis()
+        counters = redis_client.hgetall(METRICS_KEY)
+        samples = sorted(float(value) for value in redis_client.lrange(WAIT_SAMPLES_KEY, 0, -1))
+
+        def percentile(fraction):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 3)
+
+        acquired = int(counters.get('acquired', 0))
+        wait_total = float(counters.get('wait_seconds_total', 0))
+        return {
+            'acquired': acquired,
+            'acquired_after_wait': int(counters.get('waited', 0)),
+            'conflicts': int(counters.get('conflicts', 0)),
+            'timeouts': int(counters.get('timeouts', 0)),
+            'wait_seconds_total': round(wait_total, 3),
+            'wait_seconds_avg': round(wait_total / acquired, 3) if acquired else None,
+            'wait_seconds_p50': percentile(0.5),
+            'wait_seconds_p95': percentile(0.95),
+            'wait_seconds_max': round(samples[-1], 3) if samples else None,
+            'samples': len(samples),
+            'holders': redis_client.scard(HOLDERS_KEY),
+            'waiting': redis_client.hlen(WAITING_KEY)
+        }
+
+    def _lease(self, holder: str, host_ids: List[int]) -> HostLease:
+        lease = HostLease(get_redis(), holder, host_ids, self.ttl, current_app.logger)
+        with self._lock:
+            self._leases[holder] = lease
+        return lease
+
+    def _mark_waiting(self, holder: str, host_ids: List[int], policy: str, started: datetime,
+                      conflicts: Dict[int, str]):
+        get_redis().hset(WAITING_KEY, holder, json.dumps({
+            'host_count': len(host_ids),
+            'policy': policy,
+            'since': started.isoformat(),
+            'blocked_by': sorted(set(conflicts.values())),
+            'blocked_hosts': len(conflicts)
+        }))
+
+    def _record(self, counter: str):
+        get_redis().hincrby(METRICS_KEY, counter, 1)
+
+    def _record_acquired(self, holder: str, host_ids: List[int], policy: str, waited: float, contended: bool):
+        pipe = get_redis().pipeline()
+        pipe.hset(_holder_key(holder), mapping={
+            'hosts': json.dumps(host_ids),
+            'policy': policy,
+            'acquired_at': datetime.utcnow().isoformat(),
+            'waited': round(waited, 3)
+        })
+        pipe.expire(_holder_key(holder), self.ttl)
+        pipe.sadd(HOLDERS_KEY, holder)
+        pipe.hdel(WAITING_KEY, holder)
+        pipe.hincrby(METRICS_KEY, 'acquired', 1)
+        pipe.hincrbyfloat(METRICS_KEY, 'wait_seconds_total', waited)
+        if contended:
+            pipe.hincrby(METRICS_KEY, 'waited', 1)
+        pipe.lpush(WAIT_SAMPLES_KEY, round(waited, 3))
+        pipe.ltrim(WAIT_SAMPLES_KEY, 0, WAIT_SAMPLES - 1)
+        pipe.execute()
+
+
+# 创建全局实例
+host_locks = HostLockManager()
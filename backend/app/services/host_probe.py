@@ -0,0 +1,82 @@
+import asyncio
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class HostProber:
+    """基于asyncio的轻量级主机可达性探测
+
+    并发建立TCP连接并读取SSH banner，用有界并发和超时控制成本。
+    只有通过探测的主机才需要进行Ansible层面的检查。
+    """
+
+    def __init__(self, concurrency: int = 500, timeout: float = 3.0, banner_timeout: float = 2.0):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.banner_timeout = banner_timeout
+
+    def probe(self, targets: Dict[Hashable, Tuple[str, int]]) -> Dict[Hashable, Dict[str, Any]]:
+        """同步探测一组主机，targets为 {key: (address, port)}"""
+        if not targets:
+            return {}
+        return asyncio.run(self.probe_many(targets))
+
+    async def probe_many(self, targets: Dict[Hashable, Tuple[str, int]]) -> Dict[Hashable, Dict[str, Any]]:
+        """并发探测一组主机"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(key, address, port):
+            async with semaphore:
+                return key, await self.probe_one(address, port)
+
+        results = await asyncio.gather(*[
+            bounded(key, address, port) for key, (address, port) in targets.items()
+        ])
+        return dict(results)
+
+    async def probe_one(self, address: str, port: Optional[int] = 22) -> Dict[str, Any]:
+        """探测单台主机：建立TCP连接并尝试读取SSH banner"""
+        started = time.monotonic()
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(address, port or 22), timeout=self.timeout
+            )
+            latency_ms = round((time.monotonic() - started) * 1000, 1)
+
+            banner = None
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout=self.banner_timeout)
+                banner = line.decode('utf-8', errors='replace').strip() or None
+            except asyncio.TimeoutError:
+                # 端口可连接但没有banner，仍然视为可达
+                pass
+
+            return {
+                'reachable': True,
+                'ssh': bool(banner and banner.startswith('SSH-')),
+                'banner': banner,
+                'latency_ms': latency_ms,
+                'error': None
+            }
+        except asyncio.TimeoutError:
+            return self._unreachable('timeout')
+        except OSError as e:
+            return self._unreachable(str(e))
+        finally:
+            if writer is not None:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _unreachable(error: str) -> Dict[str, Any]:
+        return {
+            'reachable': False,
+            'ssh': False,
+            'banner': None,
+            'latency_ms': None,
+            'error': error
+        }
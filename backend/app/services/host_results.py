@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy import func, or_, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.models import Host, HostExecutionResult
+
+
+# runner.stats统计项与结果表字段的对应关系
+STATS_FIELDS = {
+    'ok': 'ok',
+    'changed': 'changed',
+    'failures': 'failed',
+    'dark': 'unreachable',
+    'skipped': 'skipped',
+}
+
+
+def _failed_filter():
+    return or_(HostExecutionResult.failed > 0, HostExecutionResult.unreachable > 0)
+
+
+def record_host_results(execution, stats: Optional[Dict[str, Dict[str, int]]],
+                        host_details: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+    """执行结束时用一条多行INSERT写入每台主机的结果，返回写入的行数
+
+    stats为runner.stats，host_details为事件中统计的每台主机耗时和最后失败的任务。
+    """
+    host_details = host_details or {}
+    per_host = {}
+    for stat_name, field in STATS_FIELDS.items():
+        for hostname, value in ((stats or {}).get(stat_name) or {}).items():
+            per_host.setdefault(hostname, {})[field] = value
+    for hostname in host_details:
+        per_host.setdefault(hostname, {})
+
+    if not per_host:
+        return 0
+
+    host_ids = dict(db.session.query(Host.hostname, Host.id).filter(Host.hostname.in_(list(per_host))))
+    now = datetime.utcnow()
+    rows = []
+    for hostname, counts in per_host.items():
+        details = host_details.get(hostname, {})
+        rows.append(dict(
+            {field: counts.get(field, 0) for field in STATS_FIELDS.values()},
+            execution_id=execution.id,
+            host_id=host_ids.get(hostname),
+            playbook_id=execution.playbook_id,
+            hostname=hostname,
+            duration=details.get('duration'),
+            last_failed_task=(details.get('last_failed_task') or '')[:255] or None,
+            created_at=now
+        ))
+
+    try:
+        db.session.execute(HostExecutionResult.__table__.insert(), rows)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        # 结果表写入失败不影响执行本身的状态
+        db.session.rollback()
+        current_app.logger.warning(f'Failed to record host results of execution {execution.id}: {e}')
+        return 0
+    return len(rows)
+
+
+def host_history(host_id: int, playbook_id: Optional[int] = None, days: Optional[int] = None,
+                 failed_only: bool = False, limit: int = 50) -> List[HostExecutionResult]:
+    """主机最近的执行结果"""
+    query = HostExecutionResult.query.filter(HostExecutionResult.host_id == host_id)
+    if playbook_id:
+        query = query.filter(HostExecutionResult.playbook_id == playbook_id)
+    if days:
+        query = query.filter(HostExecutionResult.created_at >= datetime.utcnow() - timedelta(days=days))
+    if failed_only:
+        query = query.filter(_failed_filter())
+    return query.order_by(HostExecutionResult.created_at.desc()).limit(limit).all()
+
+
+def failing_hosts(playbook_id: Optional[int] = None, days: int = 7, limit: int = 100) -> List[Dict[str, Any]]:
+    """时间范围内执行失败或不可达的主机，按失败次数排序"""
+    since = datetime.utcnow() - timedelta(days=days)
+    query = db.session.query(
+        HostExecutionResult.host_id,
+        HostExecutionResult.hostname,
+        func.count(HostExecutionResult.id).label('failures'),
+        func.max(HostExecutionResult.created_at).label('last_failure')
+    ).filter(_failed_filter(), HostExecutionResult.created_at >= since)
+    if playbook_id:
+        query = query.filter(HostExecutionResult.playbook_id == playbook_id)
+
+    rows = query.group_by(
+        HostExecutionResult.host_id, HostExecutionResult.hostname
+    ).order_by(func.count(HostExecutionResult.id).desc()).limit(limit).all()
+    if not rows:
+        return []
+
+    # 每台主机最近一次失败对应的任务
+    latest = db.session.query(
+        HostExecutionResult.hostname, HostExecutionResult.last_failed_task, HostExecutionResult.execution_id
+    ).filter(
+        _failed_filter(),
+        tuple_(HostExecutionResult.hostname, HostExecutionResult.created_at).in_(
+            [(row.hostname, row.last_failure) for row in rows]
+        )
+    )
+    if playbook_id:
+        latest = latest.filter(HostExecutionResult.playbook_id == playbook_id)
+    last_failures = {row.hostname: row for row in latest}
+
+    return [{
+        'host_id': row.host_id,
+        'hostname': row.hostname,
+        'failures': row.failures,
+        'last_failure': row.last_failure.isoformat() if row.last_failure else None,
+        'last_failed_task': last_failures[row.hostname].last_failed_task if row.hostname in last_failures else None,
+        'last_execution_id': last_failures[row.hostname].execution_id if row.hostname in last_failures else None
+    } for row in rows]
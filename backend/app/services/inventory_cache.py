@@ -0,0 +1,137 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app import db
+from app.models import Host, HostGroup
+
+
+class InventoryCache:
+    """清单快照缓存
+
+    主机索引通过一次JOIN查询构建，并以hosts/host_groups的版本戳
+    （数量、最大ID、最大updated_at）作为有效性标记。版本戳变化时
+    整个缓存失效；版本不变时，按所选主机集合缓存序列化后的清单JSON。
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = None
+        self._snapshots = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self) -> Tuple:
+        """查询当前清单版本戳"""
+        return db.session.query(
+            db.session.query(func.count(Host.id)).scalar_subquery(),
+            db.session.query(func.max(Host.id)).scalar_subquery(),
+            db.session.query(func.max(Host.updated_at)).scalar_subquery(),
+            db.session.query(func.count(HostGroup.id)).scalar_subquery(),
+            db.session.query(func.max(HostGroup.updated_at)).scalar_subquery(),
+        ).one()
+
+    def get(self, host_ids: Optional[List[int]] = None) -> str:
+        """获取指定主机集合的清单JSON"""
+        key = tuple(sorted(set(host_ids))) if host_ids else None
+        version = tuple(self.version())
+
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._index = None
+                self._snapshots.clear()
+
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+                self.hits += 1
+                return snapshot
+
+            self.misses += 1
+            if self._index is None:
+                self._index = self._load_index()
+
+            snapshot = json.dumps(self._build(self._index, key), separators=(',', ':'))
+            self._snapshots[key] = snapshot
+            if len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+
+            return snapshot
+
+    def invalidate(self):
+        """主机或主机组变更后使缓存失效"""
+        with self._lock:
+            self._version = None
+            self._index = None
+            self._snapshots.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        return {
+            'entries': len(self._snapshots),
+            'indexed_hosts': len(self._index) if self._index is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def _load_index(self) -> Dict[int, Dict[str, Any]]:
+        """一次JOIN查询加载所有主机及其组信息"""
+        rows = db.session.query(Host, HostGroup.name, HostGroup.variables).outerjoin(
+            HostGroup, Host.group_id == HostGroup.id
+        ).all()
+
+        index = {}
+        for host, group_name, group_vars in rows:
+            host_entry = {
+                'ansible_host': host.ip_address,
+                'ansible_port': host.port,
+                'ansible_user': host.username,
+            }
+
+            # 添加认证信息
+            if host.password:
+                host_entry['ansible_password'] = host.password
+            elif host.private_key_path:
+                host_entry['ansible_private_key_file'] = host.private_key_path
+
+            # 添加主机变量
+            if host.variables:
+                host_entry.update(host.variables)
+
+            index[host.id] = {
+                'hostname': host.hostname,
+                'group': group_name or 'ungrouped',
+                'group_vars': group_vars or {},
+                'hostvars': host_entry
+            }
+
+        return index
+
+    def _build(self, index: Dict[int, Dict[str, Any]], key: Optional[Tuple[int, ...]]) -> Dict[str, Any]:
+        """根据主机索引构建清单数据"""
+        inventory_data = {
+            '_meta': {
+                'hostvars': {}
+            }
+        }
+
+        entries = index.values() if key is None else (index[i] for i in key if i in index)
+        for entry in entries:
+            group = inventory_data.setdefault(entry['group'], {
+                'hosts': [],
+                'vars': entry['group_vars']
+            })
+            group['hosts'].append(entry['hostname'])
+            inventory_data['_meta']['hostvars'][entry['hostname']] = entry['hostvars']
+
+        return inventory_data
+
+
+# 创建全局实例
+inventory_cache = InventoryCache()
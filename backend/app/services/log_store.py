@@ -0,0 +1,329 @@
+import bisect
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import current_app
+
+
+INDEX_FILE = 'index.jsonl'
+COMPLETE_MARKER = 'complete'
+CHUNK_FORMAT = '{:06d}.log'
+
+# 单次读取返回的最大字节数和最大行数
+MAX_READ_BYTES = 1024 * 1024
+MAX_READ_LINES = 10000
+
+
+class LogWriter:
+    """执行日志写入器
+
+    日志按行追加到固定大小的分块文件，分块写满后封存，并在索引中追加一行，
+    记录分块的起始行号、行数、起始字节偏移和大小。
+    """
+
+    def __init__(self, log_dir: str, chunk_size: int):
+        self.log_dir = log_dir
+        self.chunk_size = chunk_size
+        self.chunk = 0
+        self.first_line = 0
+        self.offset = 0
+        self.lines = 0
+        self.size = 0
+        self._file = None
+        self._index = None
+        os.makedirs(log_dir, exist_ok=True)
+
+    def write_lines(self, lines: List[str]):
+        """追加若干行日志"""
+        for line in lines:
+            data = (line.rstrip('\n') + '\n').encode('utf-8', errors='replace')
+            if self.size and self.size + len(data) > self.chunk_size:
+                self._seal()
+            if self._file is None:
+                self._file = open(os.path.join(self.log_dir, CHUNK_FORMAT.format(self.chunk)), 'ab')
+            self._file.write(data)
+            self.lines += 1
+            self.size += len(data)
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """封存最后一个分块并标记日志完整"""
+        if self.size:
+            self._seal()
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        with open(os.path.join(self.log_dir, COMPLETE_MARKER), 'w') as f:
+            json.dump({'lines': self.first_line, 'size': self.offset}, f)
+
+    def _seal(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._index is None:
+            self._index = open(os.path.join(self.log_dir, INDEX_FILE), 'a')
+        self._index.write(json.dumps({
+            'chunk': self.chunk,
+            'first_line': self.first_line,
+            'lines': self.lines,
+            'offset': self.offset,
+            'size': self.size
+        }) + '\n')
+        self._index.flush()
+
+        self.chunk += 1
+        self.first_line += self.lines
+        self.offset += self.size
+        self.lines = 0
+        self.size = 0
+
+
+class LogStore:
+    """分块执行日志存储
+
+    每次执行的stdout保存为一组固定大小的分块文件和一个分块索引，
+    读取时通过索引定位到字节偏移或行号所在的分块，只读取需要的部分，
+    支持按字节偏移续读（游标）、读取末尾N行和按行号范围读取。
+    """
+
+    def __init__(self, default_dir: str = '/app/ansible_data/task_logs'):
+        self.default_dir = default_dir
+
+    @property
+    def root(self) -> str:
+        return current_app.config.get('LOG_STORE_DIR') or self.default_dir
+
+    @property
+    def chunk_size(self) -> int:
+        return current_app.config.get('LOG_CHUNK_SIZE', 1024 * 1024)
+
+    def writer(self, ident: str) -> LogWriter:
+        """创建执行日志写入器"""
+        return LogWriter(self._dir(ident), self.chunk_size)
+
+    def exists(self, ident: str) -> bool:
+        return os.path.isdir(self._dir(ident))
+
+    def ensure(self, ident: str, loader: Callable[[], Optional[str]]) -> bool:
+        """日志不存在时通过loader加载完整文本并写入分块存储（用于旧执行）"""
+        if self.exists(ident):
+            return True
+        text = loader()
+        if text is None:
+            return False
+
+        tmp_dir = os.path.join(self.root, f'.tmp-{uuid.uuid4().hex}')
+        writer = LogWriter(tmp_dir, self.chunk_size)
+        writer.write_lines(text.splitlines())
+        writer.close()
+        try:
+            os.rename(tmp_dir, self._dir(ident))
+        except OSError:
+            # 其他请求已完成转换
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return True
+
+    def read(self, ident: str, since_offset: Optional[int] = None, tail: Optional[int] = None,
+             start_line: Optional[int] = None, end_line: Optional[int] = None,
+             max_lines: int = MAX_READ_LINES) -> Dict[str, Any]:
+        """读取一段日志
+
+        默认从since_offset（字节偏移，默认为0）开始读取；指定tail时读取末尾N行；
+        指定start_line时读取[start_line, end_line)范围内的行。
+        返回的next_offset可作为下一次请求的游标。
+        """
+        chunks = self._chunks(ident)
+        max_lines = max(1, min(max_lines, MAX_READ_LINES))
+
+        if tail is not None:
+            lines, first_line = self._read_tail(ident, chunks, min(max(tail, 0), max_lines))
+            next_offset = None
+        elif start_line is not None:
+            stop = start_line + max_lines if end_line is None else min(end_line, start_line + max_lines)
+            lines, first_line = self._read_line_range(ident, chunks, max(start_line, 0), stop)
+            next_offset = None
+        else:
+            lines, first_line, next_offset = self._read_from_offset(ident, chunks, max(since_offset or 0, 0),
+                                                                    max_lines)
+
+        total_lines, total_size = self._totals(chunks)
+        next_line = first_line + len(lines)
+        if next_offset is None:
+            next_offset = self._line_offset(ident, chunks, next_line)
+        return {
+            'lines': lines,
+            'first_line': first_line,
+            'next_line': next_line,
+            'next_offset': next_offset,
+            'total_lines': total_lines,
+            'total_size': total_size,
+            'complete': self._complete(ident)
+        }
+
+    def purge(self, days: int) -> int:
+        """删除超过保留期的执行日志，只检查顶层目录的修改时间"""
+        cutoff = time.time() - days * 24 * 3600
+        removed = 0
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return removed
+
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def _dir(self, ident: str) -> str:
+        return os.path.join(self.root, ident)
+
+    def _complete(self, ident: str) -> bool:
+        return os.path.exists(os.path.join(self._dir(ident), COMPLETE_MARKER))
+
+    def _chunks(self, ident: str) -> List[Dict[str, Any]]:
+        """已封存分块的索引，加上仍在写入的最后一个分块"""
+        chunks = []
+        try:
+            with open(os.path.join(self._dir(ident), INDEX_FILE), 'r') as f:
+                for line in f:
+                    # 忽略写入中的不完整行
+                    if line.endswith('\n'):
+                        chunks.append(json.loads(line))
+        except OSError:
+            pass
+
+        chunk = chunks[-1]['chunk'] + 1 if chunks else 0
+        path = os.path.join(self._dir(ident), CHUNK_FORMAT.format(chunk))
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            # 只计入完整的行
+            size = data.rfind(b'\n') + 1
+            chunks.append({
+                'chunk': chunk,
+                'first_line': chunks[-1]['first_line'] + chunks[-1]['lines'] if chunks else 0,
+                'lines': data.count(b'\n', 0, size),
+                'offset': chunks[-1]['offset'] + chunks[-1]['size'] if chunks else 0,
+                'size': size
+            })
+        return chunks
+
+    @staticmethod
+    def _totals(chunks: List[Dict[str, Any]]):
+        if not chunks:
+            return 0, 0
+        return chunks[-1]['first_line'] + chunks[-1]['lines'], chunks[-1]['offset'] + chunks[-1]['size']
+
+    def _chunk_data(self, ident: str, chunk: Dict[str, Any]) -> bytes:
+        with open(os.path.join(self._dir(ident), CHUNK_FORMAT.format(chunk['chunk'])), 'rb') as f:
+            return f.read(chunk['size'])
+
+    def _chunk_lines(self, ident: str, chunk: Dict[str, Any]) -> List[str]:
+        return self._chunk_data(ident, chunk).decode('utf-8', errors='replace').splitlines()
+
+    def _read_from_offset(self, ident: str, chunks: List[Dict[str, Any]], offset: int, max_lines: int):
+        total_lines, total_size = self._totals(chunks)
+        offset = min(offset, total_size)
+        index = bisect.bisect_right([chunk['offset'] for chunk in chunks], offset) - 1
+
+        lines = []
+        first_line = None
+        next_offset = offset
+        read_bytes = 0
+        for chunk in chunks[max(index, 0):]:
+            start = max(offset - chunk['offset'], 0)
+            if start >= chunk['size']:
+                continue
+            data = self._chunk_data(ident, chunk)
+            if first_line is None:
+                # 偏移位于分块中间时，起始行号需要加上分块内之前的行数
+                first_line = chunk['first_line'] + data.count(b'\n', 0, start)
+
+            position = start
+            while position < len(data) and len(lines) < max_lines and read_bytes < MAX_READ_BYTES:
+                end = data.index(b'\n', position) + 1
+                lines.append(data[position:end - 1].decode('utf-8', errors='replace'))
+                read_bytes += end - position
+                position = end
+            next_offset = chunk['offset'] + position
+
+            if len(lines) >= max_lines or read_bytes >= MAX_READ_BYTES:
+                break
+
+        return lines, total_lines if first_line is None else first_line, next_offset
+
+    def _read_tail(self, ident: str, chunks: List[Dict[str, Any]], count: int):
+        lines = []
+        first_line = self._totals(chunks)[0]
+        for chunk in reversed(chunks):
+            if len(lines) >= count:
+                break
+            lines = self._chunk_lines(ident, chunk) + lines
+            first_line = chunk['first_line']
+
+        if len(lines) > count:
+            first_line += len(lines) - count
+            lines = lines[len(lines) - count:] if count else []
+        return lines, first_line
+
+    def _read_line_range(self, ident: str, chunks: List[Dict[str, Any]], start_line: int, end_line: int):
+        index = bisect.bisect_right([chunk['first_line'] for chunk in chunks], start_line) - 1
+        lines = []
+        for chunk in chunks[max(index, 0):]:
+            if chunk['first_line'] >= end_line:
+                break
+            chunk_lines = self._chunk_lines(ident, chunk)
+            begin = max(start_line - chunk['first_line'], 0)
+            lines.extend(chunk_lines[begin:end_line - chunk['first_line']])
+
+        total_lines = self._totals(chunks)[0]
+        return lines, min(start_line, total_lines)
+
+    def _line_offset(self, ident: str, chunks: List[Dict[str, Any]], line: int) -> int:
+        """行号对应的字节偏移"""
+        total_lines, total_size = self._totals(chunks)
+        if line >= total_lines:
+            return total_size
+        index = bisect.bisect_right([chunk['first_line'] for chunk in chunks], line) - 1
+        chunk = chunks[index]
+        skip = line - chunk['first_line']
+        if not skip:
+            return chunk['offset']
+
+        data = self._chunk_data(ident, chunk)
+        position = 0
+        for _ in range(skip):
+            position = data.index(b'\n', position) + 1
+        return chunk['offset'] + position
+
+
+class LogSink:
+    """事件流水线sink：把runner事件的stdout写入分块日志"""
+
+    def __init__(self, writer: LogWriter):
+        self.writer = writer
+
+    def __call__(self, events: List[Dict[str, Any]]):
+        lines = []
+        for event in events:
+            stdout = event.get('stdout')
+            if stdout:
+                lines.extend(stdout.splitlines())
+        if lines:
+            self.writer.write_lines(lines)
+
+    def close(self):
+        self.writer.close()
+
+
+# 创建全局实例
+log_store = LogStore()
@@ -0,0 +1,123 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# runner事件对应的主机结果状态
+HOST_RESULT_STATUS = {
+    'runner_on_ok': 'ok',
+    'runner_on_failed': 'failed',
+    'runner_on_unreachable': 'unreachable',
+    'runner_on_skipped': 'skipped',
+}
+
+# 每次执行都会变化的结果字段，不参与输出比较
+VOLATILE_RESULT_KEYS = ('start', 'end', 'delta', 'invocation', 'cmd', 'warnings', 'deprecations')
+
+
+def host_output(res: Dict[str, Any]) -> str:
+    """从模块返回结果中提取用于展示和比较的输出
+
+    命令类模块使用stdout/stderr，其它模块使用msg，都没有时使用去掉易变字段后的结果JSON。
+    """
+    if 'stdout' in res or 'stderr' in res:
+        parts = [res.get('stdout') or '']
+        if res.get('stderr'):
+            parts.append(res['stderr'])
+        return '\n'.join(parts).rstrip('\n')
+    if res.get('msg'):
+        return str(res['msg'])
+    stable = {key: value for key, value in res.items()
+              if key not in VOLATILE_RESULT_KEYS and not key.startswith('_ansible')}
+    return json.dumps(stable, default=str, sort_keys=True, indent=2)
+
+
+def host_result(event: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any], str]]:
+    """把主机结果事件转换为(主机名, 结果, 输出)，非主机结果事件返回None"""
+    status = HOST_RESULT_STATUS.get(event.get('event'))
+    if status is None:
+        return None
+    event_data = event.get('event_data', {})
+    res = event_data.get('res') or {}
+    if status == 'ok' and res.get('changed'):
+        status = 'changed'
+    return event_data.get('host'), {'status': status, 'rc': res.get('rc')}, host_output(res)
+
+
+def output_hash(status: str, output: str) -> str:
+    """输出分组的键，状态不同的相同输出不合并"""
+    return hashlib.sha1(f'{status}\0{output}'.encode('utf-8', errors='replace')).hexdigest()
+
+
+class OutputGrouper:
+    """按输出哈希合并主机结果，类似clush -b
+
+    每组只保存一份输出（超过max_bytes时截断）和主机列表，
+    输出完全相同的主机只占一条记录。
+    """
+
+    def __init__(self, max_bytes: int = 4096):
+        self.max_bytes = max_bytes
+        self._groups = {}
+        self._hosts = {}
+
+    @property
+    def host_count(self) -> int:
+        return len(self._hosts)
+
+    def add(self, host: str, status: str, output: str, rc: Optional[int] = None) -> Tuple[str, bool]:
+        """记录一台主机的结果，返回(输出哈希, 是否为新分组)"""
+        digest = output_hash(status, output)
+        group = self._groups.get(digest)
+        created = group is None
+        if created:
+            encoded = output.encode('utf-8', errors='replace')
+            group = self._groups[digest] = {
+                'hash': digest,
+                'status': status,
+                'rc': rc,
+                'output': encoded[:self.max_bytes].decode('utf-8', errors='ignore'),
+                'truncated': len(encoded) > self.max_bytes,
+                'hosts': []
+            }
+
+        # 同一主机重复上报时以最后一次结果为准
+        previous = self._hosts.get(host)
+        if previous is not None and previous != digest:
+            self._remove(host, previous)
+        if previous != digest:
+            group['hosts'].append(host)
+        self._hosts[host] = digest
+        return digest, created
+
+    def output(self, digest: str) -> Optional[Dict[str, Any]]:
+        """分组的输出信息，不含主机列表"""
+        group = self._groups.get(digest)
+        if group is None:
+            return None
+        return {key: value for key, value in group.items() if key != 'hosts'}
+
+    def groups(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按主机数从多到少排列的分组，失败的分组排在同等数量的成功分组之前"""
+        groups = sorted(
+            self._groups.values(),
+            key=lambda group: (-len(group['hosts']), group['status'] in ('ok', 'changed', 'skipped'))
+        )
+        if limit is not None:
+            groups = groups[:limit]
+        return [dict(group, hosts=sorted(group['hosts']), count=len(group['hosts'])) for group in groups]
+
+    def summary(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """分组摘要，limit限制返回的分组数"""
+        return {
+            'host_count': self.host_count,
+            'group_count': len(self._groups),
+            'groups': self.groups(limit),
+            'groups_truncated': limit is not None and len(self._groups) > limit
+        }
+
+    def _remove(self, host: str, digest: str):
+        group = self._groups[digest]
+        group['hosts'].remove(host)
+        if not group['hosts']:
+            del self._groups[digest]
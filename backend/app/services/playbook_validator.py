@@ -0,0 +1,127 @@
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from flask import current_app
+
+from app.services.ansible_service import ansible_service
+from app.services.project_cache import project_cache, project_key, PLAYBOOK_FILE
+
+
+class PlaybookValidator:
+    """同步Playbook校验
+
+    先做结构校验（使用C实现的YAML加载器），再在受限数量的子进程中运行
+    ansible-playbook --syntax-check。结果按内容哈希缓存在有界LRU中，
+    编辑器重复保存相同内容时直接返回缓存结果。
+    """
+
+    def __init__(self):
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._slots = None
+
+    @property
+    def cache_size(self) -> int:
+        return current_app.config.get('PLAYBOOK_VALIDATION_CACHE_SIZE', 1024)
+
+    @property
+    def syntax_check_timeout(self) -> int:
+        return current_app.config.get('PLAYBOOK_SYNTAX_CHECK_TIMEOUT', 30)
+
+    @property
+    def slots(self) -> threading.BoundedSemaphore:
+        """限制同时运行的syntax-check子进程数"""
+        if self._slots is None:
+            with self._lock:
+                if self._slots is None:
+                    self._slots = threading.BoundedSemaphore(
+                        current_app.config.get('PLAYBOOK_SYNTAX_CHECK_WORKERS', 2)
+                    )
+        return self._slots
+
+    def validate(self, content: str, files: Optional[Dict[str, str]] = None,
+                 syntax_check: bool = True) -> Dict[str, Any]:
+        """校验Playbook，返回valid、errors、warnings以及是否命中缓存"""
+        key = f'{project_key(content, files)}:{int(syntax_check)}'
+        cached = self._get(key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        started = time.monotonic()
+        result = ansible_service.validate_playbook(content)
+        result.setdefault('warnings', [])
+        result.setdefault('errors', [])
+        result['syntax_checked'] = False
+        cacheable = True
+
+        # 结构校验未通过时不再运行syntax-check
+        if syntax_check and result['valid']:
+            check = self._syntax_check(content, files)
+            if check is None:
+                # 校验进程繁忙或不可用时只返回结构校验结果，不缓存
+                result['warnings'].append('Syntax check skipped: ansible-playbook unavailable or busy')
+                cacheable = False
+            else:
+                result['syntax_checked'] = True
+                if check:
+                    result['valid'] = False
+                    result['errors'].append(check)
+        result['duration_ms'] = int((time.monotonic() - started) * 1000)
+
+        if cacheable:
+            self._put(key, result)
+        return dict(result, cached=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._cache), 'max_entries': self.cache_size}
+
+    def _syntax_check(self, content: str, files: Optional[Dict[str, str]]) -> Optional[str]:
+        """运行ansible-playbook --syntax-check
+
+        返回空字符串表示通过，返回错误信息表示失败，返回None表示未能执行检查。
+        """
+        if not self.slots.acquire(timeout=self.syntax_check_timeout):
+            return None
+        try:
+            with project_cache.checkout(content, files) as project_dir:
+                process = subprocess.run(
+                    ['ansible-playbook', '--syntax-check', '-i', 'localhost,', PLAYBOOK_FILE],
+                    cwd=project_dir,
+                    capture_output=True,
+                    text=True,
+                    timeout=self.syntax_check_timeout,
+                    env=dict(os.environ, ANSIBLE_NOCOLOR='1', ANSIBLE_RETRY_FILES_ENABLED='0')
+                )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            current_app.logger.warning(f'Playbook syntax check failed to run: {e}')
+            return None
+        finally:
+            self.slots.release()
+
+        if process.returncode == 0:
+            return ''
+        output = (process.stderr or process.stdout or '').strip()
+        return f'Syntax check failed: {output}' if output else 'Syntax check failed'
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+
+    def _put(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+# 创建全局实例
+playbook_validator = PlaybookValidator()
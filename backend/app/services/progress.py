@@ -0,0 +1,140 @@
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+
+# 表示主机已完成当前任务的事件
+HOST_DONE_EVENTS = ('runner_on_ok', 'runner_on_failed', 'runner_on_unreachable', 'runner_on_skipped')
+
+FALSE_VALUES = (False, 'no', 'false', 'False', 0)
+
+
+def _count_tasks(tasks: Optional[List[Any]]) -> int:
+    """统计任务列表中的任务数，block展开计数，rescue只在失败时执行不计入"""
+    count = 0
+    for task in tasks or []:
+        if not isinstance(task, dict):
+            continue
+        if 'block' in task:
+            count += _count_tasks(task.get('block')) + _count_tasks(task.get('always'))
+        else:
+            count += 1
+    return count
+
+
+def estimate_task_count(content: str, host_count: int = 0, serial: Optional[int] = None) -> int:
+    """根据Playbook内容估算执行中会出现的任务数
+
+    每个role和import_playbook按一个任务计算，实际任务数在执行过程中会修正。
+    """
+    try:
+        plays = yaml.safe_load(content)
+    except yaml.YAMLError:
+        return 1
+    if not isinstance(plays, list):
+        return 1
+
+    total = 0
+    for play in plays:
+        if not isinstance(play, dict):
+            continue
+        if 'import_playbook' in play:
+            total += 1
+            continue
+
+        tasks = (_count_tasks(play.get('pre_tasks')) + _count_tasks(play.get('tasks'))
+                 + _count_tasks(play.get('post_tasks')) + len(play.get('roles') or []))
+        if play.get('gather_facts', True) not in FALSE_VALUES:
+            tasks += 1
+
+        # 按serial分批时每一批都会执行全部任务
+        batches = 1
+        play_serial = serial or play.get('serial')
+        if isinstance(play_serial, int) and play_serial > 0 and host_count:
+            batches = math.ceil(host_count / play_serial)
+        total += tasks * batches
+
+    return max(total, 1)
+
+
+class ProgressTracker:
+    """根据runner事件流计算执行进度
+
+    进度 = (已完成任务数 + 当前任务已完成主机比例) / 任务总数。
+    任务总数取静态估算值和实际开始的任务数中的较大值，失败和不可达的主机
+    不再参与后续任务，进度只增不减，执行结束前最多为99。
+    """
+
+    def __init__(self, total_tasks: int = 1, host_count: int = 0):
+        self.total_tasks = max(total_tasks, 1)
+        self.host_count = host_count
+        self.started_at = time.monotonic()
+        self.plays = 0
+        self.tasks_started = 0
+        self.current_task_uuid = None
+        self.current_task_hosts = set()
+        self.failed_hosts = set()
+        self.unreachable_hosts = set()
+        self.finished = False
+        self._progress = 0
+
+    def consume(self, event: Dict[str, Any]):
+        event_type = event.get('event')
+        event_data = event.get('event_data') or {}
+
+        if event_type == 'playbook_on_play_start':
+            self.plays += 1
+        elif event_type == 'playbook_on_task_start':
+            self.tasks_started += 1
+            self.current_task_uuid = event_data.get('task_uuid')
+            self.current_task_hosts = set()
+        elif event_type in HOST_DONE_EVENTS:
+            host = event_data.get('host')
+            if event_data.get('task_uuid') == self.current_task_uuid or self.current_task_uuid is None:
+                self.current_task_hosts.add(host)
+            if event_type == 'runner_on_unreachable':
+                self.unreachable_hosts.add(host)
+            elif event_type == 'runner_on_failed' and not event_data.get('ignore_errors'):
+                self.failed_hosts.add(host)
+        elif event_type == 'playbook_on_stats':
+            self.finished = True
+
+    def active_hosts(self) -> int:
+        """仍在执行的主机数"""
+        return max(self.host_count - len(self.failed_hosts | self.unreachable_hosts), 1)
+
+    def fraction(self) -> float:
+        if self.finished:
+            return 1.0
+        total = max(self.total_tasks, self.tasks_started)
+        completed = max(self.tasks_started - 1, 0)
+        if self.tasks_started:
+            completed += min(len(self.current_task_hosts) / self.active_hosts(), 1.0)
+        return min(completed / total, 1.0)
+
+    def progress(self) -> int:
+        """0-100的进度，执行结束前不超过99"""
+        progress = 100 if self.finished else min(int(self.fraction() * 100), 99)
+        self._progress = max(self._progress, progress)
+        return self._progress
+
+    def eta(self) -> Optional[int]:
+        """按已用时间和进度估算剩余秒数"""
+        fraction = self.fraction()
+        if fraction <= 0:
+            return None
+        elapsed = time.monotonic() - self.started_at
+        return int(elapsed * (1 - fraction) / fraction)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'progress': self.progress(),
+            'eta': self.eta(),
+            'plays': self.plays,
+            'tasks_started': self.tasks_started,
+            'total_tasks': max(self.total_tasks, self.tasks_started),
+            'failed_hosts': len(self.failed_hosts),
+            'unreachable_hosts': len(self.unreachable_hosts)
+        }
@@ -0,0 +1,212 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from flask import current_app
+
+
+PLAYBOOK_FILE = 'playbook.yml'
+COMPLETE_MARKER = '.complete'
+LOCK_FILE = '.lock'
+SIZE_FILE = '.size'
+
+# 项目目录中由缓存自身使用的文件名，依赖文件不能使用
+RESERVED_FILES = (PLAYBOOK_FILE, COMPLETE_MARKER, LOCK_FILE, SIZE_FILE)
+
+# 目录在检出过程中被并发淘汰时的最大重试次数
+CHECKOUT_ATTEMPTS = 5
+
+
+def project_key(content: str, files: Optional[Dict[str, str]] = None) -> str:
+    """按Playbook内容及其依赖文件计算项目目录的内容地址"""
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(content.encode('utf-8')).digest())
+    for path in sorted(files or {}):
+        digest.update(path.encode('utf-8'))
+        digest.update(hashlib.sha256(files[path].encode('utf-8')).digest())
+    return digest.hexdigest()
+
+
+class ProjectCache:
+    """Worker本地的内容寻址项目目录缓存
+
+    相同版本的Playbook及其依赖（roles、vars文件、模板）只物化一次，
+    重复执行直接复用目录。使用中的目录持有共享锁，超出磁盘预算时
+    按最近使用时间淘汰未被使用的目录。
+    """
+
+    @property
+    def root(self) -> str:
+        return os.path.join(current_app.config.get('ANSIBLE_WORKER_DIR', '/tmp/ansible-web'), 'projects')
+
+    @property
+    def budget(self) -> int:
+        return current_app.config.get('PROJECT_CACHE_BUDGET', 1024 * 1024 * 1024)
+
+    @contextmanager
+    def checkout(self, content: str, files: Optional[Dict[str, str]] = None):
+        """获取物化后的项目目录，使用期间不会被淘汰"""
+        key = project_key(content, files)
+        project_dir = os.path.join(self.root, key)
+        marker = os.path.join(project_dir, COMPLETE_MARKER)
+
+        for _ in range(CHECKOUT_ATTEMPTS):
+            materialized = False
+            if not os.path.exists(marker):
+                self._materialize(project_dir, content, files or {})
+                materialized = True
+
+            try:
+                lock = open(os.path.join(project_dir, LOCK_FILE), 'a')
+            except OSError:
+                continue
+            fcntl.flock(lock, fcntl.LOCK_SH)
+
+            # 加锁前目录可能刚好被淘汰
+            if os.path.exists(marker):
+                break
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            lock.close()
+        else:
+            raise OSError(f'Failed to check out project {key}: directory kept being evicted')
+
+        try:
+            # 更新使用时间，作为LRU依据
+            os.utime(marker)
+            if materialized:
+                self.evict()
+            yield project_dir
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            lock.close()
+
+    def evict(self, budget: Optional[int] = None):
+        """按LRU淘汰项目目录直到总大小不超过预算"""
+        budget = self.budget if budget is None else budget
+        entries = self._entries()
+        total = sum(entry['size'] for entry in entries)
+
+        for entry in sorted(entries, key=lambda item: item['last_used']):
+            if total <= budget:
+                break
+            if self._remove_unused(entry['path']):
+                total -= entry['size']
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计信息"""
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'size': sum(entry['size'] for entry in entries),
+            'budget': self.budget
+        }
+
+    def _materialize(self, project_dir: str, content: str, files: Dict[str, str]):
+        """先写入临时目录，再原子重命名为最终目录
+
+        重命名失败时不抛出异常，由checkout检查完成标记并重试。
+        """
+        for path in files:
+            if os.path.normpath(path) in RESERVED_FILES:
+                raise ValueError(f'Reserved project file name: {path}')
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(tmp_dir)
+
+        try:
+            size = 0
+            for path, file_content in files.items():
+                size += self._write(tmp_dir, path, file_content)
+            size += self._write(tmp_dir, PLAYBOOK_FILE, content)
+
+            with open(os.path.join(tmp_dir, SIZE_FILE), 'w') as f:
+                f.write(str(size))
+            open(os.path.join(tmp_dir, LOCK_FILE), 'w').close()
+            open(os.path.join(tmp_dir, COMPLETE_MARKER), 'w').close()
+
+            try:
+                os.rename(tmp_dir, project_dir)
+            except OSError:
+                # 其他进程已物化了相同内容，或同名目录正在被淘汰；
+                # 没有完成标记且无人使用的残留目录直接清理，下一次重试可以重新物化
+                if not os.path.exists(os.path.join(project_dir, COMPLETE_MARKER)):
+                    self._remove_stale(project_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _write(base_dir: str, path: str, content: str) -> int:
+        """写入项目文件，拒绝越出项目目录的路径"""
+        normalized = os.path.normpath(path)
+        if os.path.isabs(normalized) or normalized.startswith('..'):
+            raise ValueError(f'Invalid project file path: {path}')
+
+        target = os.path.join(base_dir, normalized)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        data = content.encode('utf-8')
+        with open(target, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+    def _entries(self) -> List[Dict]:
+        """列出缓存目录，只读取每个目录的标记文件"""
+        entries = []
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return entries
+
+        for name in names:
+            if name.startswith('.'):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                last_used = os.path.getmtime(os.path.join(path, COMPLETE_MARKER))
+                with open(os.path.join(path, SIZE_FILE)) as f:
+                    size = int(f.read() or 0)
+            except (OSError, ValueError):
+                continue
+            entries.append({'path': path, 'size': size, 'last_used': last_used})
+
+        return entries
+
+    @staticmethod
+    def _remove_stale(project_dir: str):
+        """删除没有完成标记的残留目录，正在被淘汰的目录由淘汰方删除"""
+        try:
+            with open(os.path.join(project_dir, LOCK_FILE), 'a') as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+                if os.path.exists(os.path.join(project_dir, COMPLETE_MARKER)):
+                    return
+        except OSError:
+            return
+        shutil.rmtree(project_dir, ignore_errors=True)
+
+    @staticmethod
+    def _remove_unused(project_dir: str) -> bool:
+        """目录没有被使用时删除，返回是否删除成功"""
+        try:
+            with open(os.path.join(project_dir, LOCK_FILE), 'a') as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return False
+                # 先移除完成标记，避免其他进程在删除过程中使用该目录
+                os.remove(os.path.join(project_dir, COMPLETE_MARKER))
+        except OSError:
+            return False
+
+        shutil.rmtree(project_dir, ignore_errors=True)
+        return True
+
+
+# 创建全局实例
+project_cache = ProjectCache()
@@ -0,0 +1,15 @@
+import redis
+from flask import current_app
+
+
+# 按URL缓存的连接池客户端
+_clients = {}
+
+
+def get_redis() -> redis.Redis:
+    """获取应用配置的Redis客户端"""
+    url = current_app.config.get('REDIS_URL', 'redis://localhost:6379/0')
+    client = _clients.get(url)
+    if client is None:
+        client = _clients[url] = redis.Redis.from_url(url, decode_responses=True)
+    return client
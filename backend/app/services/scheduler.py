@@ -0,0 +1,308 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytz
+from flask import current_app
+
+from app import db
+from app.models import ExecutionSchedule, Playbook, TaskExecution
+from app.services.admission import admission
+from app.services.ansible_service import ansible_service
+from app.services.execution_dedup import execution_coalescer, execution_fingerprint, FINISHED_STATUSES
+
+
+SCHEDULE_TARGETS = ('playbook', 'adhoc')
+
+CRON_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+MONTH_NAMES = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+WEEKDAY_NAMES = ('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat')
+
+# 查找下一次触发时间时最多向后搜索的天数，覆盖2月29日
+CRON_SEARCH_DAYS = 366 * 5
+
+
+def _parse_value(value: str, names: Optional[Tuple[str, ...]], offset: int) -> int:
+    if names and value.lower() in names:
+        return names.index(value.lower()) + offset
+    if not value.isdigit():
+        raise ValueError(f'invalid value "{value}"')
+    return int(value)
+
+
+def _parse_field(spec: str, low: int, high: int, names: Optional[Tuple[str, ...]] = None) -> List[int]:
+    """解析cron的一个字段，支持*、列表、范围、步长和英文缩写"""
+    values = set()
+    for part in spec.split(','):
+        step = None
+        if '/' in part:
+            part, step_value = part.split('/', 1)
+            if not step_value.isdigit() or int(step_value) < 1:
+                raise ValueError(f'invalid step "{step_value}"')
+            step = int(step_value)
+
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            first, last = part.split('-', 1)
+            start, end = _parse_value(first, names, low), _parse_value(last, names, low)
+        else:
+            start = _parse_value(part, names, low)
+            end = high if step else start
+
+        if not low <= start <= end <= high:
+            raise ValueError(f'"{spec}" is out of range {low}-{high}')
+        values.update(range(start, end + 1, step or 1))
+    return sorted(values)
+
+
+class CronExpression:
+    """五段式cron表达式（分 时 日 月 周）
+
+    日和周都不是*时按照cron的约定，满足其中之一即触发。
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = CRON_ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError('cron expression must have 5 fields: minute hour day month weekday')
+
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = set(_parse_field(fields[2], 1, 31))
+        self.months = set(_parse_field(fields[3], 1, 12, MONTH_NAMES))
+        # 周日可以写成0或7
+        self.weekdays = {day % 7 for day in _parse_field(fields[4], 0, 7, WEEKDAY_NAMES)}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_match = moment.day in self.days
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if not self.any_day and not self.any_weekday:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_after(self, after: datetime) -> datetime:
+        """after之后（不含）的下一次触发时间"""
+        candidate = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(CRON_SEARCH_DAYS):
+            if candidate.month in self.months and self._day_matches(candidate):
+                for hour in self.hours:
+                    if hour < candidate.hour:
+                        continue
+                    for minute in self.minutes:
+                        if hour == candidate.hour and minute < candidate.minute:
+                            continue
+                        return candidate.replace(hour=hour, minute=minute)
+            candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+        raise ValueError(f'cron expression "{self.expression}" never matches')
+
+
+class ExecutionScheduler:
+    """基于数据库的定时执行调度器
+
+    由celery beat每隔SCHEDULER_TICK_INTERVAL秒触发一次dispatch_due，
+    用SELECT ... FOR UPDATE SKIP LOCKED领取到期的计划，多个beat或worker
+    同时运行也不会重复派发。
+    """
+
+    @property
+    def default_jitter(self) -> int:
+        return current_app.config.get('SCHEDULER_DEFAULT_JITTER', 300)
+
+    @property
+    def max_jitter(self) -> int:
+        return current_app.config.get('SCHEDULER_MAX_JITTER', 3600)
+
+    @property
+    def queued_timeout(self) -> int:
+        return current_app.config.get('SCHEDULER_QUEUED_TIMEOUT', 3600)
+
+    @property
+    def batch_size(self) -> int:
+        return current_app.config.get('SCHEDULER_BATCH_SIZE', 100)
+
+    def validate(self, data: Dict[str, Any]) -> List[str]:
+        """校验计划数据"""
+        if not isinstance(data, dict):
+            return ['Request body must be an object']
+
+        errors = []
+        if not isinstance(data.get('name'), str) or not data['name'].strip():
+            errors.append('name is required')
+
+        target_type = data.get('target_type', 'playbook')
+        if target_type not in SCHEDULE_TARGETS:
+            errors.append(f'target_type must be one of: {", ".join(SCHEDULE_TARGETS)}')
+        elif target_type == 'playbook':
+            playbook = Playbook.query.get(data['playbook_id']) if data.get('playbook_id') else None
+            if playbook is None:
+                errors.append('playbook_id must reference an existing playbook')
+            errors.extend(ansible_service.validate_execution_options(
+                data.get('options'), playbook.content if playbook else None))
+        elif not isinstance(data.get('module'), str) or not data['module'].strip():
+            errors.append('module is required for adhoc schedules')
+
+        try:
+            CronExpression(data.get('cron_expression') or '').next_after(datetime.utcnow())
+        except ValueError as e:
+            errors.append(f'Invalid cron_expression: {e}')
+
+        try:
+            pytz.timezone(data.get('timezone') or 'UTC')
+        except (pytz.UnknownTimeZoneError, AttributeError):
+            errors.append(f'Unknown timezone: {data.get("timezone")}')
+
+        jitter = data.get('jitter')
+        if jitter is not None and (isinstance(jitter, bool) or not isinstance(jitter, int)
+                                   or not 0 <= jitter <= self.max_jitter):
+            errors.append(f'jitter must be an integer between 0 and {self.max_jitter}')
+
+        host_ids = data.get('host_ids')
+        if host_ids is not None and (not isinstance(host_ids, list)
+                                     or not all(isinstance(host_id, int) for host_id in host_ids)):
+            errors.append('host_ids must be a list of host ids')
+
+        return errors
+
+    def next_run(self, schedule: ExecutionSchedule, after: Optional[datetime] = None) -> datetime:
+        """after之后的下一次执行时间（UTC），已加上该计划的错开时间"""
+        after = after or datetime.utcnow()
+        cron = CronExpression(schedule.cron_expression)
+        tz = pytz.timezone(schedule.timezone or 'UTC')
+
+        # cron按计划所在时区解释
+        local_after = pytz.utc.localize(after).astimezone(tz).replace(tzinfo=None)
+        fire = cron.next_after(local_after)
+        following = cron.next_after(fire)
+        fire_utc = tz.localize(fire).astimezone(pytz.utc).replace(tzinfo=None)
+        following_utc = tz.localize(following).astimezone(pytz.utc).replace(tzinfo=None)
+
+        return fire_utc + timedelta(seconds=self.spread_offset(schedule, following_utc - fire_utc))
+
+    def upcoming(self, schedule: ExecutionSchedule, count: int = 5) -> List[datetime]:
+        """接下来几次执行时间"""
+        runs = []
+        after = datetime.utcnow()
+        for _ in range(count):
+            after = self.next_run(schedule, after)
+            runs.append(after)
+        return runs
+
+    def spread_offset(self, schedule: ExecutionSchedule, period: timedelta) -> int:
+        """计划在错开窗口内的固定偏移（秒）
+
+        偏移由计划ID哈希得到，同一计划每次相同，大量同一时刻的计划均匀分布在窗口内。
+        窗口不超过两次触发的间隔，保证偏移后仍在下一次触发之前。
+        """
+        jitter = self.default_jitter if schedule.jitter is None else schedule.jitter
+        window = min(jitter, int(period.total_seconds()) - 60)
+        if window <= 0:
+            return 0
+        digest = hashlib.sha1(f'schedule:{schedule.id}'.encode('utf-8')).hexdigest()
+        return int(digest[:8], 16) % window
+
+    def is_running(self, schedule: ExecutionSchedule, now: Optional[datetime] = None) -> bool:
+        """上一次派发的执行是否还在排队或运行"""
+        if not schedule.last_task_id:
+            return False
+        execution = TaskExecution.query.filter_by(task_id=schedule.last_task_id).first()
+        if execution is None:
+            if admission.position(schedule.last_task_id) is not None:
+                return True
+            # 已派发但还未开始执行，超过排队超时认为任务已丢失
+            now = now or datetime.utcnow()
+            return bool(schedule.last_run_at) and now - schedule.last_run_at < timedelta(seconds=self.queued_timeout)
+        return execution.status not in FINISHED_STATUSES
+
+    def dispatch(self, schedule: ExecutionSchedule) -> Tuple[str, bool]:
+        """提交一次计划执行，返回(task_id, coalesced)
+
+        与手动执行一样经过准入队列，按计划创建者所在团队计入配额。
+        """
+        if schedule.target_type == 'adhoc':
+            task_id = str(uuid.uuid4())
+            admission.submit('app.tasks.ansible_tasks.execute_adhoc_task', {
+                'host_ids': schedule.host_ids or [],
+                'module': schedule.module,
+                'args': schedule.module_args or '',
+                'extra_vars': schedule.extra_vars or {},
+                'user_id': schedule.created_by
+            }, task_id, user_id=schedule.created_by, host_ids=schedule.host_ids)
+            return task_id, False
+
+        # 与手动执行相同的合并规则，已有相同执行在运行时不再重复提交
+        playbook = schedule.playbook
+        if playbook is None:
+            raise ValueError(f'Playbook {schedule.playbook_id} not found')
+        fingerprint = execution_fingerprint(playbook.content, schedule.host_ids, schedule.extra_vars,
+                                            schedule.options, files=playbook.files)
+        task_id, coalesced = execution_coalescer.claim(fingerprint, schedule.created_by)
+        if coalesced:
+            return task_id, True
+
+        try:
+            admission.submit('app.tasks.ansible_tasks.execute_playbook_task', {
+                'playbook_id': playbook.id,
+                'host_ids': schedule.host_ids or [],
+                'extra_vars': schedule.extra_vars or {},
+                'user_id': schedule.created_by,
+                'options': schedule.options or {}
+            }, task_id, user_id=schedule.created_by, host_ids=schedule.host_ids)
+        except Exception:
+            execution_coalescer.release(task_id)
+            raise
+        return task_id, False
+
+    def dispatch_due(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """派发所有到期的计划，返回各结果的数量"""
+        now = now or datetime.utcnow()
+        counts = {'dispatched': 0, 'skipped': 0, 'failed': 0}
+
+        due = ExecutionSchedule.query.filter(
+            ExecutionSchedule.enabled.is_(True),
+            ExecutionSchedule.next_run_at <= now
+        ).order_by(ExecutionSchedule.next_run_at).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+        for schedule in due:
+            if not schedule.allow_overlap and self.is_running(schedule, now):
+                # 上一次执行尚未结束，跳过本次触发
+                schedule.last_status = 'skipped'
+                schedule.skipped_runs = (schedule.skipped_runs or 0) + 1
+                counts['skipped'] += 1
+            else:
+                try:
+                    task_id, coalesced = self.dispatch(schedule)
+                except Exception as e:
+                    current_app.logger.error(f'Failed to dispatch schedule {schedule.id}: {e}')
+                    schedule.last_status = 'error'
+                    schedule.last_error = str(e)
+                    counts['failed'] += 1
+                else:
+                    schedule.last_task_id = task_id
+                    schedule.last_run_at = now
+                    schedule.last_status = 'coalesced' if coalesced else 'dispatched'
+                    schedule.last_error = None
+                    counts['dispatched'] += 1
+
+            # 错过的触发不补执行，从当前时间计算下一次
+            schedule.next_run_at = self.next_run(schedule, now)
+
+        db.session.commit()
+        return counts
+
+
+# 创建全局实例
+execution_scheduler = ExecutionScheduler()
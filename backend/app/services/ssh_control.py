@@ -0,0 +1,136 @@
+import os
+import re
+import stat
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+
+
+ANSIBLE_CFG_TEMPLATE = """# 由ansible-web自动生成，请勿手工修改
+[defaults]
+host_key_checking = False
+timeout = {connect_timeout}
+forks = {forks}
+
+[ssh_connection]
+pipelining = True
+control_path_dir = {control_dir}
+control_path = {control_dir}/%%r@%%h:%%p
+ssh_args = -o ControlMaster=auto -o ControlPersist={control_persist}s -o ServerAliveInterval=30 -o ConnectTimeout={connect_timeout}
+retries = 2
+"""
+
+# 套接字文件名格式：user@host:port
+SOCKET_NAME_PATTERN = re.compile(r'^(?P<user>[^@]+)@(?P<host>.+):(?P<port>\d+)$')
+
+
+class SSHControlManager:
+    """Worker级别的SSH连接复用管理
+
+    每个worker节点生成一份本地ansible.cfg，使用共享的ControlPath目录和
+    ControlPersist，同一节点上连续的执行可以复用到同一主机的SSH主连接。
+    """
+
+    @property
+    def worker_dir(self) -> str:
+        return current_app.config.get('ANSIBLE_WORKER_DIR', '/tmp/ansible-web')
+
+    @property
+    def control_dir(self) -> str:
+        return os.path.join(self.worker_dir, 'cp')
+
+    @property
+    def config_file(self) -> str:
+        return os.path.join(self.worker_dir, 'ansible.cfg')
+
+    def render_config(self) -> str:
+        """生成ansible.cfg内容"""
+        return ANSIBLE_CFG_TEMPLATE.format(
+            control_dir=self.control_dir,
+            control_persist=current_app.config.get('SSH_CONTROL_PERSIST', 600),
+            connect_timeout=current_app.config.get('SSH_CONNECT_TIMEOUT', 10),
+            forks=current_app.config.get('ANSIBLE_DEFAULT_FORKS', 20)
+        )
+
+    def ensure_config(self) -> str:
+        """确保worker本地的ansible.cfg存在且内容最新"""
+        os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+
+        content = self.render_config()
+        try:
+            with open(self.config_file, 'r') as f:
+                if f.read() == content:
+                    return self.config_file
+        except OSError:
+            pass
+
+        # 先写临时文件再替换，避免并发执行读到不完整的配置
+        tmp_file = f'{self.config_file}.{os.getpid()}'
+        with open(tmp_file, 'w') as f:
+            f.write(content)
+        os.replace(tmp_file, self.config_file)
+
+        return self.config_file
+
+    def runner_envvars(self) -> Dict[str, str]:
+        """runner调用使用的环境变量"""
+        return {'ANSIBLE_CONFIG': self.ensure_config()}
+
+    def list_sockets(self) -> List[Dict[str, Any]]:
+        """列出当前worker上的持久化SSH套接字"""
+        sockets = []
+        try:
+            entries = list(os.scandir(self.control_dir))
+        except OSError:
+            return sockets
+
+        now = time.time()
+        for entry in entries:
+            try:
+                info = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if not stat.S_ISSOCK(info.st_mode):
+                continue
+
+            match = SOCKET_NAME_PATTERN.match(entry.name)
+            sockets.append({
+                'path': entry.path,
+                'user': match.group('user') if match else None,
+                'host': match.group('host') if match else None,
+                'port': int(match.group('port')) if match else None,
+                'age': int(now - info.st_mtime)
+            })
+
+        return sockets
+
+    def expire_sockets(self, host: Optional[str] = None) -> int:
+        """关闭持久化SSH主连接，可按主机过滤"""
+        expired = 0
+        for socket_info in self.list_sockets():
+            if host and socket_info['host'] != host:
+                continue
+
+            target = socket_info['host'] or 'localhost'
+            try:
+                subprocess.run(
+                    ['ssh', '-O', 'exit', '-o', f'ControlPath={socket_info["path"]}', target],
+                    capture_output=True, timeout=5
+                )
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+
+            # 主连接已退出时套接字会被删除，残留的失效套接字直接清理
+            try:
+                os.remove(socket_info['path'])
+            except OSError:
+                pass
+            expired += 1
+
+        return expired
+
+
+# 创建全局实例
+ssh_control = SSHControlManager()
@@ -0,0 +1,255 @@
+import json
+import os
+import queue
+import select
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+
+from app.services.fact_cache import fact_cache
+from app.services.ssh_control import ssh_control
+
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'warm_worker.py')
+
+
+class WarmWorkerError(RuntimeError):
+    """预热进程异常退出"""
+
+
+class WarmWorkerStartError(WarmWorkerError):
+    """预热进程启动失败，任务尚未开始执行，可以改用普通方式执行"""
+
+
+class WarmWorker:
+    """一个预热的Ansible执行进程，通过stdin/stdout按行交换JSON消息"""
+
+    def __init__(self, env: Dict[str, str], max_jobs: int, startup_timeout: float):
+        self.max_jobs = max_jobs
+        self.jobs = 0
+        self._buffer = b''
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, str(max_jobs)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env
+        )
+        message = self._read(timeout=startup_timeout)
+        if message is None or message.get('type') != 'ready':
+            self.terminate()
+            raise WarmWorkerStartError('Warm worker failed to start')
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None and self.jobs < self.max_jobs
+
+    def run(self, job: Dict[str, Any], on_event: Callable[[Dict[str, Any]], None],
+            cancel_token: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """执行一个任务，事件逐条交给on_event，返回最终结果"""
+        self.jobs += 1
+        try:
+            self.process.stdin.write(json.dumps(job).encode('utf-8') + b'\n')
+            self.process.stdin.flush()
+        except OSError as e:
+            # 任务没有送达，调用方可以改用普通方式执行
+            self.terminate()
+            raise WarmWorkerStartError(str(e))
+
+        while True:
+            # 等待输出时定期检查取消标记，取消后直接终止进程，由进程池重建
+            if cancel_token is not None and cancel_token():
+                self.terminate()
+                return {'status': 'canceled', 'rc': 1}
+
+            message = self._read(timeout=1.0)
+            if message is None:
+                if self.process.poll() is not None:
+                    raise WarmWorkerError(f'Warm worker exited with code {self.process.returncode}')
+                continue
+            if message.get('type') == 'event':
+                on_event(message['event'])
+            elif message.get('type') == 'result':
+                message.pop('type')
+                return message
+
+    def terminate(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+    def _read(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """读取一条消息，直接读文件描述符并自行按行切分，避免缓冲区中的数据被select漏掉"""
+        deadline = time.monotonic() + timeout
+        while b'\n' not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select([self.process.stdout], [], [], remaining)
+            if not ready:
+                return None
+            data = os.read(self.process.stdout.fileno(), 65536)
+            if not data:
+                return None
+            self._buffer += data
+
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line)
+
+
+class WarmExecutionPool:
+    """预热的Ansible执行进程池
+
+    每个Celery worker进程维护若干个预先导入Ansible并初始化好插件的子进程，
+    ad-hoc任务直接在这些进程内执行，省去每次启动ansible命令的Python启动、
+    插件加载和collection扫描开销。每个进程执行max_jobs个任务后回收重建。
+    """
+
+    def __init__(self):
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._count = 0
+        self._pid = os.getpid()
+
+    @property
+    def enabled(self) -> bool:
+        return current_app.config.get('ANSIBLE_WARM_POOL_ENABLED', False)
+
+    @property
+    def size(self) -> int:
+        return current_app.config.get('ANSIBLE_WARM_POOL_SIZE', 1)
+
+    @property
+    def max_jobs(self) -> int:
+        return current_app.config.get('ANSIBLE_WARM_POOL_MAX_JOBS', 50)
+
+    def run_ad_hoc(self, inventory_file: str, module: str, args: str = '', extra_vars: Optional[Dict] = None,
+                   forks: Optional[int] = None, on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+                   cancel_token: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """在预热进程中执行ad-hoc任务"""
+        job = {
+            'inventory': inventory_file,
+            'module': module,
+            'args': args,
+            'extra_vars': extra_vars,
+            'forks': forks or current_app.config.get('ANSIBLE_DEFAULT_FORKS', 20)
+        }
+        worker = self._acquire()
+        try:
+            return worker.run(job, on_event or (lambda event: None), cancel_token)
+        except WarmWorkerError:
+            worker.terminate()
+            raise
+        except Exception as e:
+            # 协议错误等异常后进程状态未知，终止后由进程池重建
+            worker.terminate()
+            raise WarmWorkerError(str(e))
+        finally:
+            self._release(worker)
+
+    def prewarm(self) -> int:
+        """按进程池大小提前启动预热进程，返回启动的进程数"""
+        started = []
+        while self._count < self.size:
+            started.append(self._acquire())
+        for worker in started:
+            self._release(worker)
+        return len(started)
+
+    def shutdown(self):
+        """终止所有空闲的预热进程"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.terminate()
+            with self._lock:
+                self._count -= 1
+
+    def _acquire(self) -> WarmWorker:
+        self._check_fork()
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                worker = None
+            if worker is not None:
+                if worker.alive:
+                    return worker
+                self._discard(worker)
+                continue
+
+            with self._lock:
+                spawn = self._count < self.size
+                if spawn:
+                    self._count += 1
+            if spawn:
+                break
+
+            # 进程池已满，等待其他任务归还
+            try:
+                worker = self._idle.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if worker.alive:
+                return worker
+            self._discard(worker)
+
+        try:
+            return WarmWorker(self._worker_env(), self.max_jobs, startup_timeout=60)
+        except Exception as e:
+            with self._lock:
+                self._count -= 1
+            if isinstance(e, WarmWorkerStartError):
+                raise
+            raise WarmWorkerStartError(str(e))
+
+    def _release(self, worker: WarmWorker):
+        if worker.alive:
+            self._idle.put(worker)
+        else:
+            # 达到任务数上限或已退出的进程直接回收，下次使用时重建
+            self._discard(worker)
+
+    def _discard(self, worker: WarmWorker):
+        worker.terminate()
+        with self._lock:
+            self._count -= 1
+
+    def _check_fork(self):
+        """Celery prefork子进程不能复用父进程启动的预热进程"""
+        if os.getpid() != self._pid:
+            self._idle = queue.LifoQueue()
+            self._count = 0
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _worker_env() -> Dict[str, str]:
+        """预热进程的环境变量，Ansible配置在进程启动时读取"""
+        local_temp = os.path.join(current_app.config.get('ANSIBLE_WORKER_DIR', '/tmp/ansible-web'), 'warm')
+        os.makedirs(local_temp, exist_ok=True)
+        return dict(
+            os.environ,
+            **ssh_control.runner_envvars(),
+            **fact_cache.runner_envvars(),
+            ANSIBLE_LOCAL_TEMP=local_temp,
+            ANSIBLE_NOCOLOR='1'
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'size': self.size,
+            'max_jobs': self.max_jobs,
+            'workers': self._count,
+            'idle': self._idle.qsize()
+        }
+
+
+# 创建全局实例
+warm_pool = WarmExecutionPool()
@@ -0,0 +1,179 @@
+"""预热的Ansible执行进程
+
+由WarmExecutionPool以独立子进程启动（直接按文件路径执行，不导入app包）。
+启动时预先导入Ansible并初始化插件加载器，之后从stdin逐行读取JSON格式的
+ad-hoc任务，在进程内通过TaskQueueManager执行，并把与ansible-runner格式
+一致的事件和最终结果逐行写回。执行max_jobs个任务后自行退出，由进程池重建。
+"""
+import json
+import os
+import sys
+import time
+import traceback
+
+# 协议使用原始stdout，Ansible自身的输出重定向到stderr
+_protocol = os.fdopen(os.dup(sys.stdout.fileno()), 'w', buffering=1)
+os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+from ansible import context  # noqa: E402
+from ansible.executor.task_queue_manager import TaskQueueManager  # noqa: E402
+from ansible.inventory.manager import InventoryManager  # noqa: E402
+from ansible.module_utils.common.collections import ImmutableDict  # noqa: E402
+from ansible.parsing.dataloader import DataLoader  # noqa: E402
+from ansible.parsing.splitter import parse_kv  # noqa: E402
+from ansible.playbook.play import Play  # noqa: E402
+from ansible.plugins.callback import CallbackBase  # noqa: E402
+from ansible.plugins import loader as plugin_loader  # noqa: E402
+from ansible.vars.manager import VariableManager  # noqa: E402
+
+
+# 参数为自由格式的模块
+FREE_FORM_MODULES = ('command', 'shell', 'raw', 'script', 'win_command', 'win_shell')
+
+# 结果中的内部字段不返回
+INTERNAL_RESULT_KEYS = ('_ansible_no_log', '_ansible_verbose_always', '_ansible_verbose_override')
+
+
+def send(message):
+    _protocol.write(json.dumps(message, default=str) + '\n')
+
+
+def warm_up():
+    """初始化插件加载器并预加载常用插件"""
+    init_plugin_loader = getattr(plugin_loader, 'init_plugin_loader', None)
+    if init_plugin_loader is not None:
+        init_plugin_loader()
+    plugin_loader.connection_loader.get('ssh', class_only=True)
+    plugin_loader.strategy_loader.get('linear', class_only=True)
+    for module in ('ping', 'setup', 'command', 'shell'):
+        plugin_loader.module_loader.find_plugin(module)
+        plugin_loader.action_loader.get(module, class_only=True)
+
+
+class EventCallback(CallbackBase):
+    """把Ansible回调转换为ansible-runner格式的事件"""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'stdout'
+    CALLBACK_NAME = 'ansible_web_events'
+
+    def __init__(self):
+        super().__init__()
+        self.counter = 0
+        self.task_started = time.monotonic()
+        self.play = None
+
+    def _emit(self, event_type, event_data, stdout=''):
+        self.counter += 1
+        send({'type': 'event', 'event': {
+            'event': event_type,
+            'counter': self.counter,
+            'stdout': stdout,
+            'event_data': event_data
+        }})
+
+    def _host_event(self, event_type, result, label, ignore_errors=False):
+        res = {key: value for key, value in result._result.items() if key not in INTERNAL_RESULT_KEYS}
+        host = result._host.get_name()
+        event_data = {
+            'host': host,
+            'play': self.play,
+            'task': result._task.get_name(),
+            'task_uuid': result._task._uuid,
+            'res': res,
+            'duration': round(time.monotonic() - self.task_started, 3),
+            'ignore_errors': ignore_errors
+        }
+        self._emit(event_type, event_data, f'{host} | {label} => {json.dumps(res, default=str, sort_keys=True)}')
+
+    def v2_playbook_on_play_start(self, play):
+        self.play = play.get_name()
+        self._emit('playbook_on_play_start', {'play': self.play})
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self.task_started = time.monotonic()
+        self._emit('playbook_on_task_start', {'play': self.play, 'task': task.get_name(), 'task_uuid': task._uuid})
+
+    def v2_runner_on_ok(self, result):
+        label = 'CHANGED' if result._result.get('changed') else 'SUCCESS'
+        self._host_event('runner_on_ok', result, label)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._host_event('runner_on_failed', result, 'FAILED!', ignore_errors=ignore_errors)
+
+    def v2_runner_on_unreachable(self, result):
+        self._host_event('runner_on_unreachable', result, 'UNREACHABLE!')
+
+    def v2_runner_on_skipped(self, result):
+        self._host_event('runner_on_skipped', result, 'SKIPPED')
+
+
+def run_ad_hoc(job):
+    """在当前进程内执行一次ad-hoc任务"""
+    module = job['module']
+    args = job.get('args') or ''
+    extra_vars = job.get('extra_vars')
+
+    context.CLIARGS = ImmutableDict(
+        connection='smart', module_path=None, forks=job.get('forks') or 5,
+        become=None, become_method=None, become_user=None,
+        check=False, diff=False, verbosity=0, syntax=False, start_at_task=None,
+        extra_vars=(json.dumps(extra_vars),) if extra_vars else ()
+    )
+
+    loader = DataLoader()
+    inventory = InventoryManager(loader=loader, sources=[job['inventory']])
+    variable_manager = VariableManager(loader=loader, inventory=inventory)
+    play = Play().load({
+        'name': 'Ansible Ad-Hoc',
+        'hosts': job.get('pattern') or 'all',
+        'gather_facts': 'no',
+        'tasks': [{'action': {'module': module, 'args': parse_kv(args, check_raw=module in FREE_FORM_MODULES)}}]
+    }, variable_manager=variable_manager, loader=loader)
+
+    callback = EventCallback()
+    tqm = TaskQueueManager(
+        inventory=inventory,
+        variable_manager=variable_manager,
+        loader=loader,
+        passwords={},
+        stdout_callback=callback,
+        forks=job.get('forks') or 5
+    )
+    try:
+        rc = tqm.run(play)
+        stats = tqm._stats
+        summary = {
+            'ok': dict(stats.ok),
+            'changed': dict(stats.changed),
+            'failures': dict(stats.failures),
+            'dark': dict(stats.dark),
+            'skipped': dict(stats.skipped)
+        }
+        callback._emit('playbook_on_stats', summary)
+    finally:
+        tqm.cleanup()
+        loader.cleanup_all_tmp_files()
+
+    return {'status': 'successful' if rc == 0 else 'failed', 'rc': rc, 'stats': summary}
+
+
+def main():
+    max_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    warm_up()
+    send({'type': 'ready', 'pid': os.getpid()})
+
+    for jobs, line in enumerate(iter(sys.stdin.readline, ''), start=1):
+        try:
+            job = json.loads(line)
+            result = run_ad_hoc(job)
+        except Exception as e:
+            result = {'status': 'failed', 'rc': 1, 'error': str(e), 'traceback': traceback.format_exc()}
+        send(dict(result, type='result'))
+
+        if jobs >= max_jobs:
+            break
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,364 @@
-from celery import current_task
+from celery import current_task, chord
+from celery.exceptions import Retry
+from celery.worker.control import control_command
+from flask import current_app
 from datetime import datetime
 import json
+import time
 import traceback
 
 from app import celery, db
 from app.models import TaskExecution, Host, Playbook
 from app.services.ansible_service import ansible_service
-from app.websocket.events import emit_task_update
+from app.services.event_pipeline import EventPipeline
+from app.services.host_probe import HostProber
+from app.services.ssh_control import ssh_control
+from app.services.redis_client import get_redis
+from app.services.cancellation import CancellationToken, is_cancel_requested
+from app.services.execution_dedup import execution_coalescer
+from app.services.event_store import event_store
+from app.services.log_store import log_store, LogSink
+from app.services.progress import ProgressTracker, estimate_task_count
+from app.services.host_results import record_host_results
+from app.services.playbook_validator import playbook_validator
+from app.services.output_groups import OutputGrouper, host_result
+from app.services.scheduler import execution_scheduler
+from app.services.host_locks import host_locks, HostLockBusy
+from app.services.admission import admission
+from app.websocket.events import (
+    emit_task_update, emit_task_progress, emit_task_log, emit_host_status_diff, emit_adhoc_results
+)
+
+
+# 每台主机需要统计的runner事件
+HOST_RESULT_EVENTS = {
+    'runner_on_ok': 'ok',
+    'runner_on_failed': 'failed',
+    'runner_on_unreachable': 'unreachable',
+    'runner_on_skipped': 'skipped',
+}
+
+
+def mark_cancelled(execution):
+    """把尚未开始执行的记录标记为已取消"""
+    execution.status = 'cancelled'
+    execution.error_message = 'Execution cancelled'
+    execution.finished_at = datetime.utcnow()
+    db.session.commit()
+    execution_coalescer.release(execution.task_id)
+    host_locks.release(execution.task_id)
+    admission.release(execution.task_id)
+    
+    emit_task_update({
+        'task_id': execution.task_id,
+        'status': 'cancelled',
+        'message': 'Execution cancelled'
+    })
+    
+    return {
+        'status': 'cancelled',
+        'execution_id': execution.id
+    }
+
+
+def execution_status(result):
+    """把runner状态转换为执行记录状态"""
+    if result.get('status') == 'successful':
+        return 'success'
+    if result.get('status') == 'canceled':
+        return 'cancelled'
+    return 'failed'
+
+
+# 执行记录中保留的runner结果字段，stdout和事件明细分别在artifact归档和事件表中
+RESULT_SUMMARY_KEYS = ('status', 'rc', 'stats', 'event_count', 'error', 'artifacts_archive', 'artifacts_dir')
+
+
+def summarize_result(result, sink=None):
+    """只保留执行结果的摘要统计"""
+    summary = {key: result[key] for key in RESULT_SUMMARY_KEYS if key in result}
+    if sink is not None:
+        summary.update(sink.summary())
+    return summary
+
+
+def playbook_progress_tracker(playbook, host_ids=None, options=None):
+    """按Playbook内容和目标主机数创建进度跟踪器"""
+    host_count = len(set(host_ids)) if host_ids else Host.query.count()
+    serial = (options or {}).get('serial')
+    total_tasks = estimate_task_count(playbook.content, host_count, serial if isinstance(serial, int) else None)
+    return ProgressTracker(total_tasks, host_count)
+
+
+class ExecutionEventSink:
+    """执行事件消费者：持久化执行摘要并推送实时状态"""
+    
+    def __init__(self, celery_task, task_id, store_task_id=None, shard=0, tracker=None):
+        self.celery_task = celery_task
+        self.task_id = task_id
+        self.store_task_id = store_task_id or task_id
+        self.shard = shard
+        self.tracker = tracker or ProgressTracker()
+        self.publish_interval = current_app.config.get('PROGRESS_UPDATE_INTERVAL', 2.0)
+        self.execution_id = None
+        self.processed = 0
+        self.current_play = None
+        self.current_task = None
+        self.host_counts = {}
+        self.host_details = {}
+        self._last_publish = 0.0
+    
+    def __call__(self, events):
+        self.consume(events)
+        try:
+            self.store(events)
+        finally:
+            # 事件写库失败不影响实时进度；限制进度的写库和推送频率
+            if time.monotonic() - self._last_publish >= self.publish_interval:
+                self._last_publish = time.monotonic()
+                self.publish()
+    
+    def close(self):
+        """事件处理结束时发布最终进度"""
+        self.publish()
+    
+    def store(self, events):
+        """把事件追加写入事件表"""
+        if self.execution_id is None:
+            self.execution_id = event_store.execution_id(self.store_task_id)
+        if self.execution_id is not None:
+            event_store.append(self.execution_id, events, shard=self.shard)
+    
+    def consume(self, events):
+        """统计一批事件"""
+        for event in events:
+            self.processed += 1
+            self.tracker.consume(event)
+            event_type = event.get('event')
+            event_data = event.get('event_data', {})
+            
+            if event_type == 'playbook_on_play_start':
+                self.current_play = event_data.get('play')
+            elif event_type == 'playbook_on_task_start':
+                self.current_task = event_data.get('task')
+            elif event_type in HOST_RESULT_EVENTS:
+                host = event_data.get('host')
+                counts = self.host_counts.setdefault(host, {})
+                key = HOST_RESULT_EVENTS[event_type]
+                counts[key] = counts.get(key, 0) + 1
+                if event_data.get('res', {}).get('changed'):
+                    counts['changed'] = counts.get('changed', 0) + 1
+                
+                # 每台主机的耗时和最后失败的任务，执行结束时写入主机结果表
+                details = self.host_details.setdefault(host, {'duration': 0.0})
+                details['duration'] += event_data.get('duration') or 0
+                if key == 'unreachable' or (key == 'failed' and not event_data.get('ignore_errors')):
+                    details['last_failed_task'] = event_data.get('task')
+    
+    def publish(self):
+        """持久化执行摘要并推送实时状态"""
+        summary = self.summary()
+        
+        # 持久化执行摘要和进度
+        execution = TaskExecution.query.filter_by(task_id=self.task_id).first()
+        if execution:
+            execution.result = summary
+            execution.progress = summary['progress']
+            db.session.commit()
+        
+        # 在消费线程中调用，需要显式指定task_id
+        self.celery_task.update_state(
+            task_id=self.task_id,
+            state='PROGRESS',
+            meta={
+                'current': summary['progress'],
+                'total': 100,
+                'status': self.current_task or 'Running...',
+                'processed_events': self.processed,
+                'eta': summary['eta']
+            }
+        )
+        
+        emit_task_progress(self.task_id, summary['progress'], message=self.current_task, eta=summary['eta'])
+        emit_task_update(dict(summary, task_id=self.task_id, status='running'))
+    
+    def summary(self):
+        """当前执行摘要，只包含每台主机的计数"""
+        totals = {}
+        for counts in self.host_counts.values():
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+        
+        return dict(self.tracker.summary(), **{
+            'processed_events': self.processed,
+            'current_play': self.current_play,
+            'current_task': self.current_task,
+            'host_count': len(self.host_counts),
+            'totals': totals
+        })
+
+
+class LiveLogSink:
+    """实时日志推送
+
+    按执行缓冲stdout行，达到时间间隔或字节数阈值时一次性推送到任务房间。
+    每条消息带递增序号和日志字节偏移，客户端发现序号不连续时可以
+    用偏移从日志接口补齐。
+    """
+    
+    def __init__(self, task_id, shard=None):
+        self.task_id = task_id
+        self.shard = shard
+        self.flush_interval = current_app.config.get('LIVE_LOG_FLUSH_INTERVAL', 0.25)
+        self.flush_bytes = current_app.config.get('LIVE_LOG_FLUSH_BYTES', 64 * 1024)
+        self.seq = 0
+        self.line = 0
+        self.offset = 0
+        self._lines = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+    
+    def __call__(self, events):
+        for event in events:
+            stdout = event.get('stdout')
+            if not stdout:
+                continue
+            for line in stdout.splitlines():
+                self._lines.append(line)
+                # 与分块日志的字节偏移保持一致
+                self._size += len(line.encode('utf-8', errors='replace')) + 1
+                if self._size >= self.flush_bytes:
+                    self.flush()
+        self.tick()
+    
+    def tick(self):
+        """超过刷新间隔时推送缓冲内容"""
+        if self._lines and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._lines:
+            return
+        
+        self.seq += 1
+        emit_task_log(self.task_id, {
+            'seq': self.seq,
+            'shard': self.shard,
+            'first_line': self.line,
+            'offset': self.offset,
+            'next_offset': self.offset + self._size,
+            'lines': self._lines
+        })
+        self.line += len(self._lines)
+        self.offset += self._size
+        self._lines = []
+        self._size = 0
+    
+    def close(self):
+        self.flush()
+
+
+class AdHocResultSink:
+    """Ad-hoc逐主机结果推送
+
+    主机完成后按刷新间隔批量推送(主机, 状态, 输出哈希)，每个输出只在
+    第一次出现时随批次发送一次；同时按输出哈希合并主机，结束时只需
+    发送分组摘要而不是每台主机的原始输出。
+    """
+    
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.flush_interval = current_app.config.get('ADHOC_RESULT_FLUSH_INTERVAL', 0.5)
+        self.grouper = OutputGrouper(current_app.config.get('ADHOC_OUTPUT_MAX_BYTES', 4096))
+        self.seq = 0
+        self.completed = 0
+        self._results = []
+        self._outputs = {}
+        self._last_flush = time.monotonic()
+    
+    def __call__(self, events):
+        for event in events:
+            parsed = host_result(event)
+            if parsed is None:
+                continue
+            host, result, output = parsed
+            digest, created = self.grouper.add(host, result['status'], output, result['rc'])
+            if created:
+                self._outputs[digest] = self.grouper.output(digest)
+            self._results.append(dict(result, host=host, hash=digest))
+        self.tick()
+    
+    def tick(self):
+        if self._results and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._results:
+            return
+    
+        self.seq += 1
+        self.completed += len(self._results)
+        emit_adhoc_results(self.task_id, {
+            'seq': self.seq,
+            'completed': self.completed,
+            'results': self._results,
+            'outputs': self._outputs
+        })
+        self._results = []
+        self._outputs = {}
+    
+    def close(self):
+        self.flush()
+    
+    def summary(self, limit=None):
+        """按输出合并后的主机分组摘要"""
+        return self.grouper.summary(limit)
+
+
+def acquire_host_locks(celery_task, holder, host_ids, policy=None, task_id=None, waiting_since=None):
+    """按策略申请执行目标主机的锁
+
+    返回租约，未启用主机锁或等待期间被取消时返回None。queue策略下主机被占用时
+    重新排队本任务，fail策略冲突或等待超时时抛出HostLockConflict。
+    """
+    if not host_locks.enabled:
+        return None
+    task_id = task_id or holder
+    
+    def on_wait(conflicts):
+        emit_task_update({
+            'task_id': task_id,
+            'status': 'running',
+            'message': f'Waiting for {len(conflicts)} hosts locked by other executions',
+            'locked_by': sorted(set(conflicts.values()))
+        })
+    
+    try:
+        return host_locks.acquire(
+            holder,
+            host_ids,
+            policy,
+            cancel_check=lambda: is_cancel_requested(task_id),
+            on_wait=on_wait,
+            # 重新排队的任务从第一次排队开始累计等待时间
+            waiting_since=waiting_since if celery_task.request.retries else None
+        )
+    except HostLockBusy as e:
+        on_wait(e.conflicts)
+        raise celery_task.retry(countdown=host_locks.requeue_delay, max_retries=None)
 
 
 @celery.task(bind=True)
-def execute_playbook_task(self, playbook_id, host_ids=None, extra_vars=None, user_id=None):
-    """异步执行Playbook任务"""
+def execute_playbook_task(self, playbook_id, host_ids=None, extra_vars=None, user_id=None, options=None,
+                          shards=None, lock_policy=None):
+    """异步执行Playbook任务
+
+    shards大于1时把主机拆分成多个分片，以chord的方式分发到多个worker并行执行，
+    由merge_playbook_shards汇总到同一个TaskExecution。
+    lock_policy为目标主机被其它执行占用时的处理方式：wait、queue或fail。
+    """
     task_id = self.request.id
     
     try:
@@ -20,17 +367,23 @@ def execute_playbook_task(self, playbook_id, host_ids=None, extra_vars=None, use
         if not playbook:
             raise ValueError(f'Playbook {playbook_id} not found')
         
-        # 创建任务执行记录
-        execution = TaskExecution(
-            task_id=task_id,
-            name=f'Execute Playbook: {playbook.name}',
-            status='running',
-            playbook_id=playbook_id,
-            executed_by=user_id,
-            started_at=datetime.utcnow()
-        )
-        db.session.add(execution)
-        db.session.commit()
+        # 创建任务执行记录，因主机被占用重新排队时沿用已有记录
+        execution = TaskExecution.query.filter_by(task_id=task_id).first()
+        if execution is None:
+            execution = TaskExecution(
+                task_id=task_id,
+                name=f'Execute Playbook: {playbook.name}',
+                status='running',
+                playbook_id=playbook_id,
+                executed_by=user_id,
+                started_at=datetime.utcnow()
+            )
+            db.session.add(execution)
+            db.session.commit()
+        
+        # 排队期间已被取消
+        if is_cancel_requested(task_id):
+            return mark_cancelled(execution)
         
         # 发送任务开始通知
         emit_task_update({
@@ -40,6 +393,30 @@ def execute_playbook_task(self, playbook_id, host_ids=None, extra_vars=None, use
             'message': 'Starting playbook execution...'
         })
         
+        # 分片执行
+        shard_host_ids = split_host_shards(host_ids, shards)
+        if len(shard_host_ids) > 1:
+            execution.result = {'sharded': True, 'shards': len(shard_host_ids)}
+            db.session.commit()
+            
+            # 各分片分别申请自己的主机锁
+            chord(
+                execute_playbook_shard.s(task_id, index, playbook_id, ids, extra_vars, options, lock_policy)
+                for index, ids in enumerate(shard_host_ids)
+            )(merge_playbook_shards.s(task_id))
+            
+            return {
+                'status': 'running',
+                'sharded': True,
+                'shards': len(shard_host_ids),
+                'execution_id': execution.id
+            }
+        
+        # 申请目标主机锁，与其它执行没有重叠主机时立即获得
+        acquire_host_locks(self, task_id, host_ids, lock_policy, waiting_since=execution.created_at)
+        if is_cancel_requested(task_id):
+            return mark_cancelled(execution)
+        
         # 更新任务状态
         self.update_state(
             state='PROGRESS',
@@ -50,43 +427,58 @@ def execute_playbook_task(self, playbook_id, host_ids=None, extra_vars=None, use
             }
         )
         
-        # 执行Playbook
+        # 流式执行Playbook，事件在执行过程中逐批处理
+        sink = ExecutionEventSink(self, task_id, tracker=playbook_progress_tracker(playbook, host_ids, options))
+        pipeline = EventPipeline(sinks=[sink, LogSink(log_store.writer(task_id)), LiveLogSink(task_id)])
         result = ansible_service.execute_playbook(
             playbook_id=playbook_id,
             host_ids=host_ids,
-            extra_vars=extra_vars
+            extra_vars=extra_vars,
+            ident=task_id,
+            event_pipeline=pipeline,
+            options=options,
+            cancel_token=CancellationToken(task_id)
         )
         
-        # 处理执行结果
-        if result['status'] == 'successful':
-            execution.status = 'success'
+        # 处理执行结果，取消时保留已完成部分的结果
+        execution.status = execution_status(result)
+        if execution.status == 'success':
             execution.progress = 100
-            final_status = 'SUCCESS'
+        elif execution.status == 'cancelled':
+            execution.error_message = 'Execution cancelled'
         else:
-            execution.status = 'failed'
             execution.error_message = result.get('error', 'Execution failed')
-            final_status = 'FAILURE'
         
-        execution.result = result
+        summary = summarize_result(result, sink)
+        execution.result = summary
         execution.logs = result.get('stdout', '')
         execution.finished_at = datetime.utcnow()
         db.session.commit()
+        record_host_results(execution, result.get('stats'), sink.host_details)
+        
+        # 释放主机锁、相同执行的合并锁和准入名额
+        host_locks.release(task_id)
+        execution_coalescer.release(task_id)
+        admission.release(task_id)
         
         # 发送任务完成通知
         emit_task_update({
             'task_id': task_id,
             'status': execution.status,
             'progress': 100,
-            'result': result,
+            'result': summary,
             'message': 'Playbook execution completed'
         })
         
         return {
             'status': execution.status,
-            'result': result,
+            'result': summary,
             'execution_id': execution.id
         }
         
+    except Retry:
+        # 主机被占用，任务重新排队
+        raise
     except Exception as exc:
         # 更新执行记录
         execution = TaskExecution.query.filter_by(task_id=task_id).first()
@@ -96,6 +488,10 @@ def execute_playbook_task(self, playbook_id, host_ids=None, extra_vars=None, use
             execution.finished_at = datetime.utcnow()
             db.session.commit()
         
+        host_locks.release(task_id)
+        execution_coalescer.release(task_id)
+        admission.release(task_id)
+        
         # 发送错误通知
         emit_task_update({
             'task_id': task_id,
@@ -115,22 +511,223 @@ def execute_playbook_task(self, playbook_id, host_ids=None, extra_vars=None, use
         raise exc
 
 
+def split_host_shards(host_ids, shards):
+    """把主机列表按轮询方式拆分为分片，返回每个分片的主机ID列表"""
+    if not shards or shards <= 1:
+        return [host_ids]
+    
+    # 未指定主机时对全部主机分片
+    if not host_ids:
+        host_ids = [row.id for row in db.session.query(Host.id).order_by(Host.id)]
+    
+    host_ids = sorted(set(host_ids))
+    shards = min(shards, len(host_ids))
+    if shards <= 1:
+        return [host_ids]
+    
+    return [host_ids[index::shards] for index in range(shards)]
+
+
+def _shard_key(parent_task_id):
+    return f'execution:{parent_task_id}:shards'
+
+
+def _update_shard_progress(parent_task_id, shard_index, summary):
+    """记录分片进度，并把所有分片的合并进度写入父执行记录"""
+    redis_client = get_redis()
+    key = _shard_key(parent_task_id)
+    redis_client.hset(key, shard_index, json.dumps(summary))
+    redis_client.expire(key, 7 * 24 * 3600)
+    
+    shard_summaries = [json.loads(value) for value in redis_client.hvals(key)]
+    execution = TaskExecution.query.filter_by(task_id=parent_task_id).first()
+    if not execution:
+        return
+    
+    shard_count = (execution.result or {}).get('shards') or len(shard_summaries)
+    finished = sum(1 for item in shard_summaries if item.get('finished'))
+    totals = {}
+    for item in shard_summaries:
+        for key_name, value in item.get('totals', {}).items():
+            totals[key_name] = totals.get(key_name, 0) + value
+    
+    # 未上报的分片按0计算，剩余时间取最慢的分片
+    progress = sum(100 if item.get('finished') else item.get('progress', 0)
+                   for item in shard_summaries) / shard_count if shard_count else 0
+    etas = [item['eta'] for item in shard_summaries if not item.get('finished') and item.get('eta') is not None]
+    eta = max(etas) if etas else None
+    execution.progress = max(min(int(progress), 99), execution.progress or 0)
+    execution.result = {
+        'sharded': True,
+        'shards': shard_count,
+        'finished_shards': finished,
+        'progress': execution.progress,
+        'eta': eta,
+        'totals': totals
+    }
+    db.session.commit()
+    
+    emit_task_progress(parent_task_id, execution.progress,
+                       message=f'{finished}/{shard_count} shards finished', eta=eta)
+
+
+class ShardEventSink(ExecutionEventSink):
+    """分片事件消费者：进度汇总到父执行记录"""
+    
+    def __init__(self, celery_task, task_id, parent_task_id, shard_index, tracker=None):
+        super().__init__(celery_task, task_id, store_task_id=parent_task_id, shard=shard_index, tracker=tracker)
+        self.parent_task_id = parent_task_id
+        self.shard_index = shard_index
+    
+    def publish(self):
+        _update_shard_progress(self.parent_task_id, self.shard_index, self.summary())
+
+
 @celery.task(bind=True)
-def execute_adhoc_task(self, host_ids, module, args='', extra_vars=None, user_id=None):
+def execute_playbook_shard(self, parent_task_id, shard_index, playbook_id, host_ids, extra_vars=None,
+                           options=None, lock_policy=None):
+    """执行一个Playbook分片，异常也以结果返回以免中断chord"""
+    ident = f'{parent_task_id}-shard{shard_index}'
+    playbook = Playbook.query.get(playbook_id)
+    tracker = playbook_progress_tracker(playbook, host_ids, options) if playbook else None
+    sink = ShardEventSink(self, self.request.id, parent_task_id, shard_index, tracker=tracker)
+    try:
+        if not is_cancel_requested(parent_task_id):
+            parent = TaskExecution.query.filter_by(task_id=parent_task_id).first()
+            acquire_host_locks(self, ident, host_ids, lock_policy, task_id=parent_task_id,
+                               waiting_since=parent.created_at if parent else None)
+        
+        if is_cancel_requested(parent_task_id):
+            # 父执行已取消，排队中的分片不再启动
+            result = {'status': 'canceled', 'rc': 1, 'stdout': '', 'stderr': ''}
+        else:
+            pipeline = EventPipeline(sinks=[
+                sink, LogSink(log_store.writer(ident)), LiveLogSink(parent_task_id, shard=shard_index)
+            ])
+            result = ansible_service.execute_playbook(
+                playbook_id=playbook_id,
+                host_ids=host_ids,
+                extra_vars=extra_vars,
+                ident=ident,
+                event_pipeline=pipeline,
+                options=options,
+                cancel_token=CancellationToken(parent_task_id)
+            )
+    except Retry:
+        raise
+    except Exception as exc:
+        result = {
+            'status': 'failed',
+            'rc': 1,
+            'error': str(exc),
+            'stdout': '',
+            'stderr': str(exc)
+        }
+    
+    host_locks.release(ident)
+    result['shard_index'] = shard_index
+    result['host_count'] = len(host_ids)
+    result['host_details'] = sink.host_details
+    _update_shard_progress(parent_task_id, shard_index, dict(
+        sink.summary(), finished=True, status=result['status']
+    ))
+    return result
+
+
+@celery.task
+def merge_playbook_shards(shard_results, parent_task_id):
+    """汇总所有分片的执行结果"""
+    execution = TaskExecution.query.filter_by(task_id=parent_task_id).first()
+    
+    stats = {}
+    host_details = {}
+    logs = []
+    errors = []
+    event_count = 0
+    for shard in sorted(shard_results, key=lambda item: item.get('shard_index', 0)):
+        # 各分片主机不重叠，按统计项直接合并
+        for stat_name, per_host in (shard.get('stats') or {}).items():
+            stats.setdefault(stat_name, {}).update(per_host)
+        host_details.update(shard.get('host_details') or {})
+        event_count += shard.get('event_count', 0)
+        logs.append(f'===== shard {shard.get("shard_index")} ({shard.get("host_count")} hosts): '
+                    f'{shard.get("status")} =====')
+        logs.append(shard.get('stdout', ''))
+        if shard.get('error'):
+            errors.append(f'shard {shard.get("shard_index")}: {shard["error"]}')
+    
+    successful = all(shard.get('status') == 'successful' for shard in shard_results)
+    cancelled = any(shard.get('status') == 'canceled' for shard in shard_results)
+    result = {
+        'status': 'successful' if successful else ('canceled' if cancelled else 'failed'),
+        'rc': 0 if successful else max(shard.get('rc') or 0 for shard in shard_results) or 1,
+        'stats': stats,
+        'event_count': event_count,
+        'sharded': True,
+        'shards': [{
+            'shard_index': shard.get('shard_index'),
+            'host_count': shard.get('host_count'),
+            'status': shard.get('status'),
+            'rc': shard.get('rc')
+        } for shard in shard_results]
+    }
+    
+    status = execution_status(result)
+    if execution:
+        execution.status = status
+        execution.progress = 100
+        execution.result = result
+        execution.logs = '\n'.join(logs)
+        if status == 'cancelled':
+            execution.error_message = 'Execution cancelled'
+        elif status == 'failed':
+            execution.error_message = '; '.join(errors) or 'Execution failed'
+        execution.finished_at = datetime.utcnow()
+        db.session.commit()
+        record_host_results(execution, stats, host_details)
+    
+    get_redis().delete(_shard_key(parent_task_id))
+    execution_coalescer.release(parent_task_id)
+    admission.release(parent_task_id)
+    
+    emit_task_update({
+        'task_id': parent_task_id,
+        'status': status,
+        'progress': 100,
+        'result': result,
+        'message': 'Playbook execution completed'
+    })
+    
+    return result
+
+
+@celery.task(bind=True)
+def execute_adhoc_task(self, host_ids, module, args='', extra_vars=None, user_id=None, lock_policy=None):
     """异步执行Ad-hoc命令任务"""
     task_id = self.request.id
     
     try:
-        # 创建任务执行记录
-        execution = TaskExecution(
-            task_id=task_id,
-            name=f'Ad-hoc: {module} {args}',
-            status='running',
-            executed_by=user_id,
-            started_at=datetime.utcnow()
-        )
-        db.session.add(execution)
-        db.session.commit()
+        # 创建任务执行记录，因主机被占用重新排队时沿用已有记录
+        execution = TaskExecution.query.filter_by(task_id=task_id).first()
+        if execution is None:
+            execution = TaskExecution(
+                task_id=task_id,
+                name=f'Ad-hoc: {module} {args}',
+                status='running',
+                executed_by=user_id,
+                started_at=datetime.utcnow()
+            )
+            db.session.add(execution)
+            db.session.commit()
+        
+        # 排队期间已被取消
+        if is_cancel_requested(task_id):
+            return mark_cancelled(execution)
+        
+        # 申请目标主机锁
+        acquire_host_locks(self, task_id, host_ids, lock_policy, waiting_since=execution.created_at)
+        if is_cancel_requested(task_id):
+            return mark_cancelled(execution)
         
         # 发送任务开始通知
         emit_task_update({
@@ -140,42 +737,62 @@ def execute_adhoc_task(self, host_ids, module, args='', extra_vars=None, user_id
             'message': f'Executing {module} command...'
         })
         
-        # 执行Ad-hoc命令
+        # 流式执行Ad-hoc命令，只有一个任务
+        host_count = len(set(host_ids)) if host_ids else Host.query.count()
+        sink = ExecutionEventSink(self, task_id, tracker=ProgressTracker(1, host_count))
+        # 逐主机推送结果，并按输出合并主机
+        results_sink = AdHocResultSink(task_id)
+        pipeline = EventPipeline(sinks=[
+            sink, results_sink, LogSink(log_store.writer(task_id)), LiveLogSink(task_id)
+        ])
         result = ansible_service.execute_ad_hoc(
             host_ids=host_ids,
             module=module,
             args=args,
-            extra_vars=extra_vars
+            extra_vars=extra_vars,
+            ident=task_id,
+            event_pipeline=pipeline,
+            cancel_token=CancellationToken(task_id)
         )
         
-        # 处理执行结果
-        if result['status'] == 'successful':
-            execution.status = 'success'
+        # 处理执行结果，取消时保留已完成部分的结果
+        execution.status = execution_status(result)
+        if execution.status == 'success':
             execution.progress = 100
+        elif execution.status == 'cancelled':
+            execution.error_message = 'Execution cancelled'
         else:
-            execution.status = 'failed'
             execution.error_message = result.get('error', 'Execution failed')
         
-        execution.result = result
+        # 结果中只保留输出分组摘要，完整分组通过output-groups接口查询
+        summary = summarize_result(result, sink)
+        summary['output_groups'] = results_sink.summary(current_app.config.get('ADHOC_OUTPUT_GROUP_LIMIT', 50))
+        execution.result = summary
         execution.logs = result.get('stdout', '')
         execution.finished_at = datetime.utcnow()
         db.session.commit()
+        record_host_results(execution, result.get('stats'), sink.host_details)
+        host_locks.release(task_id)
+        admission.release(task_id)
         
         # 发送任务完成通知
         emit_task_update({
             'task_id': task_id,
             'status': execution.status,
             'progress': 100,
-            'result': result,
+            'result': summary,
             'message': 'Ad-hoc command completed'
         })
         
         return {
             'status': execution.status,
-            'result': result,
+            'result': summary,
             'execution_id': execution.id
         }
         
+    except Retry:
+        # 主机被占用，任务重新排队
+        raise
     except Exception as exc:
         # 更新执行记录
         execution = TaskExecution.query.filter_by(task_id=task_id).first()
@@ -185,6 +802,9 @@ def execute_adhoc_task(self, host_ids, module, args='', extra_vars=None, user_id
             execution.finished_at = datetime.utcnow()
             db.session.commit()
         
+        host_locks.release(task_id)
+        admission.release(task_id)
+        
         # 发送错误通知
         emit_task_update({
             'task_id': task_id,
@@ -233,62 +853,78 @@ def check_host_connectivity(host_id):
 
 
 @celery.task
-def check_all_hosts_connectivity():
-    """检查所有主机的连接性"""
-    hosts = Host.query.all()
-    results = []
+def check_all_hosts_connectivity(batch_size=None, forks=None):
+    """分批检查所有主机的连接性"""
+    batch_size = batch_size or current_app.config.get('ANSIBLE_SWEEP_BATCH_SIZE', 500)
+    forks = forks or current_app.config.get('ANSIBLE_SWEEP_FORKS', 50)
+    
+    host_ids = [row.id for row in db.session.query(Host.id).order_by(Host.id)]
+    
+    # 先用轻量级TCP/SSH探测过滤不可达主机
+    prober = None
+    if current_app.config.get('HOST_PROBE_ENABLED', True):
+        prober = HostProber(
+            concurrency=current_app.config.get('HOST_PROBE_CONCURRENCY', 500),
+            timeout=current_app.config.get('HOST_PROBE_TIMEOUT', 3.0)
+        )
+    
+    counts = {}
+    changes = []
+    errors = []
     
-    for host in hosts:
+    for start in range(0, len(host_ids), batch_size):
+        batch = host_ids[start:start + batch_size]
         try:
-            result = ansible_service.check_host_connectivity(host.id)
-            results.append({
-                'host_id': host.id,
-                'status': 'success',
-                'result': result
-            })
+            result = ansible_service.check_hosts_connectivity(batch, forks=forks, prober=prober)
         except Exception as exc:
-            results.append({
-                'host_id': host.id,
-                'status': 'failed',
+            db.session.rollback()
+            errors.append({
+                'host_range': [batch[0], batch[-1]],
                 'error': str(exc)
             })
+            continue
+        
+        for status, count in result['counts'].items():
+            counts[status] = counts.get(status, 0) + count
+        changes.extend(result['changes'])
+    
+    diff = {
+        'checked': len(host_ids),
+        'counts': counts,
+        'changes': changes,
+        'errors': errors
+    }
     
-    return results
+    # 发送状态变化汇总
+    emit_host_status_diff(diff)
+    
+    return diff
 
 
 @celery.task
-def gather_host_facts(host_id):
+def gather_host_facts(host_id, refresh=True):
     """收集主机facts信息"""
     try:
-        facts = ansible_service.get_ansible_facts(host_id)
+        facts = ansible_service.get_ansible_facts(host_id, refresh=refresh)
         
         # 更新主机信息
         host = Host.query.get(host_id)
         if host and facts:
-            # 提取有用的facts信息
-            if 'ansible_facts' in facts:
-                ansible_facts = facts['ansible_facts']
-                
-                # 更新主机变量
-                if not host.variables:
-                    host.variables = {}
-                
-                host.variables.update({
-                    'ansible_facts': {
-                        'os_family': ansible_facts.get('ansible_os_family'),
-                        'distribution': ansible_facts.get('ansible_distribution'),
-                        'distribution_version': ansible_facts.get('ansible_distribution_version'),
-                        'architecture': ansible_facts.get('ansible_architecture'),
-                        'processor_cores': ansible_facts.get('ansible_processor_cores'),
-                        'memtotal_mb': ansible_facts.get('ansible_memtotal_mb'),
-                        'hostname': ansible_facts.get('ansible_hostname'),
-                        'fqdn': ansible_facts.get('ansible_fqdn'),
-                        'default_ipv4': ansible_facts.get('ansible_default_ipv4'),
-                        'last_updated': datetime.utcnow().isoformat()
-                    }
-                })
-                
-                db.session.commit()
+            # 提取有用的facts信息，完整facts保存在fact cache中
+            host.variables = dict(host.variables or {}, ansible_facts={
+                'os_family': facts.get('ansible_os_family'),
+                'distribution': facts.get('ansible_distribution'),
+                'distribution_version': facts.get('ansible_distribution_version'),
+                'architecture': facts.get('ansible_architecture'),
+                'processor_cores': facts.get('ansible_processor_cores'),
+                'memtotal_mb': facts.get('ansible_memtotal_mb'),
+                'hostname': facts.get('ansible_hostname'),
+                'fqdn': facts.get('ansible_fqdn'),
+                'default_ipv4': facts.get('ansible_default_ipv4'),
+                'last_updated': datetime.utcnow().isoformat()
+            })
+            
+            db.session.commit()
         
         return facts
         
@@ -315,8 +951,8 @@ def cleanup_old_tasks():
     
     db.session.commit()
     
-    # 清理Ansible artifacts
-    ansible_service.cleanup_old_artifacts(days=7)
+    # 清理Ansible artifacts归档
+    ansible_service.cleanup_old_artifacts()
     
     return f'Cleaned up {count} old task records'
 
@@ -329,7 +965,7 @@ def validate_playbook_syntax(playbook_id):
         if not playbook:
             raise ValueError(f'Playbook {playbook_id} not found')
         
-        result = ansible_service.validate_playbook(playbook.content)
+        result = playbook_validator.validate(playbook.content, playbook.files)
         
         return result
         
@@ -350,4 +986,34 @@ def periodic_health_check():
     # 清理旧任务
     cleanup_old_tasks.delay()
     
-    return 'Periodic health check completed'
\ No newline at end of file
+    return 'Periodic health check completed'
+
+
+@celery.task
+def dispatch_due_schedules():
+    """派发到期的定时执行计划，由celery beat定期触发"""
+    return execution_scheduler.dispatch_due()
+
+
+@celery.task
+def pump_admission_queue():
+    """定期派发准入队列，回收worker异常退出时未释放的名额"""
+    return {'dispatched': admission.pump()}
+
+
+# Worker远程控制命令：SSH持久连接是worker本地状态，通过broadcast在每个worker上执行
+@control_command()
+def list_ssh_control_sockets(state):
+    """列出当前worker上的持久化SSH套接字"""
+    with celery.flask_app.app_context():
+        return {'sockets': ssh_control.list_sockets()}
+
+
+@control_command(
+    args=[('host', str)],
+    signature='[host]'
+)
+def expire_ssh_control_sockets(state, host=None):
+    """关闭当前worker上的持久化SSH主连接"""
+    with celery.flask_app.app_context():
+        return {'expired': ssh_control.expire_sockets(host)}
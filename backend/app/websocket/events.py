@@ -88,13 +88,14 @@ def emit_inventory_update(action, data=None):
     socketio.emit('inventory_update', update_data, broadcast=True)
 
 
-def emit_task_progress(task_id, progress, message=None):
-    """发送任务进度更新"""
+def emit_task_progress(task_id, progress, message=None, eta=None):
+    """发送任务进度更新，eta为预计剩余秒数"""
     progress_data = {
         'type': 'task_progress',
         'task_id': task_id,
         'progress': progress,
         'message': message,
+        'eta': eta,
         'timestamp': datetime.utcnow().isoformat()
     }
     
@@ -103,7 +104,11 @@ def emit_task_progress(task_id, progress, message=None):
 
 
 def emit_task_log(task_id, log_data):
-    """发送任务日志"""
+    """发送任务日志
+
+    log_data包含seq（递增序号）、first_line、offset/next_offset和lines，
+    序号不连续时客户端可以按offset从日志接口补齐。
+    """
     log_update = {
         'type': 'task_log',
         'task_id': task_id,
@@ -115,6 +120,23 @@ def emit_task_log(task_id, log_data):
     socketio.emit('task_log', log_update, room=f'task_{task_id}')
 
 
+def emit_adhoc_results(task_id, result_data):
+    """发送一批已完成主机的Ad-hoc结果
+
+    result_data包含seq、completed、results（主机、状态、rc和输出哈希）
+    以及本批中首次出现的输出outputs（按哈希索引），相同输出只发送一次。
+    """
+    result_update = {
+        'type': 'adhoc_results',
+        'task_id': task_id,
+        'result_data': result_data,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+    # 发送到任务房间
+    socketio.emit('adhoc_results', result_update, room=f'task_{task_id}')
+
+
 def emit_system_stats(stats):
     """发送系统统计信息"""
     stats_data = {
@@ -225,4 +247,16 @@ def emit_connection_test_result(host_id, result):
     
     # 发送到主机房间和管理员房间
     socketio.emit('connection_test_result', test_data, room=f'host_{host_id}')
-    socketio.emit('connection_test_result', test_data, room='admin')
\ No newline at end of file
+    socketio.emit('connection_test_result', test_data, room='admin')
+
+
+def emit_host_status_diff(diff):
+    """发送主机状态批量变化汇总"""
+    diff_data = {
+        'type': 'host_status_diff',
+        'diff': diff,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+    
+    # 发送到管理员房间
+    socketio.emit('host_status_diff', diff_data, room='admin')
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+# 从backend目录导入app包；导入app时会创建一次应用，需先设置测试用数据库
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('REDIS_URL', 'redis://localhost:6379/15')
+
+from app import create_app, db as _db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """使用临时目录和内存数据库的应用，测试期间保持应用上下文"""
+    app = create_app('testing')
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        ANSIBLE_WORKER_DIR=str(tmp_path / 'worker'),
+        ARTIFACT_ARCHIVE_DIR=str(tmp_path / 'archives'),
+        LOG_STORE_DIR=str(tmp_path / 'task_logs'),
+    )
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def db(app):
+    """建好所有表的数据库会话"""
+    _db.create_all()
+    yield _db
+    _db.session.remove()
+    _db.drop_all()
+
+
+@pytest.fixture
+def redis_client(app):
+    """测试专用的Redis库，Redis不可用时跳过"""
+    from app.services.redis_client import get_redis
+
+    client = get_redis()
+    try:
+        client.ping()
+    except Exception:
+        pytest.skip('Redis is not available')
+    client.flushdb()
+    yield client
+    client.flushdb()
@@ -0,0 +1,91 @@
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+def _job(subject='team:ops', slots=1, hosts=1):
+    scope, name = subject.split(':')
+    return {'subject': subject, 'scope': scope, 'name': name, 'slots': str(slots), 'hosts': str(hosts)}
+
+
+def _usage(slots=0, **subjects):
+    return {'slots': slots, 'subjects': {f'team:{name}': usage for name, usage in subjects.items()}}
+
+
+QUOTAS = {
+    'team:ops': {'max_running': 2, 'max_hosts': 100, 'weight': 1.0},
+    'team:dev': {'max_running': None, 'max_hosts': None, 'weight': 1.0},
+}
+
+
+@pytest.fixture
+def controller(app):
+    app.config.update(ADMISSION_CAPACITY=4, ADMISSION_RESERVED_SLOTS=1, ADMISSION_SMALL_JOB_HOSTS=10)
+    return AdmissionController()
+
+
+def test_job_within_capacity_and_quota_is_not_blocked(controller):
+    assert controller._blocked_by(_job(), _usage(), dict(QUOTAS)) is None
+
+
+def test_large_job_cannot_use_reserved_slot(controller):
+    usage = _usage(slots=3, dev={'running': 3, 'hosts': 30})
+    assert controller._blocked_by(_job('team:dev', hosts=50), usage, dict(QUOTAS)) == 'capacity'
+    # 小任务可以使用保留名额
+    assert controller._blocked_by(_job('team:dev', hosts=5), usage, dict(QUOTAS)) is None
+
+
+def test_job_larger_than_capacity_runs_when_idle(controller):
+    assert controller._blocked_by(_job('team:dev', slots=10), _usage(), dict(QUOTAS)) is None
+    assert controller._blocked_by(_job('team:dev', slots=10), _usage(slots=1), dict(QUOTAS)) == 'capacity'
+
+
+def test_subject_quotas_block_dispatch(controller):
+    usage = _usage(slots=2, ops={'running': 2, 'hosts': 20})
+    assert controller._blocked_by(_job(), usage, dict(QUOTAS)) == 'running_quota'
+
+    usage = _usage(slots=1, ops={'running': 1, 'hosts': 90})
+    assert controller._blocked_by(_job(hosts=20), usage, dict(QUOTAS)) == 'host_quota'
+    assert controller._blocked_by(_job(hosts=10), usage, dict(QUOTAS)) is None
+
+
+def test_submit_dispatches_in_fair_order(db, redis_client, controller, monkeypatch):
+    from app.models import ExecutionQuota
+
+    sent = []
+    monkeypatch.setattr(AdmissionController, '_send', staticmethod(lambda name, kwargs, task_id: sent.append(task_id)))
+    db.session.add(ExecutionQuota(scope='default', max_running=1, max_hosts=100, weight=1.0))
+    db.session.commit()
+
+    assert controller.submit('run', {}, 'a1', host_ids=[1])['queued'] is False
+    queued = controller.submit('run', {}, 'a2', host_ids=[1])
+    assert queued['queued'] is True
+    assert queued['blocked_by'] == 'running_quota'
+    assert controller.position('a2')['position'] == 1
+    assert sent == ['a1']
+
+    controller.release('a1')
+    assert sent == ['a1', 'a2']
+    assert controller.position('a2') is None
+    assert controller.dispatched('a2') is True
+
+
+def test_submit_rejects_executions_over_host_quota(db, redis_client, controller):
+    from app.models import ExecutionQuota
+
+    db.session.add(ExecutionQuota(scope='default', max_running=1, max_hosts=2, weight=1.0))
+    db.session.commit()
+
+    with pytest.raises(AdmissionRejected):
+        controller.submit('run', {}, 'big', host_ids=[1, 2, 3])
+
+
+def test_cancel_removes_only_queued_executions(db, redis_client, controller, monkeypatch):
+    monkeypatch.setattr(AdmissionController, '_send', staticmethod(lambda name, kwargs, task_id: None))
+    controller.submit('run', {}, 'running', host_ids=[1], slots=4)
+    controller.submit('run', {}, 'waiting', host_ids=[1])
+
+    assert controller.owner('waiting') == ''
+    assert controller.cancel('waiting') is True
+    assert controller.owner('waiting') is None
+    assert controller.cancel('running') is False
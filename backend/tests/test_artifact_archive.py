@@ -0,0 +1,89 @@
+import json
+import os
+import zlib
+
+import pytest
+
+from app.services import artifact_archive as archive_module
+from app.services.artifact_archive import artifact_archive
+
+
+@pytest.fixture
+def artifact_dir(tmp_path):
+    """模拟runner的artifact目录"""
+    path = tmp_path / 'artifacts' / 'run-1'
+    (path / 'job_events').mkdir(parents=True)
+    (path / 'stdout').write_bytes(b'PLAY [all]\n' * 5000)
+    (path / 'status').write_text('successful\n')
+    (path / 'rc').write_text('0')
+    # 事件按计数排序，而不是按文件名字典序
+    for counter in (1, 2, 10):
+        (path / 'job_events' / f'{counter}-uuid{counter}.json').write_text(json.dumps({'counter': counter}))
+    return path
+
+
+def test_pack_round_trip(app, artifact_dir):
+    manifest = artifact_archive.pack(str(artifact_dir), 'run-1')
+
+    assert manifest['status'] == 'successful'
+    assert manifest['rc'] == '0'
+    assert not artifact_dir.exists()
+    assert artifact_archive.read('run-1', 'stdout') == b'PLAY [all]\n' * 5000
+    assert artifact_archive.read('run-1', 'status') == b'successful\n'
+    assert artifact_archive.read('run-1', 'missing') is None
+    assert [event['counter'] for event in artifact_archive.iter_events('run-1')] == [1, 2, 10]
+    assert [event['counter'] for event in artifact_archive.iter_events('run-1', start=2)] == [10]
+
+
+def test_pack_offsets_are_contiguous(app, artifact_dir):
+    manifest = artifact_archive.pack(str(artifact_dir), 'run-1', remove_source=False)
+    entries = list(manifest['files'].values()) + manifest['events']
+    entries.sort(key=lambda entry: entry['offset'])
+
+    offset = 0
+    for entry in entries:
+        assert entry['offset'] == offset
+        offset += entry['length']
+
+    pack_path = os.path.join(app.config['ARTIFACT_ARCHIVE_DIR'], os.listdir(app.config['ARTIFACT_ARCHIVE_DIR'])[0],
+                             manifest['pack'])
+    assert os.path.getsize(pack_path) == offset
+    assert manifest['files']['stdout']['size'] == len(b'PLAY [all]\n' * 5000)
+
+
+def test_pack_streams_files_larger_than_one_chunk(app, artifact_dir, monkeypatch):
+    monkeypatch.setattr(archive_module, 'CHUNK_SIZE', 1000)
+    data = os.urandom(10000)
+    (artifact_dir / 'stdout').write_bytes(data)
+
+    manifest = artifact_archive.pack(str(artifact_dir), 'run-2')
+    assert manifest['files']['stdout']['size'] == len(data)
+    assert artifact_archive.read('run-2', 'stdout') == data
+
+
+def test_write_member_produces_single_zlib_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_module, 'CHUNK_SIZE', 7)
+    source = tmp_path / 'member'
+    source.write_bytes(b'hello world ' * 100)
+
+    with open(tmp_path / 'pack', 'wb') as pack:
+        length, size = artifact_archive._write_member(pack, str(source))
+
+    packed = (tmp_path / 'pack').read_bytes()
+    assert length == len(packed)
+    assert size == 1200
+    assert zlib.decompress(packed) == b'hello world ' * 100
+
+
+def test_pack_missing_directory_returns_none(app, tmp_path):
+    assert artifact_archive.pack(str(tmp_path / 'missing'), 'run-3') is None
+    assert artifact_archive.manifest('run-3') is None
+
+
+def test_purge_removes_expired_day_directories(app):
+    root = app.config['ARTIFACT_ARCHIVE_DIR']
+    for day in ('20000101', '20000102', '99991231'):
+        os.makedirs(os.path.join(root, day))
+
+    assert artifact_archive.purge(days=7) == 2
+    assert os.listdir(root) == ['99991231']
@@ -0,0 +1,62 @@
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from app.services import cancellation
+from app.services.cancellation import CancellationToken, is_cancel_requested, request_cancel
+
+
+def test_cancel_flag_round_trip(redis_client):
+    assert is_cancel_requested('run-1') is False
+    request_cancel('run-1')
+    assert is_cancel_requested('run-1') is True
+    assert redis_client.ttl('execution:run-1:cancel') > 0
+
+
+def test_token_checks_flag_at_most_once_per_interval(monkeypatch):
+    checks = []
+    now = [100.0]
+    monkeypatch.setattr(cancellation, 'is_cancel_requested', lambda task_id: checks.append(task_id) or False)
+    monkeypatch.setattr(cancellation, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    token = CancellationToken('run-1', check_interval=5)
+
+    assert token() is False
+    now[0] += 4
+    assert token() is False
+    assert checks == ['run-1']
+
+    now[0] += 1
+    assert token() is False
+    assert checks == ['run-1', 'run-1']
+
+
+def test_token_kills_process_group_once_cancelled(monkeypatch):
+    killed = []
+    monkeypatch.setattr(cancellation, 'is_cancel_requested', lambda task_id: True)
+    monkeypatch.setattr(CancellationToken, 'kill_process_group', lambda self: killed.append(self.task_id))
+    token = CancellationToken('run-1', check_interval=0)
+
+    assert token() is True
+    assert token() is True
+    assert token.cancelled is True
+    assert killed == ['run-1']
+
+
+def test_kill_process_group_terminates_matching_children(tmp_path):
+    private_data_dir = str(tmp_path / 'run-1')
+    # 命令行引用工作目录的子进程属于本次执行
+    target = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)', private_data_dir],
+                              start_new_session=True)
+    other = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'], start_new_session=True)
+    try:
+        token = CancellationToken('run-1', kill_timeout=5)
+        assert token._find_leaders() == []
+        token.attach(private_data_dir)
+        assert [process.pid for process in token._find_leaders()] == [target.pid]
+
+        token.kill_process_group()
+        assert target.wait(timeout=5) is not None
+        assert other.poll() is None
+    finally:
+        other.kill()
+        other.wait()
@@ -0,0 +1,113 @@
+import time
+
+from app.services.event_pipeline import EventPipeline
+
+
+class RecordingSink:
+    """记录收到的批次，可选地在每批处理时等待"""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.batches = []
+        self.ticks = 0
+        self.closed = False
+
+    def __call__(self, batch):
+        if self.delay:
+            time.sleep(self.delay)
+        self.batches.append(list(batch))
+
+    def tick(self):
+        self.ticks += 1
+
+    def close(self):
+        self.closed = True
+
+    @property
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+
+def _events(count):
+    return [{'event': 'verbose', 'counter': index, 'stdout': f'line {index}'} for index in range(count)]
+
+
+def test_all_events_are_delivered_in_order_and_batched():
+    sink = RecordingSink()
+    pipeline = EventPipeline([sink], batch_size=10, flush_interval=0.01).start()
+    for event in _events(95):
+        assert pipeline.event_handler(event) is True
+    pipeline.close()
+
+    assert [event['counter'] for event in sink.events] == list(range(95))
+    assert all(len(batch) <= 10 for batch in sink.batches)
+    assert sink.closed is True
+    assert pipeline.event_count == 95
+
+
+def test_bounded_queue_blocks_producer_until_consumed():
+    sink = RecordingSink(delay=0.01)
+    pipeline = EventPipeline([sink], maxsize=5, batch_size=5, flush_interval=0.01).start()
+    for event in _events(50):
+        pipeline.event_handler(event)
+        assert pipeline._queue.qsize() <= 5
+    pipeline.close()
+
+    assert len(sink.events) == 50
+
+
+def test_failing_sink_does_not_stop_other_sinks():
+    def broken(batch):
+        raise RuntimeError('sink down')
+
+    sink = RecordingSink()
+    pipeline = EventPipeline([broken, sink], batch_size=3, flush_interval=0.01).start()
+    for event in _events(7):
+        pipeline.event_handler(event)
+    pipeline.close()
+
+    assert len(sink.events) == 7
+    assert 'sink down' in pipeline.errors
+
+
+def test_status_handler_queues_status_event():
+    sink = RecordingSink()
+    pipeline = EventPipeline([sink], flush_interval=0.01).start()
+    pipeline.status_handler({'status': 'running', 'runner_ident': 'run-1'})
+    pipeline.close()
+
+    assert pipeline.last_status == 'running'
+    assert sink.events == [{'event': 'runner_status', 'status': 'running', 'runner_ident': 'run-1'}]
+
+
+def test_idle_pipeline_ticks_sinks():
+    sink = RecordingSink()
+    pipeline = EventPipeline([sink], flush_interval=0.01).start()
+    time.sleep(0.1)
+    pipeline.close()
+
+    assert sink.ticks > 1
+    assert sink.batches == []
+
+
+def test_stdout_tail_keeps_last_lines():
+    pipeline = EventPipeline(stdout_tail_lines=3)
+    pipeline.start()
+    pipeline.event_handler({'stdout': 'a\nb'})
+    pipeline.event_handler({'event': 'verbose'})
+    pipeline.event_handler({'stdout': 'c\nd'})
+    pipeline.close()
+
+    assert pipeline.stdout_text() == 'b\nc\nd'
+
+
+def test_start_and_close_are_idempotent():
+    pipeline = EventPipeline()
+    assert pipeline.start() is pipeline
+    thread = pipeline._thread
+    pipeline.start()
+    assert pipeline._thread is thread
+
+    pipeline.close()
+    pipeline.close()
+    assert not thread.is_alive()
@@ -0,0 +1,71 @@
+from app.services.execution_dedup import execution_coalescer, execution_fingerprint
+
+
+CONTENT = '- hosts: all\n  tasks: []\n'
+
+
+def test_fingerprint_ignores_host_order_and_duplicates():
+    assert execution_fingerprint(CONTENT, [3, 1, 2, 1]) == execution_fingerprint(CONTENT, [1, 2, 3])
+    assert execution_fingerprint(CONTENT, None) == execution_fingerprint(CONTENT, [])
+
+
+def test_fingerprint_ignores_key_order():
+    first = execution_fingerprint(CONTENT, extra_vars={'a': 1, 'b': 2}, options={'forks': 5, 'serial': 2})
+    second = execution_fingerprint(CONTENT, extra_vars={'b': 2, 'a': 1}, options={'serial': 2, 'forks': 5})
+    assert first == second
+
+
+def test_fingerprint_changes_with_any_input():
+    base = execution_fingerprint(CONTENT, [1], {'a': 1}, {'forks': 5}, 1, {'vars.yml': 'a: 1'})
+    assert execution_fingerprint(CONTENT + '\n', [1], {'a': 1}, {'forks': 5}, 1, {'vars.yml': 'a: 1'}) != base
+    assert execution_fingerprint(CONTENT, [2], {'a': 1}, {'forks': 5}, 1, {'vars.yml': 'a: 1'}) != base
+    assert execution_fingerprint(CONTENT, [1], {'a': 2}, {'forks': 5}, 1, {'vars.yml': 'a: 1'}) != base
+    assert execution_fingerprint(CONTENT, [1], {'a': 1}, {'forks': 6}, 1, {'vars.yml': 'a: 1'}) != base
+    assert execution_fingerprint(CONTENT, [1], {'a': 1}, {'forks': 5}, 2, {'vars.yml': 'a: 1'}) != base
+    assert execution_fingerprint(CONTENT, [1], {'a': 1}, {'forks': 5}, 1, {'vars.yml': 'a: 2'}) != base
+    # 不分片等同于一个分片
+    assert execution_fingerprint(CONTENT, [1], {'a': 1}, {'forks': 5}, None, {'vars.yml': 'a: 1'}) == base
+
+
+def test_claim_coalesces_identical_executions(db, redis_client):
+    fingerprint = execution_fingerprint(CONTENT, [1])
+    task_id, coalesced = execution_coalescer.claim(fingerprint)
+    assert coalesced is False
+    assert execution_coalescer.claim(fingerprint) == (task_id, True)
+
+    execution_coalescer.release(task_id)
+    new_task_id, coalesced = execution_coalescer.claim(fingerprint)
+    assert coalesced is False
+    assert new_task_id != task_id
+
+
+def test_idempotency_key_returns_same_task_per_user(db, redis_client):
+    task_id, _ = execution_coalescer.claim(execution_fingerprint(CONTENT, [1]), user_id=1, idempotency_key='k')
+    other = execution_fingerprint(CONTENT, [2])
+    # 同一幂等键即使参数不同也返回原来的task_id
+    assert execution_coalescer.claim(other, user_id=1, idempotency_key='k') == (task_id, True)
+    assert execution_coalescer.claim(other, user_id=2, idempotency_key='k')[1] is False
+
+
+def test_release_frees_idempotency_key_of_execution_that_never_started(db, redis_client):
+    fingerprint = execution_fingerprint(CONTENT, [1])
+    task_id, _ = execution_coalescer.claim(fingerprint, user_id=1, idempotency_key='retry')
+    execution_coalescer.release(task_id)
+
+    retried, coalesced = execution_coalescer.claim(fingerprint, user_id=1, idempotency_key='retry')
+    assert coalesced is False
+    assert retried != task_id
+
+
+def test_finished_execution_lock_is_reclaimed(db, redis_client):
+    from app.models import TaskExecution
+
+    fingerprint = execution_fingerprint(CONTENT, [1])
+    task_id, _ = execution_coalescer.claim(fingerprint)
+    db.session.add(TaskExecution(task_id=task_id, name='deploy', status='success'))
+    db.session.commit()
+
+    # worker崩溃没有释放锁时，已结束的执行不再合并新请求
+    new_task_id, coalesced = execution_coalescer.claim(fingerprint)
+    assert coalesced is False
+    assert new_task_id != task_id
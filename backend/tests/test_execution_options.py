@@ -0,0 +1,86 @@
+import pytest
+import yaml
+
+from app.services.ansible_service import ansible_service
+
+
+PLAYBOOK = """---
+# 部署
+- name: web   # 注释保留
+  hosts: web
+  vars:
+    secret: !vault |
+      $ANSIBLE_VAULT;1.1;AES256
+      6162636465
+  tasks:
+    - debug: msg=hi
+-
+  hosts: db
+  serial: 1
+- import_playbook: other.yml
+-
+  hosts: all
+  tasks: []
+"""
+
+
+def test_serial_positions_only_for_plays_without_serial():
+    # 第一个play的name键和最后一个play的hosts键
+    assert ansible_service._serial_positions(PLAYBOOK) == [(2, 2), (15, 2)]
+
+
+def test_apply_serial_keeps_comments_tags_and_order():
+    result = ansible_service._apply_serial(PLAYBOOK, '25%')
+
+    assert '# 部署' in result
+    assert '# 注释保留' in result
+    assert '!vault |' in result
+    assert result.count('serial: "25%"') == 2
+    assert '- serial: "25%"\n  name: web' in result
+    assert '-\n  serial: "25%"\n  hosts: all' in result
+    # 已声明serial的play不变
+    assert '  hosts: db\n  serial: 1\n' in result
+    # 改写后仍是合法的YAML，且只增加了serial
+    assert yaml.compose(result, Loader=yaml.SafeLoader) is not None
+    assert len(result.splitlines()) == len(PLAYBOOK.splitlines()) + 2
+
+
+def test_apply_serial_integer_value():
+    result = ansible_service._apply_serial('- hosts: all\n  tasks: []\n', 3)
+    assert result == '- serial: 3\n  hosts: all\n  tasks: []\n'
+
+
+@pytest.mark.parametrize('serial', [2, '50%'])
+@pytest.mark.parametrize('content', [
+    '[{hosts: all, tasks: []}]',
+    'hosts: all\n',
+    '- hosts: all\n  tasks: [\n',
+])
+def test_validate_rejects_serial_that_cannot_be_applied(app, serial, content):
+    errors = ansible_service.validate_execution_options({'serial': serial}, content)
+    assert len(errors) == 1
+    assert errors[0].startswith('serial cannot be applied')
+
+
+@pytest.mark.parametrize('serial', [2, '50%'])
+def test_validate_accepts_applicable_serial(app, serial):
+    assert ansible_service.validate_execution_options({'serial': serial}, PLAYBOOK) == []
+
+
+@pytest.mark.parametrize('serial', [0, -1, True, '0%', '101%', '5', 'half'])
+def test_validate_rejects_invalid_serial_values(app, serial):
+    errors = ansible_service.validate_execution_options({'serial': serial}, PLAYBOOK)
+    assert errors == ['serial must be a positive integer or a percentage like "25%"']
+
+
+def test_validate_other_options(app):
+    app.config['ANSIBLE_MAX_FORKS'] = 50
+    errors = ansible_service.validate_execution_options({
+        'forks': 51,
+        'pipelining': 'yes',
+        'unknown': 1
+    })
+    assert 'Unknown execution options: unknown' in errors
+    assert 'forks must be an integer between 1 and 50' in errors
+    assert 'pipelining must be a boolean' in errors
+    assert ansible_service.validate_execution_options({'forks': 10, 'pipelining': True}) == []
@@ -0,0 +1,87 @@
+import pytest
+
+from app.services.host_locks import HostLockBusy, HostLockConflict, HostLockManager, HostLockTimeout
+
+
+@pytest.fixture
+def locks(app, redis_client):
+    app.config.update(HOST_LOCK_TTL=30, HOST_LOCK_POLL_INTERVAL=0.01, HOST_LOCK_WAIT_TIMEOUT=0.05)
+    manager = HostLockManager()
+    yield manager
+    for holder in list(manager._leases):
+        manager.release(holder)
+
+
+def test_try_acquire_is_all_or_nothing(locks, redis_client):
+    assert locks.try_acquire('a', [1, 2]) == {}
+    assert locks.try_acquire('b', [2, 3]) == {2: 'a'}
+    # 冲突时不会占用其余主机
+    assert redis_client.get('hostlock:host:3') is None
+    # 持有者可以重复获得自己的锁
+    assert locks.try_acquire('a', [1, 2]) == {}
+
+
+def test_disjoint_executions_run_in_parallel(locks):
+    first = locks.acquire('a', [1, 2], policy='fail')
+    second = locks.acquire('b', [3, 4], policy='fail')
+    assert first is not None and second is not None
+    assert {holder['holder'] for holder in locks.holders()} == {'a', 'b'}
+
+
+def test_fail_policy_raises_conflict(locks):
+    locks.acquire('a', [1, 2], policy='fail')
+    with pytest.raises(HostLockConflict) as excinfo:
+        locks.acquire('b', [2], policy='fail')
+    assert excinfo.value.conflicts == {2: 'a'}
+    assert locks.metrics()['conflicts'] == 1
+
+
+def test_queue_policy_raises_busy_and_marks_waiting(locks):
+    locks.acquire('a', [1], policy='fail')
+    with pytest.raises(HostLockBusy):
+        locks.acquire('b', [1], policy='queue')
+    assert [waiter['holder'] for waiter in locks.waiting()] == ['b']
+
+
+def test_wait_policy_times_out(locks):
+    locks.acquire('a', [1], policy='fail')
+    waits = []
+    with pytest.raises(HostLockTimeout):
+        locks.acquire('b', [1], policy='wait', on_wait=waits.append)
+    assert waits == [{1: 'a'}]
+    assert locks.waiting() == []
+    assert locks.metrics()['timeouts'] == 1
+
+
+def test_wait_policy_stops_when_cancelled(locks):
+    locks.acquire('a', [1], policy='fail')
+    assert locks.acquire('b', [1], policy='wait', cancel_check=lambda: True) is None
+    assert locks.waiting() == []
+
+
+def test_release_frees_hosts_for_next_holder(locks):
+    locks.acquire('a', [1, 2], policy='fail')
+    assert locks.release('a') == 2
+    assert locks.host_holder(1) is None
+    assert locks.acquire('b', [1], policy='fail') is not None
+    assert locks.host_holder(1)['holder'] == 'b'
+
+
+def test_release_by_another_process_uses_registered_hosts(locks):
+    locks.acquire('a', [1, 2], policy='fail')
+    # 模拟在其它进程中强制释放：本进程没有该租约
+    lease = locks._leases.pop('a')
+    lease._stop.set()
+
+    assert HostLockManager().release('a') == 2
+    assert locks.holders() == []
+
+
+def test_metrics_track_waits(locks):
+    locks.acquire('a', [1], policy='fail')
+    locks.acquire('b', [2], policy='fail')
+    metrics = locks.metrics()
+    assert metrics['acquired'] == 2
+    assert metrics['acquired_after_wait'] == 0
+    assert metrics['samples'] == 2
+    assert metrics['holders'] == 2
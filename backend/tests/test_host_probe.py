@@ -0,0 +1,91 @@
+import socket
+import threading
+
+import pytest
+
+from app.services.host_probe import HostProber
+
+
+@pytest.fixture
+def server():
+    """本地TCP服务，连接后发送指定banner"""
+    sockets = []
+
+    def start(banner=None):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(16)
+        sockets.append(listener)
+
+        def serve():
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except OSError:
+                    return
+                sockets.append(conn)
+                if banner is not None:
+                    conn.sendall(banner)
+
+        threading.Thread(target=serve, daemon=True).start()
+        return listener.getsockname()[1]
+
+    yield start
+    for sock in sockets:
+        sock.close()
+
+
+@pytest.fixture
+def closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_ssh_banner_is_detected(server):
+    port = server(b'SSH-2.0-OpenSSH_9.6\r\n')
+    result = HostProber(timeout=2, banner_timeout=2).probe({'web1': ('127.0.0.1', port)})['web1']
+
+    assert result['reachable'] is True
+    assert result['ssh'] is True
+    assert result['banner'] == 'SSH-2.0-OpenSSH_9.6'
+    assert result['latency_ms'] >= 0
+    assert result['error'] is None
+
+
+def test_open_port_without_banner_is_reachable(server):
+    port = server()
+    result = HostProber(timeout=2, banner_timeout=0.1).probe({1: ('127.0.0.1', port)})[1]
+
+    assert result['reachable'] is True
+    assert result['ssh'] is False
+    assert result['banner'] is None
+
+
+def test_non_ssh_banner_is_not_ssh(server):
+    port = server(b'220 smtp ready\r\n')
+    result = HostProber(timeout=2, banner_timeout=2).probe({1: ('127.0.0.1', port)})[1]
+    assert result['reachable'] is True
+    assert result['ssh'] is False
+
+
+def test_refused_connection_is_unreachable(closed_port):
+    result = HostProber(timeout=2).probe({1: ('127.0.0.1', closed_port)})[1]
+    assert result['reachable'] is False
+    assert result['latency_ms'] is None
+    assert result['error']
+
+
+def test_many_hosts_are_probed_with_bounded_concurrency(server, closed_port):
+    port = server(b'SSH-2.0-test\r\n')
+    targets = {index: ('127.0.0.1', port if index % 2 else closed_port) for index in range(50)}
+    results = HostProber(concurrency=5, timeout=2, banner_timeout=2).probe(targets)
+
+    assert set(results) == set(targets)
+    assert all(results[index]['ssh'] is bool(index % 2) for index in targets)
+
+
+def test_empty_targets():
+    assert HostProber().probe({}) == {}
@@ -0,0 +1,110 @@
+import json
+
+from app.services.inventory_cache import InventoryCache
+
+
+INDEX = {
+    1: {'hostname': 'web1', 'group': 'web', 'group_vars': {'http_port': 80}, 'hostvars': {'ansible_host': '10.0.0.1'}},
+    2: {'hostname': 'web2', 'group': 'web', 'group_vars': {'http_port': 80}, 'hostvars': {'ansible_host': '10.0.0.2'}},
+    3: {'hostname': 'db1', 'group': 'ungrouped', 'group_vars': {}, 'hostvars': {'ansible_host': '10.0.0.3'}},
+}
+
+
+class StubCache(InventoryCache):
+    """版本戳和主机索引由测试控制的缓存"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.current_version = (3, 3)
+        self.loads = 0
+
+    def version(self):
+        return self.current_version
+
+    def _load_index(self):
+        self.loads += 1
+        return INDEX
+
+
+def test_build_groups_selected_hosts():
+    cache = InventoryCache()
+    inventory = cache._build(INDEX, (1, 3, 99))
+
+    assert inventory['web'] == {'hosts': ['web1'], 'vars': {'http_port': 80}}
+    assert inventory['ungrouped']['hosts'] == ['db1']
+    assert set(inventory['_meta']['hostvars']) == {'web1', 'db1'}
+
+
+def test_build_without_key_includes_all_hosts():
+    inventory = InventoryCache()._build(INDEX, None)
+    assert inventory['web']['hosts'] == ['web1', 'web2']
+    assert len(inventory['_meta']['hostvars']) == 3
+
+
+def test_snapshots_are_cached_per_host_set():
+    cache = StubCache()
+    first = cache.get([2, 1, 1])
+    assert cache.get([1, 2]) is first
+    assert json.loads(first)['web']['hosts'] == ['web1', 'web2']
+
+    cache.get()
+    assert cache.stats() == {'entries': 2, 'indexed_hosts': 3, 'hits': 1, 'misses': 2}
+    # 同一版本内主机索引只加载一次
+    assert cache.loads == 1
+
+
+def test_version_change_rebuilds_index():
+    cache = StubCache()
+    first = cache.get([1])
+    cache.current_version = (4, 4)
+    assert cache.get([1]) is not first
+    assert cache.loads == 2
+    assert cache.stats()['entries'] == 1
+
+
+def test_invalidate_clears_snapshots():
+    cache = StubCache()
+    cache.get([1])
+    cache.invalidate()
+    assert cache.stats()['entries'] == 0
+    cache.get([1])
+    assert cache.loads == 2
+
+
+def test_least_recently_used_snapshot_is_evicted():
+    cache = StubCache(max_entries=2)
+    cache.get([1])
+    cache.get([2])
+    cache.get([1])
+    cache.get([3])
+
+    assert list(cache._snapshots) == [(1,), (3,)]
+
+
+def test_get_loads_hosts_and_group_vars_from_database(db):
+    from app.models import Host, HostGroup
+
+    group = HostGroup(name='web', variables={'http_port': 80})
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([
+        Host(name='web1', hostname='web1', ip_address='10.0.0.1', port=2222, username='deploy',
+             password='secret', group_id=group.id, variables={'role': 'primary'}),
+        Host(name='db1', hostname='db1', ip_address='10.0.0.2', private_key_path='/keys/id_rsa'),
+    ])
+    db.session.commit()
+
+    cache = InventoryCache()
+    inventory = json.loads(cache.get())
+    assert inventory['web'] == {'hosts': ['web1'], 'vars': {'http_port': 80}}
+    assert inventory['ungrouped']['hosts'] == ['db1']
+    assert inventory['_meta']['hostvars']['web1'] == {
+        'ansible_host': '10.0.0.1', 'ansible_port': 2222, 'ansible_user': 'deploy',
+        'ansible_password': 'secret', 'role': 'primary'
+    }
+    assert inventory['_meta']['hostvars']['db1']['ansible_private_key_file'] == '/keys/id_rsa'
+
+    # 新增主机改变版本戳，缓存自动失效
+    db.session.add(Host(name='web2', hostname='web2', ip_address='10.0.0.3', group_id=group.id))
+    db.session.commit()
+    assert json.loads(cache.get())['web']['hosts'] == ['web1', 'web2']
@@ -0,0 +1,101 @@
+import pytest
+
+from app.services.log_store import LogSink, log_store
+
+
+LINES = [f'line {index:03d}' for index in range(100)]
+
+
+@pytest.fixture
+def ident(app):
+    # 小分块，让100行日志分布在多个分块中
+    app.config['LOG_CHUNK_SIZE'] = 64
+    writer = log_store.writer('run-1')
+    writer.write_lines(LINES[:60])
+    writer.write_lines(LINES[60:])
+    writer.close()
+    return 'run-1'
+
+
+def test_read_from_start_returns_all_lines_and_totals(ident):
+    result = log_store.read(ident)
+    assert result['lines'] == LINES
+    assert result['first_line'] == 0
+    assert result['next_line'] == 100
+    assert result['total_lines'] == 100
+    assert result['next_offset'] == result['total_size'] == sum(len(line) + 1 for line in LINES)
+    assert result['complete'] is True
+
+
+def test_offset_cursor_resumes_across_chunks(ident):
+    collected = []
+    offset = 0
+    while True:
+        result = log_store.read(ident, since_offset=offset, max_lines=7)
+        if not result['lines']:
+            break
+        assert result['first_line'] == len(collected)
+        collected.extend(result['lines'])
+        offset = result['next_offset']
+    assert collected == LINES
+
+
+def test_offset_in_middle_of_chunk_counts_preceding_lines(ident):
+    offset = sum(len(line) + 1 for line in LINES[:13])
+    result = log_store.read(ident, since_offset=offset, max_lines=2)
+    assert result['lines'] == LINES[13:15]
+    assert result['first_line'] == 13
+
+
+def test_offset_past_end_returns_nothing(ident):
+    result = log_store.read(ident, since_offset=10 ** 9)
+    assert result['lines'] == []
+    assert result['first_line'] == 100
+    assert result['next_offset'] == result['total_size']
+
+
+def test_tail_returns_last_lines(ident):
+    result = log_store.read(ident, tail=5)
+    assert result['lines'] == LINES[-5:]
+    assert result['first_line'] == 95
+    assert log_store.read(ident, tail=0)['lines'] == []
+    assert log_store.read(ident, tail=1000)['lines'] == LINES
+
+
+def test_line_range_spans_chunks_and_sets_next_offset(ident):
+    result = log_store.read(ident, start_line=8, end_line=23)
+    assert result['lines'] == LINES[8:23]
+    assert result['first_line'] == 8
+    assert result['next_line'] == 23
+    assert result['next_offset'] == sum(len(line) + 1 for line in LINES[:23])
+
+
+def test_line_range_is_limited_by_max_lines(ident):
+    result = log_store.read(ident, start_line=90, max_lines=3)
+    assert result['lines'] == LINES[90:93]
+
+
+def test_unsealed_chunk_is_readable_while_writing(app):
+    app.config['LOG_CHUNK_SIZE'] = 64
+    writer = log_store.writer('run-2')
+    writer.write_lines(LINES[:20])
+
+    result = log_store.read('run-2')
+    assert result['lines'] == LINES[:20]
+    assert result['complete'] is False
+    writer.close()
+
+
+def test_ensure_converts_legacy_text_once(app):
+    assert log_store.ensure('legacy', lambda: 'a\nb\nc') is True
+    assert log_store.read('legacy')['lines'] == ['a', 'b', 'c']
+    # 已存在时不再调用loader
+    assert log_store.ensure('legacy', lambda: pytest.fail('loader called')) is True
+    assert log_store.ensure('missing', lambda: None) is False
+
+
+def test_log_sink_writes_event_stdout(app):
+    sink = LogSink(log_store.writer('run-3'))
+    sink([{'stdout': 'one\ntwo'}, {'event': 'verbose'}, {'stdout': 'three'}])
+    sink.close()
+    assert log_store.read('run-3')['lines'] == ['one', 'two', 'three']
@@ -0,0 +1,86 @@
+from app.services.output_groups import OutputGrouper, host_output, host_result, output_hash
+
+
+def test_host_output_prefers_stdout_and_stderr():
+    assert host_output({'stdout': 'ok', 'stderr': 'warn\n', 'msg': 'ignored'}) == 'ok\nwarn'
+    assert host_output({'stdout': '', 'rc': 0}) == ''
+    assert host_output({'msg': 'All items completed'}) == 'All items completed'
+
+
+def test_host_output_ignores_volatile_keys():
+    first = host_output({'changed': True, 'path': '/etc/motd', 'delta': '0:00:01', '_ansible_no_log': False})
+    second = host_output({'changed': True, 'path': '/etc/motd', 'delta': '0:00:02'})
+    assert first == second
+    assert 'delta' not in first
+
+
+def test_host_result_maps_event_status():
+    event = {'event': 'runner_on_ok', 'event_data': {'host': 'web1', 'res': {'changed': True, 'stdout': 'x', 'rc': 0}}}
+    assert host_result(event) == ('web1', {'status': 'changed', 'rc': 0}, 'x')
+
+    event = {'event': 'runner_on_unreachable', 'event_data': {'host': 'web2', 'res': {'msg': 'timeout'}}}
+    assert host_result(event) == ('web2', {'status': 'unreachable', 'rc': None}, 'timeout')
+
+    assert host_result({'event': 'playbook_on_task_start', 'event_data': {}}) is None
+
+
+def test_output_hash_separates_status():
+    assert output_hash('ok', 'same') == output_hash('ok', 'same')
+    assert output_hash('ok', 'same') != output_hash('failed', 'same')
+
+
+def test_identical_outputs_share_one_group():
+    grouper = OutputGrouper()
+    digest, created = grouper.add('web1', 'ok', 'hello', rc=0)
+    assert created is True
+    assert grouper.add('web2', 'ok', 'hello', rc=0) == (digest, False)
+    grouper.add('web3', 'failed', 'boom', rc=1)
+
+    summary = grouper.summary()
+    assert summary['host_count'] == 3
+    assert summary['group_count'] == 2
+    assert summary['groups'][0]['hosts'] == ['web1', 'web2']
+    assert summary['groups'][0]['count'] == 2
+    assert grouper.output(digest) == {'hash': digest, 'status': 'ok', 'rc': 0, 'output': 'hello', 'truncated': False}
+    assert grouper.output('missing') is None
+
+
+def test_failed_groups_sort_before_successful_groups_of_same_size():
+    grouper = OutputGrouper()
+    grouper.add('a', 'ok', 'fine')
+    grouper.add('b', 'failed', 'broken')
+    grouper.add('c', 'changed', 'updated')
+    grouper.add('d', 'changed', 'updated')
+
+    statuses = [group['status'] for group in grouper.groups()]
+    assert statuses == ['changed', 'failed', 'ok']
+
+
+def test_repeated_host_moves_to_latest_group():
+    grouper = OutputGrouper()
+    first, _ = grouper.add('web1', 'failed', 'retrying')
+    grouper.add('web1', 'ok', 'done')
+    grouper.add('web1', 'ok', 'done')
+
+    assert grouper.host_count == 1
+    assert grouper.output(first) is None
+    assert [group['hosts'] for group in grouper.groups()] == [['web1']]
+
+
+def test_output_is_truncated_on_utf8_boundary():
+    grouper = OutputGrouper(max_bytes=5)
+    digest, _ = grouper.add('web1', 'ok', '中文输出')
+    group = grouper.output(digest)
+    assert group['output'] == '中'
+    assert group['truncated'] is True
+
+
+def test_summary_limit_reports_truncation():
+    grouper = OutputGrouper()
+    for index in range(5):
+        grouper.add(f'host{index}', 'ok', f'output {index}')
+
+    summary = grouper.summary(limit=2)
+    assert len(summary['groups']) == 2
+    assert summary['groups_truncated'] is True
+    assert grouper.summary()['groups_truncated'] is False
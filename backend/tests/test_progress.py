@@ -0,0 +1,109 @@
+import pytest
+
+from app.services.progress import ProgressTracker, estimate_task_count
+
+
+PLAYBOOK = """
+- hosts: web
+  pre_tasks:
+    - ping:
+  roles:
+    - common
+    - nginx
+  tasks:
+    - block:
+        - debug: msg=a
+        - debug: msg=b
+      rescue:
+        - debug: msg=never
+      always:
+        - debug: msg=c
+  post_tasks:
+    - debug: msg=d
+- hosts: db
+  gather_facts: no
+  tasks:
+    - debug: msg=e
+- import_playbook: other.yml
+"""
+
+
+def test_estimate_counts_tasks_roles_and_facts():
+    # web: 1 + 2 + 3 + 1 + facts = 8；db: 1；import_playbook: 1
+    assert estimate_task_count(PLAYBOOK) == 10
+
+
+def test_estimate_multiplies_serial_batches():
+    content = '- hosts: all\n  serial: 2\n  gather_facts: false\n  tasks:\n    - ping:\n    - ping:\n'
+    assert estimate_task_count(content, host_count=5) == 6
+    # 执行选项中的serial优先于play中的声明
+    assert estimate_task_count(content, host_count=5, serial=5) == 2
+    assert estimate_task_count(content) == 2
+
+
+@pytest.mark.parametrize('content', ['', 'hosts: all', '- hosts: [', '- gather_facts: no'])
+def test_estimate_is_at_least_one(content):
+    assert estimate_task_count(content) == 1
+
+
+def _task(uuid):
+    return {'event': 'playbook_on_task_start', 'event_data': {'task_uuid': uuid}}
+
+
+def _host(event, host, uuid, **extra):
+    return {'event': event, 'event_data': dict(host=host, task_uuid=uuid, **extra)}
+
+
+def test_progress_counts_hosts_within_current_task():
+    tracker = ProgressTracker(total_tasks=4, host_count=2)
+    assert tracker.progress() == 0
+    assert tracker.eta() is None
+
+    tracker.consume({'event': 'playbook_on_play_start', 'event_data': {}})
+    tracker.consume(_task('t1'))
+    tracker.consume(_host('runner_on_ok', 'a', 't1'))
+    assert tracker.fraction() == pytest.approx(0.125)
+    tracker.consume(_host('runner_on_ok', 'b', 't1'))
+    tracker.consume(_task('t2'))
+    assert tracker.progress() == 25
+
+
+def test_failed_and_unreachable_hosts_drop_out():
+    tracker = ProgressTracker(total_tasks=2, host_count=3)
+    tracker.consume(_task('t1'))
+    tracker.consume(_host('runner_on_failed', 'a', 't1'))
+    tracker.consume(_host('runner_on_unreachable', 'b', 't1'))
+    tracker.consume(_host('runner_on_failed', 'c', 't1', ignore_errors=True))
+    tracker.consume(_task('t2'))
+    # 后续任务只剩主机c
+    tracker.consume(_host('runner_on_ok', 'c', 't2'))
+    assert tracker.progress() == 99
+
+    summary = tracker.summary()
+    assert summary['failed_hosts'] == 1
+    assert summary['unreachable_hosts'] == 1
+
+
+def test_progress_is_monotonic_and_capped_until_finished():
+    tracker = ProgressTracker(total_tasks=1, host_count=1)
+    tracker.consume(_task('t1'))
+    tracker.consume(_host('runner_on_ok', 'a', 't1'))
+    assert tracker.progress() == 99
+
+    # 实际任务数超过估算值时分母变大，但进度不回退
+    tracker.consume(_task('t2'))
+    assert tracker.fraction() < 0.99
+    assert tracker.progress() == 99
+    assert tracker.summary()['total_tasks'] == 2
+
+    tracker.consume({'event': 'playbook_on_stats', 'event_data': {}})
+    assert tracker.progress() == 100
+    assert tracker.eta() == 0
+
+
+def test_events_of_previous_task_are_ignored():
+    tracker = ProgressTracker(total_tasks=2, host_count=1)
+    tracker.consume(_task('t1'))
+    tracker.consume(_task('t2'))
+    tracker.consume(_host('runner_on_ok', 'a', 't1'))
+    assert tracker.fraction() == pytest.approx(0.5)
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from app.services import project_cache as cache_module
+from app.services.project_cache import RESERVED_FILES, project_cache, project_key
+
+
+CONTENT = '- hosts: all\n  tasks: []\n'
+FILES = {'roles/web/tasks/main.yml': '- ping:\n', 'vars/main.yml': 'port: 80\n'}
+
+
+def test_project_key_depends_on_content_and_files():
+    assert project_key(CONTENT, FILES) == project_key(CONTENT, dict(reversed(list(FILES.items()))))
+    assert project_key(CONTENT, FILES) != project_key(CONTENT)
+    assert project_key(CONTENT, FILES) != project_key(CONTENT, dict(FILES, **{'vars/main.yml': 'port: 81\n'}))
+
+
+def test_checkout_materializes_once_and_reuses_directory(app):
+    with project_cache.checkout(CONTENT, FILES) as first:
+        with open(os.path.join(first, 'playbook.yml')) as f:
+            assert f.read() == CONTENT
+        with open(os.path.join(first, 'roles/web/tasks/main.yml')) as f:
+            assert f.read() == '- ping:\n'
+
+    with project_cache.checkout(CONTENT, FILES) as second:
+        assert second == first
+
+    assert project_cache.stats()['entries'] == 1
+    # 临时目录不会残留
+    assert [name for name in os.listdir(project_cache.root) if name.startswith('.tmp-')] == []
+
+
+@pytest.mark.parametrize('name', RESERVED_FILES + ('./playbook.yml',))
+def test_reserved_file_names_are_rejected(app, name):
+    with pytest.raises(ValueError):
+        with project_cache.checkout(CONTENT, {name: 'x'}):
+            pass
+
+
+@pytest.mark.parametrize('name', ['../escape.yml', '/etc/passwd'])
+def test_paths_outside_project_are_rejected(app, name):
+    with pytest.raises(ValueError):
+        with project_cache.checkout(CONTENT, {name: 'x'}):
+            pass
+
+
+def test_evict_removes_least_recently_used_unlocked_directories(app):
+    with project_cache.checkout('- hosts: a\n') as old:
+        pass
+    with project_cache.checkout('- hosts: b\n') as recent:
+        pass
+    os.utime(os.path.join(old, '.complete'), (1, 1))
+
+    project_cache.evict(budget=len('- hosts: b\n'))
+    assert not os.path.exists(old)
+    assert os.path.exists(recent)
+
+
+def test_evict_keeps_directories_in_use(app):
+    with project_cache.checkout(CONTENT) as project_dir:
+        project_cache.evict(budget=0)
+        assert os.path.exists(os.path.join(project_dir, '.complete'))
+
+    project_cache.evict(budget=0)
+    assert project_cache.stats()['entries'] == 0
+
+
+def test_checkout_gives_up_when_directory_keeps_disappearing(app, monkeypatch):
+    # 模拟每次物化后目录都被立即淘汰
+    monkeypatch.setattr(project_cache, '_materialize', lambda project_dir, content, files: None)
+    monkeypatch.setattr(cache_module, 'CHECKOUT_ATTEMPTS', 2)
+
+    with pytest.raises(OSError):
+        with project_cache.checkout(CONTENT):
+            pass
+
+
+def test_stale_directory_without_marker_is_replaced(app):
+    key = project_key(CONTENT)
+    stale = os.path.join(project_cache.root, key)
+    os.makedirs(stale)
+    open(os.path.join(stale, 'playbook.yml'), 'w').close()
+
+    with project_cache.checkout(CONTENT) as project_dir:
+        assert project_dir == stale
+        with open(os.path.join(project_dir, 'playbook.yml')) as f:
+            assert f.read() == CONTENT
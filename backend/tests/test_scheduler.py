@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.scheduler import CronExpression, execution_scheduler, _parse_field
+
+
+def test_parse_field_supports_lists_ranges_and_steps():
+    assert _parse_field('*/15', 0, 59) == [0, 15, 30, 45]
+    assert _parse_field('1-5,10', 0, 59) == [1, 2, 3, 4, 5, 10]
+    assert _parse_field('10/20', 0, 59) == [10, 30, 50]
+    assert _parse_field('mon-fri', 0, 7, ('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat')) == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.parametrize('spec', ['60', '5-1', '*/0', 'abc', '1-'])
+def test_parse_field_rejects_invalid_values(spec):
+    with pytest.raises(ValueError):
+        _parse_field(spec, 0, 59)
+
+
+def test_cron_requires_five_fields():
+    with pytest.raises(ValueError):
+        CronExpression('* * * *')
+
+
+def test_next_after_is_strictly_after():
+    cron = CronExpression('30 2 * * *')
+    assert cron.next_after(datetime(2024, 1, 1, 2, 30)) == datetime(2024, 1, 2, 2, 30)
+    assert cron.next_after(datetime(2024, 1, 1, 2, 29, 59)) == datetime(2024, 1, 1, 2, 30)
+
+
+def test_next_after_rolls_over_hours_days_and_months():
+    cron = CronExpression('0 0 1 * *')
+    assert cron.next_after(datetime(2024, 1, 31, 23, 59)) == datetime(2024, 2, 1, 0, 0)
+    assert CronExpression('@hourly').next_after(datetime(2024, 12, 31, 23, 0)) == datetime(2025, 1, 1, 0, 0)
+
+
+def test_next_after_treats_sunday_as_zero_or_seven():
+    # 2024-01-07是周日
+    after = datetime(2024, 1, 3, 12, 0)
+    assert CronExpression('0 9 * * 0').next_after(after) == datetime(2024, 1, 7, 9, 0)
+    assert CronExpression('0 9 * * 7').next_after(after) == datetime(2024, 1, 7, 9, 0)
+    assert CronExpression('0 9 * * sun').next_after(after) == datetime(2024, 1, 7, 9, 0)
+
+
+def test_next_after_matches_day_or_weekday_when_both_restricted():
+    # 每月13日或每个周五
+    cron = CronExpression('0 0 13 * fri')
+    assert cron.next_after(datetime(2024, 1, 1)) == datetime(2024, 1, 5)
+    assert cron.next_after(datetime(2024, 1, 12, 1)) == datetime(2024, 1, 13)
+
+
+def test_next_after_finds_leap_day():
+    assert CronExpression('0 0 29 2 *').next_after(datetime(2024, 3, 1)) == datetime(2028, 2, 29)
+
+
+def test_next_after_raises_for_impossible_expression():
+    with pytest.raises(ValueError):
+        CronExpression('0 0 31 2 *').next_after(datetime(2024, 1, 1))
+
+
+def test_spread_offset_is_stable_and_within_window(app):
+    app.config['SCHEDULER_DEFAULT_JITTER'] = 300
+    schedule = SimpleNamespace(id=42, jitter=None)
+    offset = execution_scheduler.spread_offset(schedule, timedelta(hours=1))
+    assert 0 <= offset < 300
+    assert execution_scheduler.spread_offset(schedule, timedelta(hours=1)) == offset
+
+
+def test_spread_offset_stays_below_cron_period(app):
+    schedule = SimpleNamespace(id=7, jitter=3600)
+    # 每5分钟触发时错开窗口不超过4分钟
+    assert execution_scheduler.spread_offset(schedule, timedelta(minutes=5)) < 240
+    assert execution_scheduler.spread_offset(SimpleNamespace(id=7, jitter=0), timedelta(hours=1)) == 0
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from app.tasks import ansible_tasks
+from app.tasks.ansible_tasks import split_host_shards
+
+
+@pytest.mark.parametrize('shards', [None, 0, 1])
+def test_no_sharding_returns_single_shard(shards):
+    assert split_host_shards([3, 1], shards) == [[3, 1]]
+
+
+def test_hosts_are_split_round_robin():
+    assert split_host_shards([5, 1, 4, 2, 3, 2], 2) == [[1, 3, 5], [2, 4]]
+    shards = split_host_shards(list(range(1, 101)), 7)
+    assert len(shards) == 7
+    assert sorted(host_id for shard in shards for host_id in shard) == list(range(1, 101))
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+
+
+def test_shard_count_is_capped_by_host_count():
+    assert split_host_shards([2, 1], 5) == [[1], [2]]
+    assert split_host_shards([1], 5) == [[1]]
+
+
+def test_empty_host_list_shards_all_hosts(db):
+    from app.models import Host
+
+    db.session.add_all([Host(name=f'h{index}', hostname=f'h{index}', ip_address=f'10.0.0.{index}')
+                        for index in range(1, 5)])
+    db.session.commit()
+    host_ids = [host.id for host in Host.query.order_by(Host.id)]
+
+    assert split_host_shards([], 2) == [host_ids[0::2], host_ids[1::2]]
+
+
+def test_shard_progress_is_merged_into_parent(db, redis_client, monkeypatch):
+    from app.models import TaskExecution
+
+    emitted = []
+    monkeypatch.setattr(ansible_tasks, 'emit_task_progress',
+                        lambda task_id, progress, **kwargs: emitted.append((task_id, progress, kwargs)))
+    db.session.add(TaskExecution(task_id='parent', name='deploy', status='running', result={'shards': 2}))
+    db.session.commit()
+
+    ansible_tasks._update_shard_progress('parent', 0, {'progress': 50, 'eta': 30, 'totals': {'ok': 2}})
+    ansible_tasks._update_shard_progress('parent', 1, {'finished': True, 'totals': {'ok': 3, 'failed': 1}})
+
+    execution = TaskExecution.query.filter_by(task_id='parent').first()
+    assert execution.progress == 75
+    assert execution.result == {
+        'sharded': True, 'shards': 2, 'finished_shards': 1, 'progress': 75, 'eta': 30,
+        'totals': {'ok': 5, 'failed': 1}
+    }
+    assert emitted[-1] == ('parent', 75, {'message': '1/2 shards finished', 'eta': 30})
+    assert json.loads(redis_client.hget('execution:parent:shards', 0))['progress'] == 50
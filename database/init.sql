@@ -12,6 +12,7 @@ CREATE TABLE IF NOT EXISTS users (
     email VARCHAR(120) UNIQUE NOT NULL,
     password_hash VARCHAR(255) NOT NULL,
     role VARCHAR(20) DEFAULT 'user' CHECK (role IN ('admin', 'user', 'viewer')),
+    team VARCHAR(50),
     is_active BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     last_login TIMESTAMP,
@@ -55,6 +56,7 @@ CREATE TABLE IF NOT EXISTS playbooks (
     name VARCHAR(100) NOT NULL,
     description TEXT,
     content TEXT NOT NULL,
+    files JSONB DEFAULT '{}',
     variables JSONB DEFAULT '{}',
     tags JSONB DEFAULT '[]',
     is_template BOOLEAN DEFAULT FALSE,
@@ -87,6 +89,79 @@ CREATE TABLE IF NOT EXISTS task_executions (
     extra_vars JSONB DEFAULT '{}'
 );
 
+-- 执行事件表（只追加），TaskExecution只保留摘要统计
+CREATE TABLE IF NOT EXISTS execution_events (
+    id BIGSERIAL PRIMARY KEY,
+    execution_id INTEGER NOT NULL REFERENCES task_executions(id) ON DELETE CASCADE,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL,
+    event VARCHAR(50) NOT NULL,
+    host VARCHAR(255),
+    play VARCHAR(255),
+    task VARCHAR(255),
+    changed BOOLEAN DEFAULT FALSE,
+    duration DOUBLE PRECISION,
+    payload JSONB,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 主机执行结果表，执行结束时批量写入
+CREATE TABLE IF NOT EXISTS host_execution_results (
+    id BIGSERIAL PRIMARY KEY,
+    execution_id INTEGER NOT NULL REFERENCES task_executions(id) ON DELETE CASCADE,
+    host_id INTEGER REFERENCES hosts(id) ON DELETE CASCADE,
+    playbook_id INTEGER REFERENCES playbooks(id) ON DELETE SET NULL,
+    hostname VARCHAR(255) NOT NULL,
+    ok INTEGER DEFAULT 0,
+    changed INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    unreachable INTEGER DEFAULT 0,
+    skipped INTEGER DEFAULT 0,
+    duration DOUBLE PRECISION,
+    last_failed_task VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 定时执行表
+CREATE TABLE IF NOT EXISTS execution_schedules (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    target_type VARCHAR(20) NOT NULL DEFAULT 'playbook',
+    playbook_id INTEGER REFERENCES playbooks(id) ON DELETE CASCADE,
+    host_ids JSONB DEFAULT '[]',
+    module VARCHAR(100),
+    module_args TEXT,
+    extra_vars JSONB DEFAULT '{}',
+    options JSONB DEFAULT '{}',
+    cron_expression VARCHAR(100) NOT NULL,
+    timezone VARCHAR(50) DEFAULT 'UTC',
+    jitter INTEGER DEFAULT 0,
+    allow_overlap BOOLEAN DEFAULT FALSE,
+    enabled BOOLEAN DEFAULT TRUE,
+    next_run_at TIMESTAMP,
+    last_run_at TIMESTAMP,
+    last_task_id VARCHAR(100),
+    last_status VARCHAR(20),
+    last_error TEXT,
+    skipped_runs INTEGER DEFAULT 0,
+    created_by INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 执行配额表
+CREATE TABLE IF NOT EXISTS execution_quotas (
+    id SERIAL PRIMARY KEY,
+    scope VARCHAR(20) NOT NULL CHECK (scope IN ('user', 'team', 'default')),
+    subject VARCHAR(80),
+    max_running INTEGER,
+    max_hosts INTEGER,
+    weight DOUBLE PRECISION DEFAULT 1.0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_execution_quotas_scope_subject UNIQUE (scope, subject)
+);
+
 -- 审计日志表
 CREATE TABLE IF NOT EXISTS audit_logs (
     id SERIAL PRIMARY KEY,
@@ -149,6 +224,8 @@ CREATE INDEX IF NOT EXISTS idx_hosts_ip_address ON hosts(ip_address);
 CREATE INDEX IF NOT EXISTS idx_hosts_status ON hosts(status);
 CREATE INDEX IF NOT EXISTS idx_hosts_group_id ON hosts(group_id);
 CREATE INDEX IF NOT EXISTS idx_hosts_last_check ON hosts(last_check);
+CREATE INDEX IF NOT EXISTS idx_hosts_updated_at ON hosts(updated_at);
+CREATE INDEX IF NOT EXISTS idx_host_groups_updated_at ON host_groups(updated_at);
 
 CREATE INDEX IF NOT EXISTS idx_playbooks_created_by ON playbooks(created_by);
 CREATE INDEX IF NOT EXISTS idx_playbooks_is_template ON playbooks(is_template);
@@ -160,6 +237,16 @@ CREATE INDEX IF NOT EXISTS idx_task_executions_status ON task_executions(status)
 CREATE INDEX IF NOT EXISTS idx_task_executions_created_at ON task_executions(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_task_executions_executed_by ON task_executions(executed_by);
 
+CREATE UNIQUE INDEX IF NOT EXISTS idx_execution_events_execution_seq ON execution_events(execution_id, shard, seq);
+CREATE INDEX IF NOT EXISTS idx_execution_events_execution_task ON execution_events(execution_id, task, event);
+CREATE INDEX IF NOT EXISTS idx_execution_events_host ON execution_events(host, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_host_execution_results_host ON host_execution_results(host_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_host_execution_results_playbook ON host_execution_results(playbook_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_host_execution_results_execution ON host_execution_results(execution_id);
+
+CREATE INDEX IF NOT EXISTS idx_execution_schedules_due ON execution_schedules(enabled, next_run_at);
+
 CREATE INDEX IF NOT EXISTS idx_audit_logs_user_id ON audit_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_action ON audit_logs(action);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at ON audit_logs(created_at DESC);
@@ -181,12 +268,27 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- 主机更新时间触发器：仅状态检查字段变化时不更新updated_at，
+-- 避免连接性检查导致清单快照缓存失效
+CREATE OR REPLACE FUNCTION update_hosts_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF (to_jsonb(NEW) - 'status' - 'last_check' - 'updated_at') IS DISTINCT FROM
+       (to_jsonb(OLD) - 'status' - 'last_check' - 'updated_at') THEN
+        NEW.updated_at = CURRENT_TIMESTAMP;
+    ELSE
+        NEW.updated_at = OLD.updated_at;
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
 -- 创建更新时间触发器
 CREATE TRIGGER update_host_groups_updated_at BEFORE UPDATE ON host_groups
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
 CREATE TRIGGER update_hosts_updated_at BEFORE UPDATE ON hosts
-    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+    FOR EACH ROW EXECUTE FUNCTION update_hosts_updated_at_column();
 
 CREATE TRIGGER update_playbooks_updated_at BEFORE UPDATE ON playbooks
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -194,6 +296,12 @@ CREATE TRIGGER update_playbooks_updated_at BEFORE UPDATE ON playbooks
 CREATE TRIGGER update_system_configs_updated_at BEFORE UPDATE ON system_configs
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+CREATE TRIGGER update_execution_schedules_updated_at BEFORE UPDATE ON execution_schedules
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE TRIGGER update_execution_quotas_updated_at BEFORE UPDATE ON execution_quotas
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
 -- 插入默认管理员用户
 -- 密码: admin123 (请在生产环境中修改)
 INSERT INTO users (username, email, password_hash, role) VALUES 
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""冷启动与预热进程池的ad-hoc执行延迟对比
+
+默认对本机（ansible_connection=local）执行ping模块，分别测量：
+- cold：每次调用ansible_runner.run，启动新的ansible进程
+- warm：在同一个预热进程中连续执行（不含进程启动时间）
+
+用法：
+    cd backend && python ../scripts/benchmark_warm_pool.py --runs 20
+    cd backend && python ../scripts/benchmark_warm_pool.py --inventory hosts.ini --pattern web --module setup
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+import ansible_runner  # noqa: E402
+
+from app.services.warm_pool import WarmWorker  # noqa: E402
+
+
+LOCAL_INVENTORY = 'localhost ansible_connection=local ansible_python_interpreter={python}\n'
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f'{name:<12} runs={len(samples):<4} mean={statistics.mean(samples) * 1000:8.1f}ms '
+          f'median={statistics.median(samples) * 1000:8.1f}ms p95={p95 * 1000:8.1f}ms '
+          f'min={samples[0] * 1000:8.1f}ms')
+
+
+def run_cold(args, inventory, work_dir):
+    samples = []
+    for index in range(args.runs):
+        started = time.monotonic()
+        runner = ansible_runner.run(
+            private_data_dir=work_dir,
+            ident=f'cold-{index}',
+            inventory=inventory,
+            host_pattern=args.pattern,
+            module=args.module,
+            module_args=args.args,
+            quiet=True
+        )
+        samples.append(time.monotonic() - started)
+        if runner.status != 'successful':
+            print(f'cold run {index} finished with status {runner.status}', file=sys.stderr)
+    return samples
+
+
+def run_warm(args, inventory):
+    started = time.monotonic()
+    worker = WarmWorker(dict(os.environ), max_jobs=args.runs + 1, startup_timeout=120)
+    startup = time.monotonic() - started
+
+    samples = []
+    try:
+        for index in range(args.runs):
+            started = time.monotonic()
+            result = worker.run({
+                'inventory': inventory,
+                'module': args.module,
+                'args': args.args,
+                'pattern': args.pattern,
+                'forks': args.forks
+            }, on_event=lambda event: None)
+            samples.append(time.monotonic() - started)
+            if result.get('status') != 'successful':
+                print(f'warm run {index} finished with status {result.get("status")}: {result.get("error", "")}',
+                      file=sys.stderr)
+    finally:
+        worker.terminate()
+    return startup, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare cold ansible-runner launches with the warm execution pool')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--module', default='ping')
+    parser.add_argument('--args', default='')
+    parser.add_argument('--pattern', default='all')
+    parser.add_argument('--forks', type=int, default=5)
+    parser.add_argument('--inventory', help='inventory file, defaults to localhost with a local connection')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='ansible-web-bench-') as work_dir:
+        inventory = args.inventory
+        if not inventory:
+            inventory = os.path.join(work_dir, 'hosts.ini')
+            with open(inventory, 'w') as f:
+                f.write(LOCAL_INVENTORY.format(python=sys.executable))
+
+        cold = run_cold(args, os.path.abspath(inventory), work_dir)
+        startup, warm = run_warm(args, os.path.abspath(inventory))
+
+    summarize('cold', cold)
+    summarize('warm', warm)
+    print(f'{"warm start":<12} {startup * 1000:.1f}ms (one-off per pooled process)')
+    print(f'{"speedup":<12} {statistics.median(cold) / statistics.median(warm):.1f}x (median)')
+
+
+if __name__ == '__main__':
+    main()